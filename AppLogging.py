@@ -0,0 +1,264 @@
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Iterable, List, Optional
+
+try:
+    from dotenv import dotenv_values
+except ImportError:
+    dotenv_values = None
+
+# Non-blocking logging: callers only enqueue records; a background listener
+# thread redacts, formats and writes them into logs/YYYY-MM-DD/app.log.
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+DEFAULT_LOG_DIR = 'logs'
+
+# Keys whose values must never reach a log file (request headers, login payloads, session tokens)
+SENSITIVE_KEYS = [
+    'X-PrivateKey', 'X-ClientPublicIP', 'X-ClientLocalIP', 'X-MACAddress', 'Authorization',
+    'password', 'pin', 'totp', 'totp_key', 'clientcode', 'api_key', 'username',
+    'jwtToken', 'refreshToken', 'feedToken'
+]
+
+# Credentials read by CredentialsManager; their values are masked wherever they appear.
+# Only the app's own copies count: the key in the .env file, or an account-prefixed
+# variable (ACC1_USERNAME for ACCOUNTS=ACC1,...). A bare USERNAME in the process
+# environment is usually the OS login and is left alone.
+SENSITIVE_ENV_VARS = ['API_KEY', 'USERNAME', 'PIN', 'TOTP_TOKEN']
+DEFAULT_ENV_FILE = '.env'
+
+REDACTED = '***'
+
+
+class RedactingFormatter(logging.Formatter):
+    """Formatter that masks credentials, tokens and secret values in the final log line
+
+    Values of secret_env_vars are looked up on every format call rather than
+    once, because credentials are often loaded from .env (load_dotenv) after
+    logging has been set up. They are taken from env_file and from
+    account-prefixed environment variables only (see SENSITIVE_ENV_VARS).
+    """
+
+    def __init__(self, fmt: str = LOG_FORMAT, secrets: Optional[Iterable[str]] = None,
+                 secret_env_vars: Iterable[str] = (), env_file: str = DEFAULT_ENV_FILE):
+        super().__init__(fmt)
+        keys = '|'.join(re.escape(key) for key in SENSITIVE_KEYS)
+        self._key_pattern = re.compile(
+            rf"""(['"]?\b(?:{keys})\b['"]?\s*[:=]\s*)(['"]?)([^'",}}\s]+)""", re.IGNORECASE)
+        self._bearer_pattern = re.compile(r'(Bearer\s+)[\w.\-]+')
+        self._jwt_pattern = re.compile(r'eyJ[\w\-]+\.[\w\-]+\.[\w\-]+')
+        self._secrets = [s for s in (secrets or []) if s and len(s) >= 4]
+        self._secret_env_vars = list(secret_env_vars)
+        self._env_file = env_file
+        self._env_file_mtime: Optional[float] = None
+        self._env_file_secrets: List[str] = []
+
+    def redact(self, text: str) -> str:
+        text = self._key_pattern.sub(rf'\1\2{REDACTED}', text)
+        text = self._bearer_pattern.sub(rf'\1{REDACTED}', text)
+        text = self._jwt_pattern.sub(REDACTED, text)
+        for secret in self._secrets + self._env_secrets():
+            text = text.replace(secret, REDACTED)
+        return text
+
+    def _env_secrets(self) -> List[str]:
+        if not self._secret_env_vars:
+            return []
+        accounts = [a.strip() for a in os.getenv('ACCOUNTS', '').split(',') if a.strip()]
+        values = [os.getenv(f'{account}_{name}') for account in accounts for name in self._secret_env_vars]
+        return [v for v in values if v and len(v) >= 4] + self._read_env_file()
+
+    def _read_env_file(self) -> List[str]:
+        """Secret values defined in the .env file, re-read only when it changes"""
+        try:
+            mtime = os.path.getmtime(self._env_file)
+        except OSError:
+            return []
+        if mtime != self._env_file_mtime and dotenv_values is not None:
+            values = dotenv_values(self._env_file)
+            self._env_file_secrets = [value for key, value in values.items()
+                                      if value and len(value) >= 4
+                                      and any(key == name or key.endswith(f'_{name}')
+                                              for name in self._secret_env_vars)]
+            self._env_file_mtime = mtime
+        return self._env_file_secrets
+
+    def format(self, record: logging.LogRecord) -> str:
+        return self.redact(super().format(record))
+
+
+class DailyDirectoryHandler(logging.Handler):
+    """Writes to <log_dir>/YYYY-MM-DD/<filename>, switching files when the date changes"""
+
+    def __init__(self, log_dir: str = DEFAULT_LOG_DIR, filename: str = 'app.log',
+                 encoding: str = 'utf-8'):
+        super().__init__()
+        self.log_dir = log_dir
+        self.filename = filename
+        self.encoding = encoding
+        self._date = None
+        self._stream = None
+
+    def _open_for(self, day: str):
+        if self._stream:
+            self._stream.close()
+        folder = os.path.join(self.log_dir, day)
+        os.makedirs(folder, exist_ok=True)
+        self._stream = open(os.path.join(folder, self.filename), 'a', encoding=self.encoding)
+        self._date = day
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            day = datetime.fromtimestamp(record.created).strftime('%Y-%m-%d')
+            if day != self._date:
+                self._open_for(day)
+            self._stream.write(self.format(record) + '\n')
+            self._stream.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            if self._stream:
+                self._stream.close()
+                self._stream = None
+        finally:
+            self.release()
+        super().close()
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that defers formatting, redaction and I/O to the listener thread
+
+    The message is merged with its args on the caller's thread, because args
+    are often live objects (quote dicts, order params) that may change before
+    the listener gets to them. Exception tracebacks are rendered eagerly as
+    well (the traceback objects can't outlive the call); the line format,
+    redaction and the write happen in the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never block a market-data or order path on logging
+            pass
+
+
+class SampledLogger:
+    """Rate limits high-frequency log lines per key (e.g. per token)
+
+    A line is emitted for the first call of a key; after that, the
+    `every_n`-th call since the last emitted line is emitted, or any call made
+    `min_interval` seconds or more after it, whichever comes first.
+    Dropped calls cost a dict lookup and are counted in the next emitted line.
+    """
+
+    def __init__(self, logger: logging.Logger, every_n: int = 100, min_interval: float = 5.0):
+        self.logger = logger
+        self.every_n = every_n
+        self.min_interval = min_interval
+        self._state: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def _should_log(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None:
+                self._state[key] = [0, now]
+                return 0
+            state[0] += 1
+            if state[0] >= self.every_n or now - state[1] >= self.min_interval:
+                skipped = state[0] - 1
+                state[0], state[1] = 0, now
+                return skipped
+            return None
+
+    def log(self, level: int, key: str, msg: str, *args) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        skipped = self._should_log(key)
+        if skipped is None:
+            return
+        if skipped:
+            msg = f"{msg} ({skipped} similar suppressed)"
+        self.logger.log(level, msg, *args)
+
+    def debug(self, key: str, msg: str, *args) -> None:
+        self.log(logging.DEBUG, key, msg, *args)
+
+    def info(self, key: str, msg: str, *args) -> None:
+        self.log(logging.INFO, key, msg, *args)
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(log_dir: str = DEFAULT_LOG_DIR, level: int = logging.INFO,
+                  console: bool = True, queue_size: int = 100000) -> QueueListener:
+    """Route all logging through a queue to a background writer thread
+
+    Installs a NonBlockingQueueHandler on the root logger and starts a
+    listener that redacts and writes to logs/YYYY-MM-DD/app.log (and the
+    console if requested). SmartAPI's logzero logger is redirected through the
+    same queue so its request/response dumps are redacted too. Calling this
+    again returns the already running listener.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    formatter = RedactingFormatter(LOG_FORMAT, secret_env_vars=SENSITIVE_ENV_VARS)
+
+    handlers = [DailyDirectoryHandler(log_dir)]
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    try:
+        import logzero
+        logzero.logger.handlers.clear()
+        logzero.logger.addHandler(queue_handler)
+        logzero.logger.propagate = False
+    except ImportError:
+        pass
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,280 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Dict, List, Any, Callable, Optional
+import pandas as pd
+from LoginTesting import CandleDataHandler, LoginManager, call_with_policy
+from CandleStore import CandleStore
+from SessionPool import RateLimiter, SessionPool
+from Resilience import MASTER_LIST_URL
+
+# Resumable, universe-wide historical candle backfill.
+#
+# A universe selector resolves instruments from the master list; the planner
+# splits each instrument's date range into work units no longer than the
+# getCandleData span limit for the interval. Units run in parallel under the
+# caller's rate limits and land in the CandleStore. Every finished unit is
+# appended to a checkpoint log, so a rerun of the same job skips straight to
+# the units that have not completed.
+
+DEFAULT_BACKFILL_DIR = os.path.join('data', 'backfill')
+
+# Longest date range (days) getCandleData returns in one request, per interval
+MAX_DAYS_PER_REQUEST = {
+    'ONE_MINUTE': 30,
+    'THREE_MINUTE': 60,
+    'FIVE_MINUTE': 100,
+    'TEN_MINUTE': 100,
+    'FIFTEEN_MINUTE': 200,
+    'THIRTY_MINUTE': 200,
+    'ONE_HOUR': 400,
+    'ONE_DAY': 2000
+}
+
+# getCandleData allows about 3 requests per second per session
+DEFAULT_HISTORICAL_RATE = 3.0
+
+
+def select_universe(master_list: pd.DataFrame, name: Optional[str] = None,
+                    instrument_type: Optional[str] = None, exchange: Optional[str] = None,
+                    expiries: Optional[int] = None, strikes: Optional[List[float]] = None,
+                    as_of: Optional[date] = None) -> pd.DataFrame:
+    """Instruments matching the selector, e.g. all NIFTY options of the next 3 expiries
+
+    expiries keeps the N nearest expiry dates on or after as_of (today by
+    default). The scrip master only lists live contracts, so expired series
+    cannot be selected from it.
+    """
+    universe = master_list
+    if exchange:
+        universe = universe[universe['exch_seg'] == exchange]
+    if name:
+        universe = universe[universe['name'] == name]
+    if instrument_type:
+        universe = universe[universe['instrumenttype'] == instrument_type]
+    if strikes is not None:
+        universe = universe[pd.to_numeric(universe['strike'], errors='coerce').isin(strikes)]
+    if expiries is not None:
+        expiry = pd.to_datetime(universe['expiry'], errors='coerce', format='mixed').dt.date
+        upcoming = sorted(d for d in expiry.dropna().unique() if d >= (as_of or date.today()))[:expiries]
+        universe = universe[expiry.isin(upcoming)]
+    return universe
+
+
+def plan_units(universe: pd.DataFrame, interval: str, fromdate: datetime, todate: datetime,
+               clip_to_expiry: bool = True) -> List[Dict[str, Any]]:
+    """Split every instrument's range into getCandleData-sized work units"""
+    span = timedelta(days=MAX_DAYS_PER_REQUEST[interval])
+    expiries = pd.to_datetime(universe['expiry'], errors='coerce', format='mixed')
+    units = []
+    for token, exchange, symbol, expiry in zip(universe['token'], universe['exch_seg'],
+                                               universe['symbol'], expiries):
+        end = todate
+        if clip_to_expiry and not pd.isna(expiry):
+            end = min(end, datetime.combine(expiry.date(), dtime(15, 30)))
+        start = fromdate
+        while start < end:
+            chunk_end = min(start + span, end)
+            units.append({
+                'id': f"{exchange}:{token}:{interval}:{start:%Y%m%d%H%M}",
+                'exchange': exchange,
+                'symboltoken': str(token),
+                'symbol': symbol,
+                'interval': interval,
+                'fromdate': start.strftime('%Y-%m-%d %H:%M'),
+                'todate': chunk_end.strftime('%Y-%m-%d %H:%M')
+            })
+            start = chunk_end
+    return units
+
+
+def session_fetcher(login_manager: LoginManager, rate: float = DEFAULT_HISTORICAL_RATE) -> Callable[[Dict], Any]:
+    """getCandleData on one logged-in session, through its policy and a rate limiter"""
+    limiter = RateLimiter(rate)
+    connection = login_manager.get_data_manager().smart_connect
+    policy = login_manager.get_resilience_policy()
+
+    def fetch(params: Dict[str, Any]) -> Any:
+        limiter.acquire()
+        return call_with_policy(policy, 'getCandleData', lambda: connection.getCandleData(params))
+    return fetch
+
+
+def pool_fetcher(pool: SessionPool) -> Callable[[Dict], Any]:
+    """getCandleData sharded across a SessionPool's accounts (each under its own rate limit)"""
+    return lambda params: pool.read('getCandleData', params)
+
+
+class BackfillJob:
+    """Runs planned work units in parallel with an on-disk checkpoint log"""
+
+    def __init__(self, name: str, units: List[Dict[str, Any]], fetch: Callable[[Dict], Any],
+                 store: Optional[CandleStore] = None, max_workers: int = 4,
+                 root_dir: str = DEFAULT_BACKFILL_DIR, replan: bool = False):
+        """
+        Args:
+            name: Job name; its plan and checkpoint live in root_dir/name
+            units: Work units from plan_units (ignored when resuming a saved plan
+                unless replan=True)
+            fetch: Takes getCandleData params and returns the raw response
+            max_workers: Concurrent requests (the fetcher enforces rate limits)
+        """
+        self.name = name
+        self.fetch = fetch
+        self.store = store or CandleStore()
+        self.max_workers = max_workers
+        self.job_dir = os.path.join(root_dir, name)
+        self.plan_path = os.path.join(self.job_dir, 'plan.json')
+        self.done_path = os.path.join(self.job_dir, 'done.log')
+        os.makedirs(self.job_dir, exist_ok=True)
+
+        if os.path.exists(self.plan_path) and not replan:
+            with open(self.plan_path) as f:
+                self.units = json.load(f)
+        else:
+            self.units = units
+            tmp_path = f'{self.plan_path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(units, f)
+            os.replace(tmp_path, self.plan_path)
+
+        self.done = self._load_done()
+        self.failed: Dict[str, str] = {}
+        self.candles = 0
+        self._completed_this_run = 0
+        self._started: Optional[float] = None
+        self._lock = threading.Lock()
+        self._token_locks: Dict[str, threading.Lock] = {}
+        self._stop = threading.Event()
+
+    def _load_done(self) -> set:
+        if not os.path.exists(self.done_path):
+            return set()
+        with open(self.done_path) as f:
+            # A crash can leave a torn last line; it simply does not match a unit id
+            return {line.strip() for line in f if line.strip()}
+
+    def pending(self) -> List[Dict[str, Any]]:
+        return [unit for unit in self.units if unit['id'] not in self.done]
+
+    def _token_lock(self, unit: Dict[str, Any]) -> threading.Lock:
+        key = f"{unit['exchange']}:{unit['symboltoken']}:{unit['interval']}"
+        with self._lock:
+            return self._token_locks.setdefault(key, threading.Lock())
+
+    def _run_unit(self, unit: Dict[str, Any]) -> int:
+        if self._stop.is_set():
+            return 0
+        params = {key: unit[key] for key in ['exchange', 'symboltoken', 'interval', 'fromdate', 'todate']}
+        res = self.fetch(params)
+        if not res or res.get('status') is False:
+            message = f"{res.get('errorcode')}: {res.get('message')}" if res else 'empty response'
+            raise RuntimeError(message)
+
+        rows = res.get('data') or []
+        if rows:
+            candle_df = CandleDataHandler.to_typed_frame(rows)
+            # Units of one token finish in any order; CandleStore.save merges, one writer at a time
+            with self._token_lock(unit):
+                self.store.save(unit['exchange'], unit['interval'], unit['symboltoken'], candle_df)
+
+        with self._lock:
+            with open(self.done_path, 'a') as f:
+                f.write(unit['id'] + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.done.add(unit['id'])
+            self.failed.pop(unit['id'], None)
+            self.candles += len(rows)
+            self._completed_this_run += 1
+        return len(rows)
+
+    def progress(self) -> Dict[str, Any]:
+        """Completed/remaining units, throughput of this run and ETA"""
+        with self._lock:
+            total = len(self.units)
+            completed = sum(1 for unit in self.units if unit['id'] in self.done)
+            elapsed = time.monotonic() - self._started if self._started else 0.0
+            rate = self._completed_this_run / elapsed if elapsed > 0 else 0.0
+            remaining = total - completed
+            return {
+                'job': self.name,
+                'completed': completed,
+                'total': total,
+                'failed': len(self.failed),
+                'candles': self.candles,
+                'units_per_sec': rate,
+                'candles_per_sec': self.candles / elapsed if elapsed > 0 else 0.0,
+                'eta_seconds': remaining / rate if rate > 0 else None
+            }
+
+    @staticmethod
+    def print_progress(progress: Dict[str, Any]) -> None:
+        eta = progress['eta_seconds']
+        print(f"[{progress['job']}] {progress['completed']}/{progress['total']} units, "
+              f"{progress['failed']} failed, {progress['units_per_sec']:.2f} units/s, "
+              f"{progress['candles_per_sec']:.0f} candles/s, "
+              f"ETA {f'{eta / 60:.1f} min' if eta is not None else 'n/a'}")
+
+    def stop(self) -> None:
+        """Finish in-flight units and stop; the next run() resumes from the checkpoint"""
+        self._stop.set()
+
+    def run(self, report_every: float = 10.0,
+            on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Run every pending unit; failed units are left for the next run"""
+        pending = self.pending()
+        self._stop.clear()
+        self._started = time.monotonic()
+        self._completed_this_run = 0
+        self.candles = 0
+        report = on_progress or self.print_progress
+
+        last_report = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='backfill')
+        try:
+            futures = {executor.submit(self._run_unit, unit): unit for unit in pending}
+            for future in as_completed(futures):
+                error = future.exception()
+                if error is not None:
+                    with self._lock:
+                        self.failed[futures[future]['id']] = str(error)
+                if time.monotonic() - last_report >= report_every:
+                    report(self.progress())
+                    last_report = time.monotonic()
+        except BaseException:
+            # Interrupted: let in-flight units finish and checkpoint, drop the rest
+            self._stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        executor.shutdown(wait=True)
+
+        result = self.progress()
+        report(result)
+        return result
+
+
+# Execution starts here
+if __name__ == "__main__":
+    login_manager = LoginManager()
+    session_data = login_manager.login()
+    if session_data['status'] != 'success':
+        print(f"Login failed: {session_data['message']}")
+    else:
+        master_list = login_manager.get_master_list_manager().fetch_master_list(MASTER_LIST_URL)
+        universe = select_universe(master_list, name='NIFTY', instrument_type='OPTIDX', exchange='NFO', expiries=2)
+        todate = datetime.now()
+        units = plan_units(universe, 'ONE_MINUTE', todate - timedelta(days=30), todate)
+        print(f"{len(universe)} instruments, {len(units)} work units")
+
+        job = BackfillJob('nifty_options_1m', units, session_fetcher(login_manager))
+        try:
+            job.run()
+        except KeyboardInterrupt:
+            job.stop()
+            print("Stopped; rerun to resume from the checkpoint")
+        if job.failed:
+            print(f"{len(job.failed)} units failed and will be retried on the next run")
@@ -0,0 +1,200 @@
+import itertools
+import os
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool, shared_memory
+from typing import Dict, List, Any, Callable, Optional, Union
+from CandleStore import CandleStore, CANDLE_DTYPE
+
+# Vectorized backtesting over locally stored candles (see CandleStore).
+#
+# A strategy is a function (arrays, params) -> target position per bar, where
+# arrays maps 'timestamp', 'open', 'high', 'low', 'close', 'volume' to NumPy
+# arrays. Targets decided on bar t are filled at the open of bar t + 1.
+
+_MINUTE_NS = 60 * 1_000_000_000
+_IST_OFFSET_NS = 330 * _MINUTE_NS
+
+# Default cost model; every key can be overridden per run or per sweep combination
+DEFAULT_COSTS = {
+    'quantity': 75,          # units per position step (one NIFTY lot)
+    'slippage': 0.5,         # price points paid per unit on every fill
+    'fee_rate': 0.0003,      # fraction of traded notional
+    'fee_per_order': 20.0,   # flat brokerage per order
+    'bars_per_year': 375 * 250
+}
+
+
+def _ema(values: np.ndarray, period: int) -> np.ndarray:
+    return pd.Series(values).ewm(span=period, adjust=False).mean().to_numpy()
+
+
+def ema_crossover(arrays: Dict[str, np.ndarray], params: Dict[str, Any]) -> np.ndarray:
+    """Long when the fast EMA is above the slow EMA, short when below"""
+    close = arrays['close'].astype('float64')
+    fast = _ema(close, int(params.get('fast', 9)))
+    slow = _ema(close, int(params.get('slow', 21)))
+    return np.sign(fast - slow)
+
+
+def ladder_breakout(arrays: Dict[str, np.ndarray], params: Dict[str, Any]) -> np.ndarray:
+    """Strike-ladder strategy around the previous session close
+
+    Like NiftyStrikes.generate_levels, levels are spaced `step` points apart
+    around the previous session's close. One unit is added for every level the
+    price has crossed (long above, short below), capped at `max_units`.
+    """
+    close = arrays['close'].astype('float64')
+    step = float(params.get('step', 100))
+    max_units = int(params.get('max_units', 2))
+
+    session = (arrays['timestamp'] + _IST_OFFSET_NS) // (1440 * _MINUTE_NS)
+    starts = np.flatnonzero(np.r_[True, session[1:] != session[:-1]])
+    session_index = np.cumsum(np.r_[False, session[1:] != session[:-1]])
+    session_close = close[np.r_[starts[1:], len(close)] - 1]
+    # No anchor for the first session, so it stays flat
+    anchor = np.r_[np.nan, session_close[:-1]][session_index]
+
+    with np.errstate(invalid='ignore'):
+        levels = np.trunc((close - anchor) / step)
+    return np.nan_to_num(np.clip(levels, -max_units, max_units))
+
+
+STRATEGIES: Dict[str, Callable[[Dict[str, np.ndarray], Dict[str, Any]], np.ndarray]] = {
+    'ema_crossover': ema_crossover,
+    'ladder_breakout': ladder_breakout
+}
+
+
+def records_to_arrays(records: np.ndarray) -> Dict[str, np.ndarray]:
+    """Column views over a CANDLE_DTYPE record array (no copies)"""
+    return {name: records[name] for name in CANDLE_DTYPE.names}
+
+
+def simulate(arrays: Dict[str, np.ndarray], target: np.ndarray,
+             costs: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Vectorized fill and P&L simulation for a target position series
+
+    Returns:
+        Dict with summary metrics plus 'equity' and 'position' arrays
+    """
+    costs = {**DEFAULT_COSTS, **(costs or {})}
+    if len(arrays['close']) == 0:
+        return {'net_pnl': 0.0, 'fees': 0.0, 'orders': 0, 'max_drawdown': 0.0, 'sharpe': 0.0,
+                'exposure': 0.0, 'equity': np.zeros(0), 'position': np.zeros(0)}
+    quantity = costs['quantity']
+    open_ = arrays['open'].astype('float64')
+    close = arrays['close'].astype('float64')
+
+    target = np.nan_to_num(np.asarray(target, dtype='float64'))
+    position = np.r_[0.0, target[:-1]]
+    traded = np.diff(np.r_[0.0, position])
+
+    fill_price = open_ + np.sign(traded) * costs['slippage']
+    notional = np.abs(traded) * quantity * fill_price
+    fees = notional * costs['fee_rate'] + (traded != 0) * costs['fee_per_order']
+
+    cash = np.cumsum(-traded * quantity * fill_price - fees)
+    equity = cash + position * quantity * close
+
+    bar_pnl = np.diff(np.r_[0.0, equity])
+    pnl_std = bar_pnl.std()
+    drawdown = np.maximum.accumulate(equity) - equity
+
+    return {
+        'net_pnl': float(equity[-1]) if len(equity) else 0.0,
+        'fees': float(fees.sum()),
+        'orders': int(np.count_nonzero(traded)),
+        'max_drawdown': float(drawdown.max()) if len(drawdown) else 0.0,
+        'sharpe': float(bar_pnl.mean() / pnl_std * np.sqrt(costs['bars_per_year'])) if pnl_std > 0 else 0.0,
+        'exposure': float(np.count_nonzero(position) / len(position)) if len(position) else 0.0,
+        'equity': equity,
+        'position': position
+    }
+
+
+def run_backtest(records: np.ndarray, strategy: Union[str, Callable],
+                 params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one strategy/parameter set over a candle record array
+
+    params holds both strategy parameters and cost overrides (see DEFAULT_COSTS).
+    """
+    strategy_fn = STRATEGIES[strategy] if isinstance(strategy, str) else strategy
+    arrays = records_to_arrays(records)
+    target = strategy_fn(arrays, params)
+    costs = {key: params[key] for key in DEFAULT_COSTS if key in params}
+    return simulate(arrays, target, costs)
+
+
+# Worker-side state for parameter sweeps; attached once per process
+_worker_shm = None
+_worker_records = None
+_worker_strategy = None
+
+
+def _init_worker(shm_name: str, length: int, strategy):
+    global _worker_shm, _worker_records, _worker_strategy
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_records = np.ndarray((length,), dtype=CANDLE_DTYPE, buffer=_worker_shm.buf)
+    _worker_strategy = strategy
+
+
+def _run_combination(params: Dict[str, Any]) -> Dict[str, Any]:
+    result = run_backtest(_worker_records, _worker_strategy, params)
+    del result['equity'], result['position']
+    return {**params, **result}
+
+
+def run_sweep(records: np.ndarray, strategy: Union[str, Callable],
+              param_grid: Dict[str, List[Any]], processes: Optional[int] = None,
+              chunksize: int = 8) -> pd.DataFrame:
+    """Run every combination in param_grid across a process pool
+
+    The candle records are copied once into shared memory; workers map them
+    as NumPy views instead of receiving a pickled copy per task. A strategy
+    passed as a callable must be a module-level function so it can be pickled.
+
+    Returns:
+        DataFrame with one row per combination, sorted by net_pnl (best first)
+    """
+    keys = list(param_grid)
+    combinations = [dict(zip(keys, values)) for values in itertools.product(*param_grid.values())]
+    if not combinations or len(records) == 0:
+        return pd.DataFrame()
+
+    shm = shared_memory.SharedMemory(create=True, size=records.nbytes)
+    try:
+        shared = np.ndarray(records.shape, dtype=CANDLE_DTYPE, buffer=shm.buf)
+        shared[:] = records
+
+        with Pool(processes=processes or os.cpu_count(), initializer=_init_worker,
+                  initargs=(shm.name, len(records), strategy)) as pool:
+            results = list(pool.imap_unordered(_run_combination, combinations, chunksize=chunksize))
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return pd.DataFrame(results).sort_values('net_pnl', ascending=False).reset_index(drop=True)
+
+
+# Execution starts here
+if __name__ == "__main__":
+    import time
+
+    store = CandleStore()
+    exchange, interval, token = "NFO", "ONE_MINUTE", "54683"
+    records = store.load_records(exchange, interval, token)
+    if records is None:
+        print(f"No stored candles for {exchange}:{token} ({interval}) in {store.root_dir}")
+    else:
+        param_grid = {
+            'step': [25, 50, 75, 100, 150],
+            'max_units': [1, 2, 3, 4],
+            'slippage': [0.25, 0.5, 1.0]
+        }
+        start = time.perf_counter()
+        results = run_sweep(np.asarray(records), 'ladder_breakout', param_grid)
+        elapsed = time.perf_counter() - start
+        print(f"{len(results)} combinations over {len(records)} bars in {elapsed:.2f}s")
+        print(results.head(10))
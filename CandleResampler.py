@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+from datetime import time
+from typing import Dict, Optional, Tuple
+from LoginTesting import CandleDataHandler, MARKET_TZ
+
+# Bar size in minutes for each SmartAPI interval (None means one bar per session)
+INTERVAL_MINUTES = {
+    "ONE_MINUTE": 1,
+    "THREE_MINUTE": 3,
+    "FIVE_MINUTE": 5,
+    "TEN_MINUTE": 10,
+    "FIFTEEN_MINUTE": 15,
+    "THIRTY_MINUTE": 30,
+    "ONE_HOUR": 60,
+    "ONE_DAY": None
+}
+
+NSE_SESSION_OPEN = time(9, 15)
+MCX_SESSION_OPEN = time(9, 0)
+
+_MINUTE_NS = 60 * 1_000_000_000
+_DAY_NS = 24 * 60 * _MINUTE_NS
+# Asia/Kolkata has a fixed +05:30 offset (no DST)
+_IST_OFFSET_NS = (5 * 60 + 30) * _MINUTE_NS
+
+
+def resample_candles(candle_df: pd.DataFrame, interval: str,
+                     session_open: time = NSE_SESSION_OPEN) -> pd.DataFrame:
+    """Resample typed 1-minute candles to a higher SmartAPI interval
+
+    Buckets are aligned to the session open of each trading day (09:15 for
+    NSE), so a FIFTEEN_MINUTE bar covers 09:15-09:29, 09:30-09:44, ... and a
+    ONE_HOUR bar covers 09:15-10:14, matching the broker's own candles. Bars
+    never span two sessions. ONE_DAY bars are stamped at 00:00 local time.
+
+    Args:
+        candle_df: Typed 1-minute frame (see CandleDataHandler.to_typed_frame)
+        interval: Target interval name (THREE_MINUTE, ONE_HOUR, ONE_DAY, ...)
+        session_open: Session open time used for bucket alignment
+
+    Returns:
+        Typed candle frame at the requested interval
+    """
+    if interval not in INTERVAL_MINUTES:
+        raise ValueError(f"Unsupported interval: {interval}")
+
+    if candle_df is None or candle_df.empty:
+        return CandleDataHandler.to_typed_frame([])
+
+    if not candle_df['timestamp'].is_monotonic_increasing:
+        candle_df = candle_df.sort_values('timestamp', kind='stable')
+
+    arrays = CandleDataHandler.to_arrays(candle_df)
+    local_ns = arrays.timestamp + _IST_OFFSET_NS
+    day = local_ns // _DAY_NS
+    bar_minutes = INTERVAL_MINUTES[interval]
+
+    if bar_minutes is None:
+        key = day
+        bar_local_ns = day * _DAY_NS
+    else:
+        open_minute = session_open.hour * 60 + session_open.minute
+        offset = (local_ns % _DAY_NS) // _MINUTE_NS - open_minute
+        bucket_start = (offset // bar_minutes) * bar_minutes
+        # Shift into a positive range so (day, bucket) packs into one int64
+        key = day * 4096 + (bucket_start + 2048)
+        bar_local_ns = day * _DAY_NS + (open_minute + bucket_start) * _MINUTE_NS
+
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    ends = np.r_[starts[1:], len(key)] - 1
+
+    resampled = pd.DataFrame({
+        'timestamp': pd.to_datetime(bar_local_ns[starts] - _IST_OFFSET_NS, utc=True),
+        'open': arrays.open[starts],
+        'high': np.maximum.reduceat(arrays.high, starts),
+        'low': np.minimum.reduceat(arrays.low, starts),
+        'close': arrays.close[ends],
+        'volume': np.add.reduceat(arrays.volume, starts)
+    })
+    resampled['timestamp'] = resampled['timestamp'].dt.tz_convert(
+        MARKET_TZ).astype(f'datetime64[ns, {MARKET_TZ}]')
+    return resampled
+
+
+class CandleResampler:
+    """Holds 1-minute candles per token and serves cached higher timeframes"""
+
+    def __init__(self, session_open: time = NSE_SESSION_OPEN):
+        self.session_open = session_open
+        self._base: Dict[str, pd.DataFrame] = {}
+        self._session_opens: Dict[str, time] = {}
+        self._cache: Dict[Tuple[str, str], pd.DataFrame] = {}
+
+    def set_candles(self, token: str, candle_df: pd.DataFrame,
+                    session_open: Optional[time] = None) -> None:
+        """Store the 1-minute candles for a token, replacing any previous ones"""
+        token = str(token)
+        self._base[token] = candle_df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+        if session_open is not None:
+            self._session_opens[token] = session_open
+        self._invalidate(token)
+
+    def append_candles(self, token: str, candle_df: pd.DataFrame) -> None:
+        """Append newer 1-minute candles for a token (later rows win on duplicates)"""
+        token = str(token)
+        existing = self._base.get(token)
+        if existing is None:
+            self.set_candles(token, candle_df)
+            return
+
+        combined = pd.concat([existing, candle_df], ignore_index=True)
+        combined = combined.drop_duplicates('timestamp', keep='last')
+        self._base[token] = combined.sort_values('timestamp', kind='stable').reset_index(drop=True)
+        self._invalidate(token)
+
+    def get_candles(self, token: str, interval: str = "ONE_MINUTE") -> pd.DataFrame:
+        """Return candles for a token at the requested interval, using the cache
+
+        Each caller gets its own copy, so mutating the result never changes
+        the stored or cached candles.
+        """
+        token = str(token)
+        base = self._base.get(token)
+        if base is None:
+            return CandleDataHandler.to_typed_frame([])
+
+        if interval == "ONE_MINUTE":
+            return base.copy()
+
+        cache_key = (token, interval)
+        cached = self._cache.get(cache_key)
+        if cached is None:
+            session_open = self._session_opens.get(token, self.session_open)
+            cached = resample_candles(base, interval, session_open)
+            self._cache[cache_key] = cached
+        return cached.copy()
+
+    def tokens(self):
+        """Return the tokens that have 1-minute candles loaded"""
+        return list(self._base.keys())
+
+    def clear(self) -> None:
+        """Drop all stored candles and cached timeframes"""
+        self._base.clear()
+        self._session_opens.clear()
+        self._cache.clear()
+
+    def _invalidate(self, token: str) -> None:
+        for cache_key in [k for k in self._cache if k[0] == token]:
+            del self._cache[cache_key]
+
+
+# Execution starts here
+if __name__ == "__main__":
+    from LoginTesting import LoginManager
+
+    login_manager = LoginManager()
+    session_data = login_manager.login()
+    if session_data['status'] == 'success':
+        historic_param = {
+            "exchange": "NFO",
+            "symboltoken": "54683",
+            "interval": "ONE_MINUTE",
+            "fromdate": "2025-03-28 09:15",
+            "todate": "2025-04-01 15:30"
+        }
+        minute_df = login_manager.get_data_manager().get_historical_data(historic_param, typed=True)
+
+        resampler = CandleResampler()
+        resampler.set_candles(historic_param['symboltoken'], minute_df)
+        for interval in INTERVAL_MINUTES:
+            candles = resampler.get_candles(historic_param['symboltoken'], interval)
+            print(f"\n{interval}:")
+            print(CandleDataHandler.format_timestamps(candles))
+    else:
+        print("Authentication failed - cannot fetch candles")
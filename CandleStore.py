@@ -0,0 +1,100 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+from LoginTesting import CandleDataHandler, CANDLE_COLUMNS, MARKET_TZ
+
+# On-disk record layout for one candle; files are plain .npy so they can be memory mapped
+CANDLE_DTYPE = np.dtype([
+    ('timestamp', 'i8'),  # epoch nanoseconds (UTC)
+    ('open', 'f4'),
+    ('high', 'f4'),
+    ('low', 'f4'),
+    ('close', 'f4'),
+    ('volume', 'i8')
+])
+
+DEFAULT_STORE_DIR = os.path.join('data', 'candles')
+
+
+class CandleStore:
+    """Stores typed candles locally as one .npy file per exchange/interval/token"""
+
+    def __init__(self, root_dir: str = DEFAULT_STORE_DIR):
+        self.root_dir = root_dir
+
+    def path_for(self, exchange: str, interval: str, token: str) -> str:
+        return os.path.join(self.root_dir, exchange, interval, f'{token}.npy')
+
+    @staticmethod
+    def to_records(candle_df: pd.DataFrame) -> np.ndarray:
+        """Pack a typed candle frame into a CANDLE_DTYPE record array"""
+        arrays = CandleDataHandler.to_arrays(candle_df)
+        records = np.empty(len(candle_df), dtype=CANDLE_DTYPE)
+        for column in CANDLE_COLUMNS:
+            records[column] = getattr(arrays, column)
+        return records
+
+    @staticmethod
+    def to_frame(records: np.ndarray) -> pd.DataFrame:
+        """Unpack a CANDLE_DTYPE record array into a typed candle frame"""
+        candle_df = pd.DataFrame({column: records[column] for column in CANDLE_COLUMNS})
+        candle_df['timestamp'] = pd.to_datetime(
+            candle_df['timestamp'], utc=True).dt.tz_convert(MARKET_TZ).astype(f'datetime64[ns, {MARKET_TZ}]')
+        return candle_df
+
+    def save(self, exchange: str, interval: str, token: str, candle_df: pd.DataFrame,
+             merge: bool = True) -> str:
+        """Write candles for a token, merging with what is already stored by default
+
+        Rows are kept sorted by timestamp; on overlap the new rows win.
+        """
+        path = self.path_for(exchange, interval, str(token))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        records = self.to_records(candle_df)
+        if merge and os.path.exists(path):
+            existing = np.load(path)
+            keep = ~np.isin(existing['timestamp'], records['timestamp'])
+            records = np.concatenate([existing[keep], records])
+        records = records[np.argsort(records['timestamp'], kind='stable')]
+
+        # Write to a temp file first so readers never see a partial file
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, records)
+        os.replace(tmp_path, path)
+        return path
+
+    def load_records(self, exchange: str, interval: str, token: str,
+                     mmap: bool = True) -> Optional[np.ndarray]:
+        """Return the stored record array (memory mapped by default), or None"""
+        path = self.path_for(exchange, interval, str(token))
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode='r' if mmap else None)
+
+    def load(self, exchange: str, interval: str, token: str,
+             fromdate: Optional[str] = None, todate: Optional[str] = None) -> pd.DataFrame:
+        """Return stored candles as a typed frame, optionally limited to a date range
+
+        fromdate/todate use the same 'YYYY-MM-DD HH:MM' format as getCandleData.
+        """
+        records = self.load_records(exchange, interval, token)
+        if records is None:
+            return pd.DataFrame(columns=CANDLE_COLUMNS)
+
+        timestamps = records['timestamp']
+        start, end = 0, len(records)
+        if fromdate:
+            start = np.searchsorted(timestamps, pd.Timestamp(fromdate, tz=MARKET_TZ).value, side='left')
+        if todate:
+            end = np.searchsorted(timestamps, pd.Timestamp(todate, tz=MARKET_TZ).value, side='right')
+        return self.to_frame(np.asarray(records[start:end]))
+
+    def tokens(self, exchange: str, interval: str) -> List[str]:
+        """List the tokens stored for an exchange/interval"""
+        folder = os.path.join(self.root_dir, exchange, interval)
+        if not os.path.isdir(folder):
+            return []
+        return sorted(name[:-4] for name in os.listdir(folder) if name.endswith('.npy'))
@@ -4,6 +4,10 @@ from datetime import date
 import matplotlib.pyplot as plt
 from collections import namedtuple
 from Login import LoginManager
+from Resilience import MASTER_LIST_URL, fetch_master_list_json
+from LoginTesting import CandleDataHandler
+from CandleStore import CandleStore
+from OHLCChart import draw_ohlc, render_ohlc, DEFAULT_MAX_POINTS
 
 # Define a namedtuple for the return type
 HistoricData = namedtuple(
@@ -28,9 +32,13 @@ class Symbols:
             print("Login required. Please initialize the Symbols.")
             return None
 
-        url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
+        url = MASTER_LIST_URL
         print(f"Fetching master list from {url}")
-        d = requests.get(url).json()
+        try:
+            d = fetch_master_list_json(url)
+        except Exception as e:
+            print(f"Error fetching master list: {str(e)}")
+            return None
         token_df = pd.DataFrame.from_dict(d)
         token_df['expiry'] = pd.to_datetime(
             token_df['expiry'], format='mixed').apply(lambda x: x.date())
@@ -78,9 +86,13 @@ class Symbols:
         # Return all values as a namedtuple
         return HistoricData(historicParam, symbol_value, historic_data)
 
-    def plot_ohlc_data(self, historicParam, symbol_value, historic_data):
+    def plot_ohlc_data(self, historicParam, symbol_value, historic_data, style='line',
+                       output_path=None, max_points=DEFAULT_MAX_POINTS):
         """
         This method plots the OHLC data.
+        - style: 'line' for the close price or 'candles' for candlesticks with volume.
+        - output_path: Write the chart to this file (.png/.svg) without a GUI instead of showing it.
+        - max_points: Long ranges are downsampled to at most this many candles/points.
         """
         if historic_data is None or historic_data.empty:
             print("No data to plot.")
@@ -106,15 +118,16 @@ class Symbols:
         # Default to the original interval if not found
         interval_value = interval_map.get(interval, interval)
 
-        plt.figure(figsize=(14, 7))
-        plt.plot(historic_data['timestamp'], historic_data['close'],
-                 label='Close Price', color='blue')
-        plt.title(
-            f'{interval_value} OHLC - {symbol_value}:{symboltoken} - {fromDate} to {toDate}')
-        plt.xlabel('Timestamp')
-        plt.ylabel('Price')
-        plt.legend()
-        plt.grid(True)
+        title = f'{interval_value} OHLC - {symbol_value}:{symboltoken} - {fromDate} to {toDate}'
+        if output_path:
+            render_ohlc(historic_data, output_path, title, style, max_points, volume=style == 'candles')
+            print(f"Chart saved to {output_path}")
+            return
+
+        fig = plt.figure(figsize=(14, 7))
+        candle_df = CandleDataHandler.to_typed_frame(historic_data)
+        draw_ohlc(fig, CandleStore.to_records(candle_df), title, style, max_points,
+                  volume=style == 'candles')
         plt.show()
 
 
@@ -0,0 +1,501 @@
+import numpy as np
+import pandas as pd
+from collections import deque
+from abc import ABC, abstractmethod
+from typing import Dict, List, Any, Optional
+
+# Indicator engine over typed candle frames (see LoginTesting.CandleDataHandler).
+#
+# Every indicator has a vectorized batch() for backfilling a full frame and an
+# update() that advances the same state by one bar in O(1). Both use identical
+# floating-point recurrences, so a backfill followed by N updates produces
+# exactly the same values as a backfill over all bars.
+
+
+def _ewm_step(prev: float, value: float, alpha: float) -> float:
+    """One step of an adjust=False exponential mean, matching pandas' ewm kernel"""
+    if prev != value:
+        old_wt = 1.0 - alpha
+        prev = (old_wt * prev + alpha * value) / (old_wt + alpha)
+    return prev
+
+
+def _ewm_batch(values: np.ndarray, alpha: float) -> np.ndarray:
+    return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+class Indicator(ABC):
+    """Abstract base class for an indicator with batch and incremental modes"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @property
+    def columns(self) -> List[str]:
+        """Output column names produced by this indicator"""
+        return [self.name]
+
+    @abstractmethod
+    def batch(self, candle_df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Compute the indicator over a whole frame and seed the incremental state"""
+        pass
+
+    @abstractmethod
+    def update(self, bar: Dict[str, Any], final: bool = True) -> Dict[str, float]:
+        """Advance by one bar in O(1)
+
+        With final=False the value is computed for a still-forming bar (e.g.
+        on each tick) without committing state, so the next call can revise it.
+        """
+        pass
+
+
+class SMA(Indicator):
+    """Simple moving average of close, via running prefix sums"""
+
+    def __init__(self, period: int = 20, name: Optional[str] = None):
+        super().__init__(name or f'sma_{period}')
+        self.period = period
+        self._reset()
+
+    def _reset(self):
+        self._origin = None
+        self._total = 0.0
+        self._totals = deque([0.0], maxlen=self.period + 1)
+        self._count = 0
+
+    def batch(self, candle_df):
+        self._reset()
+        close = candle_df['close'].to_numpy(dtype='float64')
+        n = self.period
+        result = np.full(len(close), np.nan)
+        if len(close) == 0:
+            return {self.name: result}
+
+        self._origin = close[0]
+        prefix = np.r_[0.0, np.cumsum(close - self._origin)]
+        if len(close) >= n:
+            result[n - 1:] = self._origin + (prefix[n:] - prefix[:-n]) / n
+
+        self._total = prefix[-1]
+        self._totals = deque(prefix[-(n + 1):], maxlen=n + 1)
+        self._count = len(close)
+        return {self.name: result}
+
+    def update(self, bar, final=True):
+        close = float(bar['close'])
+        origin = close if self._origin is None else self._origin
+        total = self._total + (close - origin)
+        count = self._count + 1
+        value = np.nan
+        if count >= self.period:
+            # _totals[-period] is the prefix sum just before the window starts
+            value = origin + (total - self._totals[-self.period]) / self.period
+        if final:
+            self._origin = origin
+            self._total = total
+            self._totals.append(total)
+            self._count = count
+        return {self.name: value}
+
+
+class EMA(Indicator):
+    """Exponential moving average of close (span=period, adjust=False)"""
+
+    def __init__(self, period: int = 20, name: Optional[str] = None):
+        super().__init__(name or f'ema_{period}')
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self._value = None
+
+    def batch(self, candle_df):
+        close = candle_df['close'].to_numpy(dtype='float64')
+        result = _ewm_batch(close, self.alpha)
+        self._value = result[-1] if len(result) else None
+        return {self.name: result}
+
+    def update(self, bar, final=True):
+        close = float(bar['close'])
+        value = close if self._value is None else _ewm_step(self._value, close, self.alpha)
+        if final:
+            self._value = value
+        return {self.name: value}
+
+
+class VWAP(Indicator):
+    """Session-anchored volume weighted average price of the typical price"""
+
+    def __init__(self, name: str = 'vwap'):
+        super().__init__(name)
+        self._session = None
+        self._pv = 0.0
+        self._volume = 0.0
+
+    @staticmethod
+    def _typical(high, low, close):
+        return (high + low + close) / 3.0
+
+    def batch(self, candle_df):
+        typical = self._typical(candle_df['high'].to_numpy(dtype='float64'),
+                                candle_df['low'].to_numpy(dtype='float64'),
+                                candle_df['close'].to_numpy(dtype='float64'))
+        volume = candle_df['volume'].to_numpy(dtype='float64')
+        session = candle_df['timestamp'].dt.date.to_numpy()
+
+        # Running sums restart at each session; np.cumsum adds sequentially,
+        # exactly as update() does
+        pv = typical * volume
+        cum_pv = np.empty(len(pv))
+        cum_volume = np.empty(len(volume))
+        starts = np.flatnonzero(np.r_[True, session[1:] != session[:-1]])
+        for start, end in zip(starts, np.r_[starts[1:], len(pv)]):
+            cum_pv[start:end] = np.cumsum(pv[start:end])
+            cum_volume[start:end] = np.cumsum(volume[start:end])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = cum_pv / cum_volume
+
+        if len(result):
+            self._session = session[-1]
+            self._pv = cum_pv[-1]
+            self._volume = cum_volume[-1]
+        return {self.name: result}
+
+    def update(self, bar, final=True):
+        session = pd.Timestamp(bar['timestamp']).date()
+        pv, volume = (self._pv, self._volume) if session == self._session else (0.0, 0.0)
+        bar_volume = float(bar['volume'])
+        pv = pv + self._typical(float(bar['high']), float(bar['low']), float(bar['close'])) * bar_volume
+        volume = volume + bar_volume
+        value = pv / volume if volume else np.nan
+        if final:
+            self._session, self._pv, self._volume = session, pv, volume
+        return {self.name: value}
+
+
+class RSI(Indicator):
+    """Relative strength index with Wilder smoothing (alpha = 1/period)"""
+
+    def __init__(self, period: int = 14, name: Optional[str] = None):
+        super().__init__(name or f'rsi_{period}')
+        self.period = period
+        self.alpha = 1.0 / period
+        self._reset()
+
+    def _reset(self):
+        self._prev_close = None
+        self._avg_gain = None
+        self._avg_loss = None
+        self._count = 0
+
+    @staticmethod
+    def _rsi(avg_gain, avg_loss):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+    def batch(self, candle_df):
+        self._reset()
+        close = candle_df['close'].to_numpy(dtype='float64')
+        result = np.full(len(close), np.nan)
+        if len(close) < 2:
+            self._prev_close = close[-1] if len(close) else None
+            return {self.name: result}
+
+        delta = np.diff(close)
+        avg_gain = _ewm_batch(np.maximum(delta, 0.0), self.alpha)
+        avg_loss = _ewm_batch(np.maximum(-delta, 0.0), self.alpha)
+        result[1:] = self._rsi(avg_gain, avg_loss)
+        result[:self.period] = np.nan
+
+        self._prev_close = close[-1]
+        self._avg_gain = avg_gain[-1]
+        self._avg_loss = avg_loss[-1]
+        self._count = len(delta)
+        return {self.name: result}
+
+    def update(self, bar, final=True):
+        close = float(bar['close'])
+        if self._prev_close is None:
+            if final:
+                self._prev_close = close
+            return {self.name: np.nan}
+
+        delta = close - self._prev_close
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        if self._avg_gain is None:
+            avg_gain, avg_loss = gain, loss
+        else:
+            avg_gain = _ewm_step(self._avg_gain, gain, self.alpha)
+            avg_loss = _ewm_step(self._avg_loss, loss, self.alpha)
+        count = self._count + 1
+        value = float(self._rsi(avg_gain, avg_loss)) if count >= self.period else np.nan
+        if final:
+            self._prev_close, self._avg_gain, self._avg_loss, self._count = close, avg_gain, avg_loss, count
+        return {self.name: value}
+
+
+class ATR(Indicator):
+    """Average true range with Wilder smoothing (alpha = 1/period)"""
+
+    def __init__(self, period: int = 14, name: Optional[str] = None):
+        super().__init__(name or f'atr_{period}')
+        self.period = period
+        self.alpha = 1.0 / period
+        self._reset()
+
+    def _reset(self):
+        self._prev_close = None
+        self._atr = None
+        self._count = 0
+
+    @staticmethod
+    def true_range(high, low, prev_close):
+        """Vectorized true range; the first bar (no previous close) uses high - low"""
+        prev_close = np.r_[np.nan, prev_close]
+        ranges = np.vstack([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+        return np.nanmax(ranges, axis=0)
+
+    def batch(self, candle_df):
+        self._reset()
+        high = candle_df['high'].to_numpy(dtype='float64')
+        low = candle_df['low'].to_numpy(dtype='float64')
+        close = candle_df['close'].to_numpy(dtype='float64')
+        if len(close) == 0:
+            return {self.name: np.array([])}
+
+        true_range = self.true_range(high, low, close[:-1])
+        smoothed = _ewm_batch(true_range, self.alpha)
+
+        self._prev_close = close[-1]
+        self._atr = smoothed[-1]
+        self._count = len(close)
+
+        result = smoothed.copy()
+        result[:self.period - 1] = np.nan
+        return {self.name: result}
+
+    def step(self, high: float, low: float, close: float):
+        """Return (atr, committed_state) for one bar without changing state"""
+        if self._prev_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - self._prev_close), abs(low - self._prev_close))
+        atr = true_range if self._atr is None else _ewm_step(self._atr, true_range, self.alpha)
+        count = self._count + 1
+        value = atr if count >= self.period else np.nan
+        return value, (close, atr, count)
+
+    def commit(self, state) -> None:
+        self._prev_close, self._atr, self._count = state
+
+    def update(self, bar, final=True):
+        value, state = self.step(float(bar['high']), float(bar['low']), float(bar['close']))
+        if final:
+            self.commit(state)
+        return {self.name: value}
+
+
+class BollingerBands(Indicator):
+    """Bollinger bands over close (population standard deviation)"""
+
+    def __init__(self, period: int = 20, num_std: float = 2.0, name: str = 'bb'):
+        super().__init__(name)
+        self.period = period
+        self.num_std = num_std
+        self._reset()
+
+    @property
+    def columns(self):
+        return [f'{self.name}_mid', f'{self.name}_upper', f'{self.name}_lower']
+
+    def _reset(self):
+        self._origin = None
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._sums = deque([(0.0, 0.0)], maxlen=self.period + 1)
+        self._count = 0
+
+    def _bands(self, window_sum, window_sum_sq):
+        n = self.period
+        mean = window_sum / n
+        std = np.sqrt(np.maximum(window_sum_sq / n - mean * mean, 0.0))
+        mid = self._origin + mean
+        return mid, mid + self.num_std * std, mid - self.num_std * std
+
+    def batch(self, candle_df):
+        self._reset()
+        close = candle_df['close'].to_numpy(dtype='float64')
+        n = self.period
+        mid, upper, lower = (np.full(len(close), np.nan) for _ in range(3))
+        if len(close) == 0:
+            return dict(zip(self.columns, (mid, upper, lower)))
+
+        # Accumulate around the first close to keep the running sums small
+        self._origin = close[0]
+        shifted = close - self._origin
+        prefix = np.r_[0.0, np.cumsum(shifted)]
+        prefix_sq = np.r_[0.0, np.cumsum(shifted * shifted)]
+        if len(close) >= n:
+            mid[n - 1:], upper[n - 1:], lower[n - 1:] = self._bands(
+                prefix[n:] - prefix[:-n], prefix_sq[n:] - prefix_sq[:-n])
+
+        self._sum, self._sum_sq = prefix[-1], prefix_sq[-1]
+        self._sums = deque(zip(prefix[-(n + 1):], prefix_sq[-(n + 1):]), maxlen=n + 1)
+        self._count = len(close)
+        return dict(zip(self.columns, (mid, upper, lower)))
+
+    def update(self, bar, final=True):
+        close = float(bar['close'])
+        if self._origin is None:
+            if not final:
+                return dict(zip(self.columns, (np.nan, np.nan, np.nan)))
+            self._origin = close
+        shifted = close - self._origin
+        total = self._sum + shifted
+        total_sq = self._sum_sq + shifted * shifted
+        count = self._count + 1
+        bands = (np.nan, np.nan, np.nan)
+        if count >= self.period:
+            start_sum, start_sum_sq = self._sums[-self.period]
+            bands = tuple(float(v) for v in self._bands(total - start_sum, total_sq - start_sum_sq))
+        if final:
+            self._sum, self._sum_sq, self._count = total, total_sq, count
+            self._sums.append((total, total_sq))
+        return dict(zip(self.columns, bands))
+
+
+class Supertrend(Indicator):
+    """Supertrend over Wilder ATR; direction is 1 for uptrend, -1 for downtrend"""
+
+    def __init__(self, period: int = 10, multiplier: float = 3.0, name: str = 'supertrend'):
+        super().__init__(name)
+        self.period = period
+        self.multiplier = multiplier
+        self._atr = ATR(period)
+        self._reset()
+
+    @property
+    def columns(self):
+        return [self.name, f'{self.name}_direction']
+
+    def _reset(self):
+        self._prev_close = None
+        self._upper = np.nan
+        self._lower = np.nan
+        self._direction = 1
+
+    def _step(self, high, low, close, atr):
+        """Band ratchet for one bar; returns (line, direction, state)"""
+        if np.isnan(atr):
+            return np.nan, np.nan, (close, np.nan, np.nan, self._direction)
+
+        hl2 = (high + low) / 2.0
+        basic_upper = hl2 + self.multiplier * atr
+        basic_lower = hl2 - self.multiplier * atr
+        prev_close = self._prev_close
+
+        if np.isnan(self._upper) or basic_upper < self._upper or prev_close > self._upper:
+            upper = basic_upper
+        else:
+            upper = self._upper
+        if np.isnan(self._lower) or basic_lower > self._lower or prev_close < self._lower:
+            lower = basic_lower
+        else:
+            lower = self._lower
+
+        direction = self._direction
+        if direction == 1 and close < lower:
+            direction = -1
+        elif direction == -1 and close > upper:
+            direction = 1
+        line = lower if direction == 1 else upper
+        return line, direction, (close, upper, lower, direction)
+
+    def _commit(self, state):
+        self._prev_close, self._upper, self._lower, self._direction = state
+
+    def batch(self, candle_df):
+        self._reset()
+        atr = self._atr.batch(candle_df)[self._atr.name]
+        high = candle_df['high'].to_numpy(dtype='float64')
+        low = candle_df['low'].to_numpy(dtype='float64')
+        close = candle_df['close'].to_numpy(dtype='float64')
+
+        # The band ratchet is path dependent, so it is walked bar by bar
+        line = np.full(len(close), np.nan)
+        direction = np.full(len(close), np.nan)
+        for i in range(len(close)):
+            line[i], direction[i], state = self._step(high[i], low[i], close[i], atr[i])
+            self._commit(state)
+        return dict(zip(self.columns, (line, direction)))
+
+    def update(self, bar, final=True):
+        high, low, close = float(bar['high']), float(bar['low']), float(bar['close'])
+        atr, atr_state = self._atr.step(high, low, close)
+        line, direction, state = self._step(high, low, close, atr)
+        if final:
+            self._atr.commit(atr_state)
+            self._commit(state)
+        return dict(zip(self.columns, (line, direction)))
+
+
+class IndicatorEngine:
+    """Runs a set of indicators for one instrument: batch backfill, then O(1) updates"""
+
+    def __init__(self, indicators: Optional[List[Indicator]] = None):
+        self.indicators = indicators if indicators is not None else self.default_indicators()
+        self.latest: Dict[str, float] = {}
+
+    @staticmethod
+    def default_indicators() -> List[Indicator]:
+        return [SMA(20), EMA(9), EMA(21), VWAP(), RSI(14), ATR(14),
+                Supertrend(10, 3.0), BollingerBands(20, 2.0)]
+
+    def backfill(self, candle_df: pd.DataFrame) -> pd.DataFrame:
+        """Compute all indicators over a typed candle frame
+
+        Returns:
+            The candle frame with one extra column per indicator output
+        """
+        result_df = candle_df.copy()
+        for indicator in self.indicators:
+            for column, values in indicator.batch(candle_df).items():
+                result_df[column] = values
+        if not result_df.empty:
+            last = result_df.iloc[-1]
+            self.latest = {column: last[column] for indicator in self.indicators
+                           for column in indicator.columns}
+        return result_df
+
+    def update(self, bar: Dict[str, Any], final: bool = True) -> Dict[str, float]:
+        """Advance every indicator by one closed bar (or a forming bar with final=False)"""
+        values: Dict[str, float] = {}
+        for indicator in self.indicators:
+            values.update(indicator.update(bar, final))
+        if final:
+            self.latest = values
+        return values
+
+
+# Execution starts here
+if __name__ == "__main__":
+    from LoginTesting import LoginManager
+
+    login_manager = LoginManager()
+    session_data = login_manager.login()
+    if session_data['status'] == 'success':
+        historic_param = {
+            "exchange": "NSE",
+            "symboltoken": "99926000",
+            "interval": "ONE_MINUTE",
+            "fromdate": "2025-03-28 09:15",
+            "todate": "2025-04-01 15:30"
+        }
+        candle_df = login_manager.get_data_manager().get_historical_data(historic_param, typed=True)
+
+        # Backfill all but the last bar, then stream the last bar incrementally
+        engine = IndicatorEngine()
+        backfilled = engine.backfill(candle_df.iloc[:-1])
+        print(backfilled.tail())
+        print("\nIncremental update:", engine.update(candle_df.iloc[-1].to_dict()))
+    else:
+        print("Authentication failed - cannot fetch candles")
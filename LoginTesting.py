@@ -1,30 +1,51 @@
 import os
 import pyotp
 import pandas as pd
-import requests
+from collections import namedtuple
 from dotenv import load_dotenv
 from SmartApi.smartConnect import SmartConnect
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, Callable
+from Resilience import ResiliencePolicy, MASTER_LIST_URL, shared_http_session
+from QuoteCache import QuoteCache
+from RiskEngine import RiskEngine
+
+# Exchange timezone for candle timestamps
+MARKET_TZ = 'Asia/Kolkata'
+
+CANDLE_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+# Zero-copy NumPy views over a typed candle frame
+CandleArrays = namedtuple("CandleArrays", CANDLE_COLUMNS)
+
+
+def call_with_policy(policy: Optional[ResiliencePolicy], endpoint: str,
+                     fn: Callable[[], Any], idempotent: bool = True) -> Any:
+    """Run fn through the resilience policy if one is configured"""
+    if policy is None:
+        return fn()
+    return policy.call(endpoint, fn, idempotent)
 
 
 class CredentialsManager:
     """Handles loading and managing credentials from environment variables"""
 
-    def __init__(self):
+    def __init__(self, prefix: str = ''):
         load_dotenv()  # Load environment variables from .env file
+        # Optional prefix for multi-account setups, e.g. 'ACC1_' reads ACC1_API_KEY
+        self.prefix = prefix
 
     def get_api_key(self) -> str:
-        return os.getenv('API_KEY')
+        return os.getenv(f'{self.prefix}API_KEY')
 
     def get_username(self) -> str:
-        return os.getenv('USERNAME')
+        return os.getenv(f'{self.prefix}USERNAME')
 
     def get_pin(self) -> str:
-        return os.getenv('PIN')
+        return os.getenv(f'{self.prefix}PIN')
 
     def get_totp_token(self) -> str:
-        return os.getenv('TOTP_TOKEN')
+        return os.getenv(f'{self.prefix}TOTP_TOKEN')
 
 
 class Authenticator(ABC):
@@ -102,23 +123,34 @@ class SessionDataHandler:
 class OrderManager:
     """Handles order placement and management"""
 
-    def __init__(self, smart_connect: SmartConnect):
+    def __init__(self, smart_connect: SmartConnect, policy: Optional[ResiliencePolicy] = None,
+                 risk_engine: Optional[RiskEngine] = None, account: str = 'default'):
         self.smart_connect = smart_connect
+        self.policy = policy
+        self.risk_engine = risk_engine
+        self.account = account
 
     def place_order(self, order_params: Dict[str, Any]) -> Dict[str, Any]:
         """Place an order and return both order ID and full response"""
+        check = None
+        if self.risk_engine is not None:
+            self._seed_reference_price(order_params)
+            # Pre-trade checks run in memory; a rejected order never reaches the broker
+            check = self.risk_engine.check(order_params, self.account)
+            if not check.approved:
+                return {
+                    'status': 'rejected',
+                    'order_id': None,
+                    'full_response': None,
+                    'message': '; '.join(check.reasons)
+                }
         try:
             # SmartConnect.placeOrder
             # order_id = self.smart_connect.placeOrder(order_params)
-            full_response = self.smart_connect.placeOrderFullResponse(
-                order_params)
-
-            return {
-                'status': 'success',
-                # 'order_id': order_id,
-                'full_response': full_response,
-                'message': 'Order placed successfully'
-            }
+            # Orders are never retried; the policy only applies the circuit breaker
+            full_response = call_with_policy(
+                self.policy, 'placeOrder',
+                lambda: self.smart_connect.placeOrderFullResponse(order_params), idempotent=False)
         except Exception as e:
             return {
                 'status': 'error',
@@ -127,14 +159,119 @@ class OrderManager:
                 'message': str(e)
             }
 
+        if not (isinstance(full_response, dict) and full_response.get('status')):
+            message = full_response.get('message') if isinstance(full_response, dict) else None
+            return {
+                'status': 'error',
+                'order_id': None,
+                'full_response': full_response,
+                'message': message or 'Order rejected by broker'
+            }
+        if check is not None:
+            # Only broker-accepted orders count toward rate and exposure limits
+            self.risk_engine.record_order(self.account, order_params, check)
+        return {
+            'status': 'success',
+            'order_id': (full_response.get('data') or {}).get('orderid'),
+            'full_response': full_response,
+            'message': 'Order placed successfully'
+        }
+
+    def _seed_reference_price(self, order_params: Dict[str, Any]) -> None:
+        """Centre the price band on the LTP the first time an instrument is traded
+
+        Without a reference price the risk check rejects the order, so a failed
+        LTP lookup simply leaves it rejected.
+        """
+        instrument = self.risk_engine.lookup(order_params)
+        if instrument is None or instrument.ref_price is not None:
+            return
+        try:
+            response = call_with_policy(self.policy, 'ltpData', lambda: self.smart_connect.ltpData(
+                instrument.exchange, instrument.symbol, instrument.token))
+            if response and response.get('status'):
+                self.risk_engine.set_reference_price(instrument.exchange, instrument.token,
+                                                     float(response['data']['ltp']))
+        except Exception as e:
+            print(f"Error fetching reference price for {instrument.symbol}: {str(e)}")
+
+
+class CandleDataHandler:
+    """Handles conversion of raw candle rows into typed DataFrames"""
+
+    @staticmethod
+    def to_typed_frame(rows: Any) -> pd.DataFrame:
+        """Build a typed candle frame from raw getCandleData rows
+
+        Timestamps are kept as tz-aware datetime64[ns, Asia/Kolkata], prices
+        as float32 and volume as int64. No string formatting is done here.
+        """
+        candle_df = pd.DataFrame(rows, columns=CANDLE_COLUMNS)
+        candle_df['timestamp'] = CandleDataHandler.to_market_time(
+            candle_df['timestamp']).astype(f'datetime64[ns, {MARKET_TZ}]')
+        candle_df = candle_df.astype({
+            'open': 'float32',
+            'high': 'float32',
+            'low': 'float32',
+            'close': 'float32',
+            'volume': 'int64'
+        })
+        return candle_df
+
+    @staticmethod
+    def to_market_time(values: pd.Series) -> pd.Series:
+        """Timestamps in IST: values with an offset are converted, naive ones are taken as IST
+
+        getCandleData returns '2025-03-21T09:15:00+05:30', while
+        get_historical_data's default frames hold naive '2025-03-21 09:15' IST strings.
+        """
+        if isinstance(values.dtype, pd.DatetimeTZDtype):
+            return values.dt.tz_convert(MARKET_TZ)
+        if pd.api.types.is_datetime64_dtype(values.dtype):
+            return values.dt.tz_localize(MARKET_TZ)
+        strings = values.astype(str)
+        has_offset = strings.str.contains(r'(?:[+-]\d{2}:?\d{2}|Z)$', regex=True)
+        if has_offset.all():
+            return pd.to_datetime(strings, utc=True).dt.tz_convert(MARKET_TZ)
+        if not has_offset.any():
+            return pd.to_datetime(strings, format='mixed').dt.tz_localize(MARKET_TZ)
+        result = pd.Series(pd.NaT, index=values.index, dtype=f'datetime64[ns, {MARKET_TZ}]')
+        result[has_offset] = pd.to_datetime(strings[has_offset], utc=True).dt.tz_convert(MARKET_TZ)
+        result[~has_offset] = pd.to_datetime(strings[~has_offset], format='mixed').dt.tz_localize(MARKET_TZ)
+        return result
+
+    @staticmethod
+    def to_arrays(candle_df: pd.DataFrame) -> CandleArrays:
+        """Return zero-copy NumPy views of a typed candle frame
+
+        The timestamp view is int64 nanoseconds since the Unix epoch (UTC).
+        """
+        timestamps = candle_df['timestamp'].dt.as_unit('ns').array.asi8
+        return CandleArrays(
+            timestamps,
+            candle_df['open'].to_numpy(copy=False),
+            candle_df['high'].to_numpy(copy=False),
+            candle_df['low'].to_numpy(copy=False),
+            candle_df['close'].to_numpy(copy=False),
+            candle_df['volume'].to_numpy(copy=False)
+        )
+
+    @staticmethod
+    def format_timestamps(candle_df: pd.DataFrame, fmt: str = '%Y-%m-%d %H:%M') -> pd.DataFrame:
+        """Return a copy of the frame with string timestamps, for display only"""
+        display_df = candle_df.copy()
+        display_df['timestamp'] = display_df['timestamp'].dt.strftime(fmt)
+        return display_df
+
 
 class DataManager:
     """Handles market data fetching operations"""
 
-    def __init__(self, smart_connect: SmartConnect):
+    def __init__(self, smart_connect: SmartConnect, policy: Optional[ResiliencePolicy] = None):
         self.smart_connect = smart_connect
+        self.policy = policy
 
-    def get_historical_data(self, params: Dict[str, Any]) -> pd.DataFrame:
+    def get_historical_data(self, params: Dict[str, Any], typed: bool = False) -> pd.DataFrame:
         """Fetch historical candle data and return as DataFrame
 
         Args:
@@ -144,20 +281,23 @@ class DataManager:
                 - interval: Time interval (ONE_MINUTE, FIVE_MINUTE, etc.)
                 - fromdate: Start datetime (YYYY-MM-DD HH:MM)
                 - todate: End datetime (YYYY-MM-DD HH:MM)
+            typed: If True, keep tz-aware datetime64 timestamps and
+                float32/int64 OHLCV columns (see CandleDataHandler)
 
         Returns:
             pd.DataFrame with columns: ['timestamp', 'open', 'high', 'low', 'close', 'volume']
         """
         try:
-            res = self.smart_connect.getCandleData(params)
+            res = call_with_policy(self.policy, 'getCandleData',
+                                   lambda: self.smart_connect.getCandleData(params))
 
             if not res or 'data' not in res:
                 return pd.DataFrame()
 
-            hist_df = pd.DataFrame(
-                res['data'],
-                columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']
-            )
+            if typed:
+                return CandleDataHandler.to_typed_frame(res['data'])
+
+            hist_df = pd.DataFrame(res['data'], columns=CANDLE_COLUMNS)
 
             # Convert timestamp to datetime (uncomment if needed)
             hist_df['timestamp'] = pd.to_datetime(
@@ -173,35 +313,46 @@ class DataManager:
 class MasterList:
     """Handles fetching and processing of instrument master list"""
 
-    def __init__(self):
-        pass  # No URL stored in initialization
+    def __init__(self, http_session: Any = None, policy: Optional[ResiliencePolicy] = None):
+        # No URL stored in initialization; http_session defaults to the shared Resilience session
+        self.http_session = http_session or shared_http_session()
+        self.policy = policy
 
-    def fetch_master_list(self, url: str) -> pd.DataFrame:
-        """Fetch and process the master list of instruments from given URL"""
-        try:
-            print(f"\nFetching master list from {url}")
-            response = requests.get(url)
+    def download_master_list(self, url: str) -> pd.DataFrame:
+        """Download the raw instrument master list (no processing); raises on failure"""
+        def download():
+            response = self.http_session.get(url, timeout=60)
             response.raise_for_status()  # Raise exception for bad status codes
+            return response.json()
 
-            data = response.json()
-            token_df = pd.DataFrame.from_dict(data)
+        data = call_with_policy(self.policy, 'masterList', download)
+        return pd.DataFrame.from_dict(data)
 
-            # Process the data
-            token_df['expiry'] = pd.to_datetime(
-                token_df['expiry'], format='mixed').apply(lambda x: x.date())
-            token_df = token_df.astype({'strike': 'float64'})
+    @staticmethod
+    def process_master_list(token_df: pd.DataFrame) -> pd.DataFrame:
+        """Normalise expiry and strike columns of raw master-list rows"""
+        token_df = token_df.copy()
+        token_df['expiry'] = pd.to_datetime(
+            token_df['expiry'], format='mixed').apply(lambda x: x.date())
+        token_df = token_df.astype({'strike': 'float64'})
 
-            # Convert strike to float and then to int if it's a whole number
-            token_df['strike'] = pd.to_numeric(
-                token_df['strike'], errors='coerce')
-            token_df['strike'] = token_df['strike'].apply(
-                lambda x: int(x) if not pd.isna(x) and x.is_integer() else x
-            )
+        # Convert strike to float and then to int if it's a whole number
+        token_df['strike'] = pd.to_numeric(
+            token_df['strike'], errors='coerce')
+        token_df['strike'] = token_df['strike'].apply(
+            lambda x: int(x) if not pd.isna(x) and x.is_integer() else x
+        )
 
-            # Instead of converting to datetime, keep as string
-            token_df['expiry'] = token_df['expiry'].astype(str)
+        # Instead of converting to datetime, keep as string
+        token_df['expiry'] = token_df['expiry'].astype(str)
 
-            return token_df
+        return token_df
+
+    def fetch_master_list(self, url: str) -> pd.DataFrame:
+        """Fetch and process the master list of instruments from given URL"""
+        try:
+            print(f"\nFetching master list from {url}")
+            return self.process_master_list(self.download_master_list(url))
 
         except Exception as e:
             print(f"Error fetching master list: {str(e)}")
@@ -212,13 +363,28 @@ class MasterList:
 class OptionGreeksManager:
     """Handles fetching and processing of option Greeks data"""
     
-    def __init__(self, smart_connect: SmartConnect):
+    def __init__(self, smart_connect: SmartConnect, policy: Optional[ResiliencePolicy] = None,
+                 cache: Optional[QuoteCache] = None):
         self.smart_connect = smart_connect
-        
+        self.policy = policy
+        self.cache = cache
+
     def get_option_greeks(self, params: Dict[str, Any]) -> pd.DataFrame:
-        """Fetch option Greeks data and return as DataFrame"""
+        """Fetch option Greeks data and return as DataFrame
+
+        With a cache, requests for the same (name, expirydate) within the
+        'greeks' TTL share one API call; each caller gets its own copy.
+        """
+        if self.cache is None:
+            return self._fetch_option_greeks(params)
+
+        key = (params.get('name'), params.get('expirydate'))
+        return self.cache.get_or_load('greeks', key, lambda: self._fetch_option_greeks(params))
+
+    def _fetch_option_greeks(self, params: Dict[str, Any]) -> pd.DataFrame:
         try:
-            response = self.smart_connect.optionGreek(params)
+            response = call_with_policy(self.policy, 'optionGreek',
+                                        lambda: self.smart_connect.optionGreek(params))
             
             if not response or 'data' not in response:
                 return pd.DataFrame()
@@ -271,9 +437,27 @@ class OptionGreeksManager:
 class LoginManager:
     """Main class to coordinate the login process"""
 
-    def __init__(self):
+    def __init__(self, authenticator: Optional[Authenticator] = None, http_session: Any = None,
+                 policy: Optional[ResiliencePolicy] = None, cache: Optional[QuoteCache] = None,
+                 risk_engine: Optional[RiskEngine] = None, account: str = 'default'):
+        """
+        Args:
+            authenticator: Alternative authenticator (e.g. a recording or replaying one);
+                defaults to SmartApiAuthenticator with .env credentials
+            http_session: Object with a requests-style get() used for the master list
+            policy: Retry/circuit-breaker policy shared by all managers; defaults to
+                ResiliencePolicy() (see Resilience.py)
+            cache: Shared quote/Greeks cache; defaults to QuoteCache() (see QuoteCache.py)
+            risk_engine: Pre-trade checks applied to every order (see RiskEngine.py)
+            account: Name under which the risk engine tracks this session's positions
+        """
         self.credentials_manager = CredentialsManager()
-        self.authenticator = SmartApiAuthenticator(self.credentials_manager)
+        self.authenticator = authenticator or SmartApiAuthenticator(self.credentials_manager)
+        self.http_session = http_session
+        self.policy = policy or ResiliencePolicy()
+        self.cache = cache or QuoteCache()
+        self.risk_engine = risk_engine
+        self.account = account
         self.order_manager = None
         self.data_manager = None
         self.master_list_manager = None
@@ -284,14 +468,27 @@ class LoginManager:
         session_data = self.authenticator.authenticate()
 
         if session_data['status'] == 'success' and session_data['connection']:
-            self.order_manager = OrderManager(session_data['connection'])
-            self.data_manager = DataManager(session_data['connection'])
-            self.master_list_manager = MasterList()  # Initialize without URL
+            self.order_manager = OrderManager(session_data['connection'], self.policy,
+                                              self.risk_engine, self.account)
+            self.data_manager = DataManager(session_data['connection'], self.policy)
+            self.master_list_manager = MasterList(self.http_session, self.policy)  # Initialize without URL
             self.option_greeks_manager = OptionGreeksManager(
-                session_data['connection'])  # Add this line
+                session_data['connection'], self.policy, self.cache)  # Add this line
+            if self.risk_engine is not None:
+                self._load_risk_instruments()
 
         return session_data
 
+    def _load_risk_instruments(self) -> None:
+        """Precompute the risk engine's instrument limits from the master list (once per engine)"""
+        try:
+            count = self.risk_engine.ensure_instruments(
+                lambda: self.master_list_manager.download_master_list(MASTER_LIST_URL))
+            print(f"Risk limits loaded for {count} instruments")
+        except Exception as e:
+            # Orders for unknown instruments are rejected, so trading stays blocked
+            print(f"Error loading risk limits from the master list: {str(e)}")
+
     def get_order_manager(self) -> Optional[OrderManager]:
         """Get the order manager instance if authenticated"""
         return self.order_manager
@@ -304,6 +501,14 @@ class LoginManager:
         """Get the master list manager instance if authenticated"""
         return self.master_list_manager
 
+    def get_resilience_policy(self) -> ResiliencePolicy:
+        """Get the retry/circuit-breaker policy (its stats() shows attempt and outcome counters)"""
+        return self.policy
+
+    def get_quote_cache(self) -> QuoteCache:
+        """Get the shared quote/Greeks cache (its stats() shows hit/miss/coalesce counters)"""
+        return self.cache
+
     # Add this new method
     def get_option_greeks_manager(self) -> Optional[OptionGreeksManager]:
         """Get the option Greeks manager instance if authenticated"""
@@ -1,4 +1,5 @@
 from Login import LoginManager, SessionDataHandler
+from RiskEngine import RiskEngine
 
 def main():
     # Initialize and login
@@ -34,9 +35,33 @@ def main():
                     "quantity": "15"
                 }
                 
+                # Pre-trade checks; the price band is seeded once from the LTP and
+                # the checks themselves never call the broker
+                risk_engine = RiskEngine()
+                risk_engine.add_instrument("3045", "SBIN-EQ", "NSE", lot_size=1, tick_size=0.05, name="SBIN")
+                ltp_response = session_data['connection'].ltpData("NSE", "SBIN-EQ", "3045")
+                if not (ltp_response and ltp_response.get('status')):
+                    # Without a reference price there is no price band to check against
+                    print("\nOrder Aborted: could not fetch the LTP for the price band")
+                    return
+                risk_engine.set_reference_price("NSE", "3045", float(ltp_response['data']['ltp']))
+
+                check = risk_engine.check(order_params)
+                if not check.approved:
+                    print("\nOrder Rejected by Risk Checks:")
+                    for reason in check.reasons:
+                        print(f"  - {reason}")
+                    return
+
                 # Place the order directly using the connection
                 # order_id = session_data['connection'].placeOrder(order_params)
                 full_response = session_data['connection'].placeOrderFullResponse(order_params)
+                if not (full_response and full_response.get('status')):
+                    print("\nOrder Rejected by Broker:")
+                    print(full_response)
+                    return
+                # Only accepted orders count toward the rate and exposure limits
+                risk_engine.record_order('default', order_params, check)
                 
                 print("\nOrder Placement Successful!")
                 # print(f"Order ID: {order_id}")
@@ -8,14 +8,14 @@ global_order_response = None
 global_option_greeks = None 
 
 
-def main():
+def main(login_manager=None):
     global global_session_data, global_hist_data, global_master_list,global_order_response, global_option_greeks
 
     # Define the master list URL
     master_list_url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
 
-    # Initialize and login
-    login_manager = LoginManager()
+    # Initialize and login (a recording/replaying LoginManager can be passed in)
+    login_manager = login_manager or LoginManager()
     global_session_data = login_manager.login()
     SessionDataHandler.display(global_session_data)
 
@@ -116,4 +116,23 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    from RecordReplay import recording_login_manager, replay_login_manager
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--record', metavar='JOURNAL', help='record every API response to JOURNAL')
+    parser.add_argument('--replay', metavar='JOURNAL', help='serve API responses from JOURNAL (offline)')
+    parser.add_argument('--speed', type=float, default=None,
+                        help='replay speed factor (1 = recorded latency, default = no delay)')
+    args = parser.parse_args()
+
+    if args.record:
+        recording_manager, journal = recording_login_manager(args.record)
+        try:
+            main(recording_manager)
+        finally:
+            journal.close()
+    elif args.replay:
+        main(replay_login_manager(args.replay, args.speed))
+    else:
+        main()
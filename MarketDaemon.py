@@ -0,0 +1,474 @@
+import base64
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from typing import Dict, Any, Callable, Optional, Tuple
+import numpy as np
+import pandas as pd
+from LoginTesting import LoginManager, CandleDataHandler
+from CandleResampler import CandleResampler
+from CandleStore import CandleStore
+from Backfill import MAX_DAYS_PER_REQUEST
+from SymbolIndex import SymbolIndex
+from MasterListSync import MasterListCache, MasterListDiff, ExpiryCalendar, removed_keys
+
+# Resident market-data service with a local IPC API.
+#
+# The daemon logs in once and keeps the session, the master list with token
+# and symbol search indexes, and a candle cache in memory. Short-lived
+# scripts and notebooks query it through DaemonClient instead of logging in
+# and downloading the master list themselves.
+#
+# Wire format: every frame is a 1-byte codec id, a 4-byte big-endian length
+# and the encoded message. Requests are {'method': str, 'params': dict};
+# replies are {'ok': bool, 'result' | 'error': ...}. msgpack is used when
+# installed (pip install msgpack); otherwise JSON.
+
+DEFAULT_SOCKET_PATH = os.path.join('run', 'market_daemon.sock')
+DEFAULT_TCP_ADDRESS = ('127.0.0.1', 8765)
+# The scrip master is republished every morning before the open
+MASTER_LIST_REFRESH_HOUR = 8
+
+CODEC_JSON = 0
+CODEC_MSGPACK = 1
+_HEADER = struct.Struct('>BI')
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def _to_wire(value: Any, binary: bool) -> Any:
+    """Convert NumPy arrays and DataFrames into plain, codec-friendly structures"""
+    if isinstance(value, np.ndarray):
+        raw = np.ascontiguousarray(value).tobytes()
+        return {'__ndarray__': value.dtype.str, 'shape': list(value.shape),
+                'data': raw if binary else base64.b64encode(raw).decode('ascii')}
+    if isinstance(value, pd.DataFrame):
+        columns = {}
+        for column in value.columns:
+            series = value[column]
+            if isinstance(series.dtype, pd.DatetimeTZDtype):
+                columns[column] = {'__datetime__': str(series.dt.tz),
+                                   'ns': _to_wire(series.dt.as_unit('ns').array.asi8, binary)}
+            elif series.dtype == object:
+                columns[column] = [_to_wire(v, binary) for v in series.tolist()]
+            else:
+                columns[column] = _to_wire(series.to_numpy(), binary)
+        return {'__dataframe__': list(value.columns), 'columns': columns}
+    if isinstance(value, dict):
+        return {str(k): _to_wire(v, binary) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_wire(v, binary) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, (pd.Timestamp,)):
+        return value.isoformat()
+    return value
+
+
+def _from_wire(value: Any) -> Any:
+    if isinstance(value, dict):
+        if '__ndarray__' in value:
+            raw = value['data']
+            if isinstance(raw, str):
+                raw = base64.b64decode(raw)
+            return np.frombuffer(raw, dtype=np.dtype(value['__ndarray__'])).reshape(value['shape'])
+        if '__datetime__' in value:
+            return pd.to_datetime(_from_wire(value['ns']), utc=True).tz_convert(value['__datetime__'])
+        if '__dataframe__' in value:
+            return pd.DataFrame({column: _from_wire(value['columns'][column])
+                                 for column in value['__dataframe__']})
+        return {k: _from_wire(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_from_wire(v) for v in value]
+    return value
+
+
+def encode_frame(message: Any, codec: Optional[int] = None) -> bytes:
+    if codec is None:
+        codec = CODEC_MSGPACK if msgpack is not None else CODEC_JSON
+    if codec == CODEC_MSGPACK:
+        payload = msgpack.packb(_to_wire(message, binary=True), use_bin_type=True)
+    else:
+        payload = json.dumps(_to_wire(message, binary=False), separators=(',', ':'), default=str).encode('utf-8')
+    return _HEADER.pack(codec, len(payload)) + payload
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks = bytearray()
+    while len(chunks) < size:
+        chunk = sock.recv(size - len(chunks))
+        if not chunk:
+            return None
+        chunks.extend(chunk)
+    return bytes(chunks)
+
+
+def read_frame(sock: socket.socket) -> Optional[Tuple[int, Any]]:
+    """Read one frame; returns (codec, decoded message) or None on EOF"""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    codec, length = _HEADER.unpack(header)
+    payload = _recv_exact(sock, length)
+    if payload is None:
+        return None
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Received a msgpack frame but msgpack is not installed")
+        message = msgpack.unpackb(payload, raw=False)
+    else:
+        message = json.loads(payload)
+    return codec, _from_wire(message)
+
+
+class MarketDataService:
+    """Warm in-memory state served by the daemon"""
+
+    def __init__(self, login_manager: Optional[LoginManager] = None,
+                 store: Optional[CandleStore] = None):
+        self.login_manager = login_manager or LoginManager()
+        self.store = store or CandleStore()
+        self.resampler = CandleResampler()
+        self.session_data: Optional[Dict[str, Any]] = None
+        self.master_list: Optional[pd.DataFrame] = None
+        self.token_index: Dict[str, str] = {}
+        self.symbol_index: Optional[SymbolIndex] = None
+        self.expiry_calendar: Optional[ExpiryCalendar] = None
+        self.master_list_cache: Optional[MasterListCache] = None
+        self.started = time.time()
+        self.requests = 0
+        # 'exchange:token' -> (first, last) minute already loaded into the resampler
+        self.candle_ranges: Dict[str, Tuple[pd.Timestamp, pd.Timestamp]] = {}
+        self._candle_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._master_lock = threading.RLock()
+        self._stopped = threading.Event()
+        self.methods: Dict[str, Callable[..., Any]] = {
+            'ping': self.ping,
+            'stats': self.stats,
+            'instrument': self.instrument,
+            'master_list': self.get_master_list,
+            'search': self.search,
+            'expiries': self.expiries,
+            'refresh_master_list': self.refresh_master_list,
+            'candles': self.candles,
+            'quote': self.quote,
+            'greeks': self.greeks
+        }
+
+    def start(self) -> bool:
+        """Log in and load the master list; returns False if login failed"""
+        self.session_data = self.login_manager.login()
+        if self.session_data['status'] != 'success':
+            print(f"Daemon login failed: {self.session_data['message']}")
+            return False
+        self.load_master_list()
+        threading.Thread(target=self._refresh_daily, name='master-list-refresh', daemon=True).start()
+        return True
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def load_master_list(self) -> None:
+        """Index the cached master list, then bring it up to date with today's diff"""
+        self.master_list_cache = MasterListCache(self.login_manager.get_master_list_manager())
+        self.master_list_cache.subscribe(self._apply_master_list_diff)
+        if self.master_list_cache.table is not None:
+            self._index_master_list(self.master_list_cache.table)
+        self.refresh_master_list()
+
+    def _index_master_list(self, table: pd.DataFrame) -> None:
+        with self._master_lock:
+            self.master_list = table
+            self.token_index = {str(token): key for token, key in zip(table['token'], table.index)}
+            self.symbol_index = SymbolIndex(table)
+            self.expiry_calendar = ExpiryCalendar(table)
+
+    def _apply_master_list_diff(self, diff: MasterListDiff) -> None:
+        if diff.initial or self.symbol_index is None:
+            self._index_master_list(self.master_list_cache.table)
+            return
+        with self._master_lock:
+            self.master_list = self.master_list_cache.table
+            for token in diff.deleted['token']:
+                self.token_index.pop(str(token), None)
+            for token, key in zip(diff.inserted['token'], diff.inserted.index):
+                self.token_index[str(token)] = key
+            self.symbol_index.apply_changes(pd.concat([diff.inserted, diff.updated]), removed_keys(diff))
+            self.expiry_calendar.apply_diff(diff)
+
+    def refresh_master_list(self) -> Dict[str, int]:
+        """Apply the latest scrip master diff; counts of inserted/updated/deleted rows"""
+        try:
+            diff = self.master_list_cache.refresh()
+        except Exception as e:
+            print(f"Error refreshing master list: {e}")
+            return {}
+        return {'inserted': len(diff.inserted), 'updated': len(diff.updated), 'deleted': len(diff.deleted)}
+
+    def _refresh_daily(self) -> None:
+        while True:
+            now = pd.Timestamp.now(tz='Asia/Kolkata')
+            next_refresh = now.normalize() + pd.Timedelta(hours=MASTER_LIST_REFRESH_HOUR)
+            if next_refresh <= now:
+                next_refresh += pd.Timedelta(days=1)
+            if self._stopped.wait((next_refresh - now).total_seconds()):
+                return
+            self.refresh_master_list()
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        with self._stats_lock:
+            self.requests += 1
+        method = self.methods.get(request.get('method'))
+        if method is None:
+            return {'ok': False, 'error': f"Unknown method: {request.get('method')}"}
+        try:
+            return {'ok': True, 'result': method(**(request.get('params') or {}))}
+        except Exception as e:
+            return {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+
+    def ping(self) -> str:
+        return 'pong'
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'uptime': time.time() - self.started,
+            'requests': self.requests,
+            'instruments': len(self.token_index),
+            'candle_tokens': len(self.resampler.tokens()),
+            'cache': self.login_manager.get_quote_cache().stats()
+        }
+
+    def instrument(self, token: str) -> Optional[Dict[str, Any]]:
+        """Master-list row for a token"""
+        with self._master_lock:
+            key = self.token_index.get(str(token))
+            return None if key is None else self.master_list.loc[key].to_dict()
+
+    def get_master_list(self, exch_seg: Optional[str] = None, name: Optional[str] = None) -> pd.DataFrame:
+        """Master list, optionally filtered by segment and underlying name"""
+        with self._master_lock:
+            result = self.master_list
+        if exch_seg:
+            result = result[result['exch_seg'] == exch_seg]
+        if name:
+            result = result[result['name'] == name]
+        return result
+
+    def search(self, query: str, limit: int = 10, exchange: Optional[str] = None) -> pd.DataFrame:
+        """Ranked instruments for a token, symbol/name prefix or misspelt name"""
+        with self._master_lock:
+            return self.symbol_index.search(query, limit, exchange)
+
+    def expiries(self, name: str, exch_seg: str = 'NFO') -> list:
+        """Listed expiry dates of an underlying, nearest first"""
+        with self._master_lock:
+            return self.expiry_calendar.expiries(name, exch_seg)
+
+    def candles(self, exchange: str, token: str, interval: str = 'ONE_MINUTE',
+                fromdate: Optional[str] = None, todate: Optional[str] = None) -> pd.DataFrame:
+        """Candles from memory, then the local store, then the API (1-minute, resampled)
+
+        Candles are held per exchange and token. A request reaching before or
+        after the range already loaded fetches only the missing part from the
+        API and merges it in. The daemon does not hold a streaming feed, so
+        today's candles come from getCandleData too: the loaded range never
+        extends past the last complete minute, and later requests re-fetch
+        from there.
+        """
+        token = str(token)
+        key = f'{exchange}:{token}'
+        with self._candle_lock:
+            if key not in self.candle_ranges:
+                minute_df = self.store.load(exchange, 'ONE_MINUTE', token)
+                if not minute_df.empty:
+                    self.resampler.set_candles(key, minute_df)
+                    # The newest stored candle may have been saved while still forming
+                    self.candle_ranges[key] = (minute_df['timestamp'].iloc[0],
+                                               minute_df['timestamp'].iloc[-1] - pd.Timedelta(minutes=1))
+            if fromdate and todate:
+                self._fill_candle_range(exchange, token, key, pd.Timestamp(fromdate, tz='Asia/Kolkata'),
+                                        pd.Timestamp(todate, tz='Asia/Kolkata'))
+            candle_df = self.resampler.get_candles(key, interval)
+
+        timestamps = CandleDataHandler.to_arrays(candle_df).timestamp
+        start, end = 0, len(candle_df)
+        if fromdate:
+            start = np.searchsorted(timestamps, pd.Timestamp(fromdate, tz='Asia/Kolkata').value)
+        if todate:
+            end = np.searchsorted(timestamps, pd.Timestamp(todate, tz='Asia/Kolkata').value, side='right')
+        return candle_df.iloc[start:end]
+
+    def _fill_candle_range(self, exchange: str, token: str, key: str,
+                           start: pd.Timestamp, end: pd.Timestamp) -> None:
+        """Fetch the parts of [start, end] not loaded yet (candle lock held)
+
+        Gaps are fetched in getCandleData-sized chunks, working outwards from
+        the loaded range so it stays contiguous; the first chunk that comes
+        back empty (failed, or before the instrument listed) ends its gap.
+        """
+        covered = self.candle_ranges.get(key)
+        one_minute = pd.Timedelta(minutes=1)
+        if covered is None:
+            gaps = [(start, end, False)]
+        else:
+            gaps = []
+            if start < covered[0]:
+                gaps.append((start, min(end, covered[0] - one_minute), False))
+            if end > covered[1]:
+                gaps.append((max(start, covered[1] + one_minute), end, True))
+
+        span = pd.Timedelta(days=MAX_DAYS_PER_REQUEST['ONE_MINUTE'])
+        # Candles before the current minute are final; the current one is still forming
+        settled = pd.Timestamp.now(tz='Asia/Kolkata').floor('min') - one_minute
+        for gap_start, gap_end, forward in gaps:
+            chunks = []
+            chunk_start = gap_start
+            while chunk_start <= gap_end:
+                chunk_end = min(chunk_start + span, gap_end)
+                chunks.append((chunk_start, chunk_end))
+                chunk_start = chunk_end + one_minute
+            if not forward:
+                chunks.reverse()
+
+            for chunk_start, chunk_end in chunks:
+                minute_df = self.login_manager.get_data_manager().get_historical_data({
+                    'exchange': exchange, 'symboltoken': token, 'interval': 'ONE_MINUTE',
+                    'fromdate': chunk_start.strftime('%Y-%m-%d %H:%M'),
+                    'todate': chunk_end.strftime('%Y-%m-%d %H:%M')}, typed=True)
+                if minute_df.empty:
+                    # Failed or no trading in the chunk; try again on the next request
+                    break
+                self.store.save(exchange, 'ONE_MINUTE', token, minute_df)
+                self.resampler.append_candles(key, minute_df)
+                if chunk_end > settled:
+                    # Reaches the present: only what has been returned and is complete counts
+                    chunk_end = min(minute_df['timestamp'].iloc[-1], settled)
+                covered = (chunk_start, chunk_end) if covered is None else (min(covered[0], chunk_start),
+                                                                           max(covered[1], chunk_end))
+                self.candle_ranges[key] = covered
+
+    def quote(self, exchange_tokens: Dict[str, list], mode: str = 'FULL') -> Any:
+        cache = self.login_manager.get_quote_cache()
+        key = (mode, tuple(sorted((k, tuple(sorted(v))) for k, v in exchange_tokens.items())))
+        connection = self.session_data['connection']
+        return cache.get_or_load('quote', key, lambda: connection.getMarketData(mode, exchange_tokens),
+                                 cacheable=lambda r: bool(r) and 'data' in r)
+
+    def greeks(self, name: str, expirydate: str) -> pd.DataFrame:
+        return self.login_manager.get_option_greeks_manager().get_option_greeks(
+            {'name': name, 'expirydate': expirydate})
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        service = self.server.service
+        while True:
+            try:
+                frame = read_frame(self.request)
+            except (ConnectionError, ValueError):
+                return
+            if frame is None:
+                return
+            codec, request = frame
+            self.request.sendall(encode_frame(service.dispatch(request), codec))
+
+
+if hasattr(socket, 'AF_UNIX'):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+class _TcpServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(service: MarketDataService, socket_path: str = DEFAULT_SOCKET_PATH,
+          tcp_address: Tuple[str, int] = DEFAULT_TCP_ADDRESS):
+    """Serve on a Unix socket (owner-only permissions), or localhost TCP where unavailable"""
+    if hasattr(socket, 'AF_UNIX'):
+        os.makedirs(os.path.dirname(socket_path) or '.', exist_ok=True)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        # Create the socket owner-only, so it is never reachable by others even briefly
+        previous_umask = os.umask(0o177)
+        try:
+            server = _UnixServer(socket_path, _RequestHandler)
+        finally:
+            os.umask(previous_umask)
+        print(f"Market daemon listening on {socket_path}")
+    else:
+        server = _TcpServer(tcp_address, _RequestHandler)
+        print(f"Market daemon listening on {tcp_address[0]}:{tcp_address[1]}")
+    server.service = service
+    return server
+
+
+class DaemonClient:
+    """Connects to the market daemon; keeps one socket open for many calls"""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH,
+                 tcp_address: Tuple[str, int] = DEFAULT_TCP_ADDRESS, timeout: float = 30.0):
+        if hasattr(socket, 'AF_UNIX') and os.path.exists(socket_path):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(socket_path)
+        else:
+            self.sock = socket.create_connection(tcp_address)
+        self.sock.settimeout(timeout)
+        self._lock = threading.Lock()
+
+    def call(self, method: str, **params) -> Any:
+        with self._lock:
+            self.sock.sendall(encode_frame({'method': method, 'params': params}))
+            frame = read_frame(self.sock)
+        if frame is None:
+            raise ConnectionError("Market daemon closed the connection")
+        reply = frame[1]
+        if not reply['ok']:
+            raise RuntimeError(reply['error'])
+        return reply['result']
+
+    def close(self) -> None:
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Execution starts here
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        service = MarketDataService()
+        if service.start():
+            server = serve(service)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                print("Market daemon stopped")
+            finally:
+                service.stop()
+                server.server_close()
+    else:
+        with DaemonClient() as client:
+            started = time.perf_counter()
+            print(client.call('ping'), f"{(time.perf_counter() - started) * 1000:.2f} ms")
+            print(client.call('instrument', token='99926000'))
+            print(client.call('search', query='banknfty', limit=5))
+            print(client.call('expiries', name='NIFTY'))
+            print(client.call('candles', exchange='NFO', token='54683', interval='FIVE_MINUTE',
+                              fromdate='2025-03-28 09:15', todate='2025-04-01 15:30'))
+            print(client.call('stats'))
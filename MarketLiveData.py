@@ -6,6 +6,20 @@ from datetime import date,datetime
 import matplotlib.pyplot as plt
 from collections import namedtuple
 from Login import LoginManager
+from Resilience import MASTER_LIST_URL, fetch_master_list_json
+from AppLogging import SampledLogger, setup_logging, shutdown_logging
+from PollingScheduler import PollingScheduler, PollingJob
+from QuoteCache import QuoteCache
+from QuoteArchive import QuoteArchiveWriter
+
+logger = logging.getLogger(__name__)
+# Full payloads are logged on a token's first fetch, then after 1000 fetches or
+# 5 minutes since the last logged payload, whichever comes first
+payload_logger = SampledLogger(logger, every_n=1000, min_interval=300)
+
+# Quotes requested for the same token within the 'quote' TTL share one API call
+quote_cache = QuoteCache()
+
 
 class Symbols:
     def __init__(self):
@@ -25,9 +39,13 @@ class Symbols:
             print("Login required. Please initialize the Symbols.")
             return None
 
-        url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
+        url = MASTER_LIST_URL
         print(f"Fetching master list from {url}")
-        d = requests.get(url).json()
+        try:
+            d = fetch_master_list_json(url)
+        except Exception as e:
+            print(f"Error fetching master list: {str(e)}")
+            return None
         token_df = pd.DataFrame.from_dict(d)
         token_df['expiry'] = pd.to_datetime(
             token_df['expiry'], format='mixed').apply(lambda x: x.date())
@@ -35,46 +53,80 @@ class Symbols:
         return token_df[(token_df['exch_seg'].isin(['NFO', 'NSE', 'MCX']))]
 
     def get_live_data(self, token):
+        live_data = self.get_live_data_batch({"NSE": [str(token)]})
+        if live_data is not None:
+            payload_logger.info(str(token), "Live data fetched for token %s: %s", token, live_data)
+        return live_data
+
+    def get_live_data_batch(self, exchange_tokens):
+        """Fetch FULL quotes for several tokens in one call, e.g. {"NSE": ["99926000", "3045"]}
+
+        Quotes still fresh in quote_cache are reused and only the rest are
+        requested; the result has the API's {'fetched': [...], 'unfetched': [...]} shape.
+        """
         if self.smart_connect_obj is None:
-            logging.error("Login required. Please initialize the Symbols.")
+            logger.error("Login required. Please initialize the Symbols.")
             return None
 
-        exchangeTokens = {
-            "NSE": [str(token)],
-            "NFO": []
-        }
+        keys = [('FULL', exchange, str(token)) for exchange, tokens in exchange_tokens.items() for token in tokens]
+
+        def load(missing):
+            request = {}
+            for _, exchange, token in missing:
+                request.setdefault(exchange, []).append(token)
+            res = self.smart_connect_obj.getMarketData("FULL", request)
+            fetched = (res.get('data') or {}).get('fetched') or [] if res else []
+            return {('FULL', quote['exchange'], str(quote['symbolToken'])): quote for quote in fetched}
 
-        res = self.smart_connect_obj.getMarketData("FULL", exchangeTokens)
-        if res and 'data' in res:
-            live_data = res['data']
-            logging.info(f"Live data fetched successfully for token {token}: {live_data}")
-            return live_data
-        else:
-            logging.error(f"Failed to fetch live data for token {token}")
+        quotes = quote_cache.get_many_or_load('quote', keys, load)
+        fetched = [quotes[key] for key in keys if quotes.get(key)]
+        if not fetched:
+            logger.error("Failed to fetch live data for tokens %s", exchange_tokens)
             return None
+        return {
+            'fetched': fetched,
+            'unfetched': [{'exchange': exchange, 'symbolToken': token}
+                          for _, exchange, token in keys if not quotes.get(('FULL', exchange, token))]
+        }
 
 # Execution starts here
 if __name__ == "__main__":
+    setup_logging()
     fetcher = Symbols()
     if fetcher.initialize():
         master_list = fetcher.fetch_master_list()
         print(master_list)
         
-        # Example usage of get_live_data
-        manual_token = 99926000  # Example token
+        # Poll quotes for the watched tokens once a minute while NSE is open;
+        # all tokens due on the same tick share one getMarketData call
+        watch_tokens = ["99926000", "99926009"]  # NIFTY 50, NIFTY BANK
         interval = 60  # Interval in seconds (1 minute)
-        live_data = fetcher.get_live_data(manual_token)
+        # FULL snapshots (depth, OI, circuit limits) are archived instead of discarded;
+        # a block is written every 5000 snapshots or 5 minutes, and the rest on close
+        archive = QuoteArchiveWriter(block_rows=5000, flush_interval=300)
+
+        def poll_quotes(jobs):
+            exchange_tokens = {}
+            for job in jobs:
+                exchange_tokens.setdefault(job.exchange, []).append(job.payload)
+            live_data = fetcher.get_live_data_batch(exchange_tokens)
+            if live_data is not None:
+                archive.append(live_data.get('fetched') or [])
+                print(f"Live Data for {exchange_tokens} at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}:")
+                print(live_data)
+
+        scheduler = PollingScheduler()
+        scheduler.register_batch('quotes', poll_quotes)
+        for token in watch_tokens:
+            scheduler.add_job(PollingJob(f'quote-{token}', interval, exchange='NSE',
+                                         batch_key='quotes', payload=token))
         try:
-            while True:
-                live_data = fetcher.get_live_data(manual_token)
-                if live_data is not None:
-                     print(f"Live Data for Token {manual_token} at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}:")
-                     print(live_data)
-                else:
-                    logging.error(f"Failed to fetch live data for token {manual_token}.")
-
-                time.sleep(interval)  # Wait for the specified interval
+            scheduler.run()
         except KeyboardInterrupt:
-            logging.info("Polling stopped by user.")
+            scheduler.stop()
+            logger.info("Polling stopped by user.")
+        finally:
+            archive.close()
     else:
-        print("Failed to initialize Symbols. Please check your credentials.")
\ No newline at end of file
+        print("Failed to initialize Symbols. Please check your credentials.")
+    shutdown_logging()
\ No newline at end of file
@@ -0,0 +1,167 @@
+import json
+import os
+import time
+from collections import Counter, defaultdict, namedtuple
+from datetime import datetime
+from typing import Dict, List, Callable, Optional, Tuple
+import pandas as pd
+from LoginTesting import MasterList
+from Resilience import MASTER_LIST_URL
+
+# Incremental refresh of the instrument master list.
+#
+# The processed table is cached on disk together with a hash of every raw
+# row. A refresh downloads the scrip master, hashes it, and compares it with
+# the cache by (exch_seg, token): only inserted and changed rows go through
+# MasterList.process_master_list, deleted rows are dropped, and the diff is
+# appended to a change feed and handed to subscribers (symbol index, expiry
+# calendar, ...) so they can update in place instead of rebuilding.
+
+DEFAULT_MASTER_LIST_DIR = os.path.join('data', 'master_list')
+
+# inserted/updated hold new processed rows, replaced the cached rows that the
+# updates overwrote and deleted the cached rows that disappeared; all are
+# indexed by 'exch_seg:token'. initial is True for a cold start.
+MasterListDiff = namedtuple("MasterListDiff", ["inserted", "updated", "replaced", "deleted", "initial"])
+
+
+def row_keys(df: pd.DataFrame) -> pd.Index:
+    return pd.Index(df['exch_seg'].astype(str) + ':' + df['token'].astype(str), name='key')
+
+
+def split_key(key: str) -> Tuple[str, str]:
+    exchange, token = key.split(':', 1)
+    return exchange, token
+
+
+def removed_keys(diff: MasterListDiff) -> List[Tuple[str, str]]:
+    """(exch_seg, token) of every row that was removed or replaced"""
+    return [split_key(key) for key in diff.deleted.index.append(diff.updated.index)]
+
+
+class ExpiryCalendar:
+    """Expiry dates per (exch_seg, name), kept current from master-list diffs"""
+
+    def __init__(self, table: Optional[pd.DataFrame] = None):
+        self._counts: Dict[Tuple[str, str], Counter] = defaultdict(Counter)
+        if table is not None:
+            self._add(table, 1)
+
+    def _add(self, df: pd.DataFrame, sign: int) -> None:
+        has_expiry = df['expiry'].notna() & ~df['expiry'].astype(str).isin(['', 'NaT', 'None', 'nan'])
+        groups = df[has_expiry].groupby(['exch_seg', 'name', 'expiry']).size()
+        for (exch_seg, name, expiry), count in groups.items():
+            counter = self._counts[(exch_seg, name)]
+            counter[expiry] += sign * count
+            if counter[expiry] <= 0:
+                del counter[expiry]
+
+    def apply_diff(self, diff: MasterListDiff) -> None:
+        if diff.initial:
+            self._counts.clear()
+        self._add(diff.deleted, -1)
+        self._add(diff.replaced, -1)
+        self._add(diff.inserted, 1)
+        self._add(diff.updated, 1)
+
+    def expiries(self, name: str, exch_seg: str = 'NFO') -> List[str]:
+        """Listed expiry dates, nearest first"""
+        return sorted(self._counts.get((exch_seg, name), {}))
+
+
+class MasterListCache:
+    """Processed master list kept current by applying daily diffs"""
+
+    def __init__(self, master_list_manager: MasterList, url: str = MASTER_LIST_URL,
+                 root_dir: str = DEFAULT_MASTER_LIST_DIR):
+        self.manager = master_list_manager
+        self.url = url
+        self.root_dir = root_dir
+        self.table_path = os.path.join(root_dir, 'master_list.pkl')
+        self.feed_path = os.path.join(root_dir, 'changes.jsonl')
+        self.table: Optional[pd.DataFrame] = None
+        self._hashes: Optional[pd.Series] = None
+        self.subscribers: List[Callable[[MasterListDiff], None]] = []
+        self.load()
+
+    def load(self) -> bool:
+        """Load the cached table from disk; False if there is none yet"""
+        if not os.path.exists(self.table_path):
+            return False
+        cached = pd.read_pickle(self.table_path)
+        self._hashes = cached.pop('_row_hash')
+        self.table = cached
+        return True
+
+    def _save(self) -> None:
+        os.makedirs(self.root_dir, exist_ok=True)
+        tmp_path = f'{self.table_path}.tmp'
+        self.table.assign(_row_hash=self._hashes.reindex(self.table.index)).to_pickle(tmp_path)
+        os.replace(tmp_path, self.table_path)
+
+    def subscribe(self, callback: Callable[[MasterListDiff], None]) -> None:
+        """Call callback(diff) after every refresh"""
+        self.subscribers.append(callback)
+
+    @staticmethod
+    def _hash_rows(raw: pd.DataFrame) -> pd.Series:
+        return pd.util.hash_pandas_object(raw[sorted(raw.columns)], index=False)
+
+    def refresh(self) -> MasterListDiff:
+        """Download the scrip master and apply only what changed; raises if the download fails"""
+        started = time.perf_counter()
+        raw = self.manager.download_master_list(self.url)
+        raw.index = row_keys(raw)
+        raw = raw[~raw.index.duplicated(keep='last')]
+        hashes = self._hash_rows(raw)
+
+        if self.table is None:
+            processed = MasterList.process_master_list(raw)
+            empty = processed.iloc[:0]
+            diff = MasterListDiff(processed, empty, empty, empty, True)
+            self.table = processed
+        else:
+            new_keys = hashes.index.difference(self._hashes.index)
+            gone_keys = self._hashes.index.difference(hashes.index)
+            common = hashes.index.intersection(self._hashes.index)
+            changed_keys = common[hashes.loc[common].to_numpy() != self._hashes.loc[common].to_numpy()]
+
+            changed_raw = raw.loc[new_keys.append(changed_keys)]
+            processed = (MasterList.process_master_list(changed_raw) if len(changed_raw)
+                         else self.table.iloc[:0])
+            diff = MasterListDiff(processed.loc[new_keys], processed.loc[changed_keys],
+                                  self.table.loc[changed_keys], self.table.loc[gone_keys], False)
+            self.table = pd.concat([self.table.drop(gone_keys.append(changed_keys)), processed])
+
+        self._hashes = hashes
+        self._save()
+        self._append_feed(diff)
+        for callback in self.subscribers:
+            callback(diff)
+        print(f"Master list refreshed in {time.perf_counter() - started:.2f}s: "
+              f"{len(diff.inserted)} inserted, {len(diff.updated)} updated, {len(diff.deleted)} deleted")
+        return diff
+
+    def _append_feed(self, diff: MasterListDiff) -> None:
+        if diff.initial:
+            return
+        stamp = datetime.now().isoformat(timespec='seconds')
+        os.makedirs(self.root_dir, exist_ok=True)
+        columns = [column for column in diff.updated.columns if column in diff.replaced.columns]
+        new_values, old_values = diff.updated[columns].astype(str), diff.replaced[columns].astype(str)
+        differs = new_values.ne(old_values) & ~(new_values.isna() & old_values.isna())
+        with open(self.feed_path, 'a') as f:
+            for change, rows in [('insert', diff.inserted), ('update', diff.updated), ('delete', diff.deleted)]:
+                for key, row in zip(rows.index, rows[['symbol', 'name', 'expiry']].itertuples(index=False)):
+                    entry = {'time': stamp, 'change': change, 'key': key, 'symbol': row.symbol,
+                             'name': row.name, 'expiry': None if pd.isna(row.expiry) else row.expiry}
+                    if change == 'update':
+                        entry['fields'] = [column for column in columns if differs.at[key, column]]
+                    f.write(json.dumps(entry) + '\n')
+
+    def read_feed(self, since: Optional[str] = None) -> pd.DataFrame:
+        """Change feed entries, optionally only those at or after an ISO timestamp"""
+        if not os.path.exists(self.feed_path):
+            return pd.DataFrame(columns=['time', 'change', 'key', 'symbol', 'name', 'expiry'])
+        feed = pd.read_json(self.feed_path, lines=True, dtype={'key': str, 'expiry': str})
+        return feed[feed['time'].astype(str) >= since] if since else feed
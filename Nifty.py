@@ -4,6 +4,7 @@ from datetime import date
 import matplotlib.pyplot as plt
 from collections import namedtuple
 from Login import LoginManager
+from Resilience import MASTER_LIST_URL, fetch_master_list_json
 
 # Define a namedtuple for the return type
 HistoricData = namedtuple(
@@ -28,9 +29,13 @@ class Symbols:
             print("Login required. Please initialize the Symbols.")
             return None
 
-        url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
+        url = MASTER_LIST_URL
         print(f"Fetching master list from {url}")
-        d = requests.get(url).json()
+        try:
+            d = fetch_master_list_json(url)
+        except Exception as e:
+            print(f"Error fetching master list: {str(e)}")
+            return None
         token_df = pd.DataFrame.from_dict(d)
         token_df['expiry'] = pd.to_datetime(
             token_df['expiry'], format='mixed').apply(lambda x: x.date())
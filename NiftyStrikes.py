@@ -3,9 +3,9 @@ import requests
 from datetime import date, datetime
 import logging
 from Login import LoginManager
+from Resilience import MASTER_LIST_URL, fetch_master_list_json
+from AppLogging import setup_logging, shutdown_logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 class Symbols:
     def __init__(self):
@@ -25,9 +25,13 @@ class Symbols:
             logging.error("Login required. Please initialize the Symbols.")
             return None
 
-        url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
+        url = MASTER_LIST_URL
         logging.info(f"Fetching master list from {url}")
-        d = requests.get(url).json()
+        try:
+            d = fetch_master_list_json(url)
+        except Exception as e:
+            logging.error(f"Error fetching master list: {str(e)}")
+            return None
         token_df = pd.DataFrame.from_dict(d)
         token_df['expiry'] = pd.to_datetime(
             token_df['expiry'], format='mixed').apply(lambda x: x.date())
@@ -117,6 +121,7 @@ class Symbols:
 
 # Execution starts here
 if __name__ == "__main__":
+    setup_logging()
     fetcher = Symbols()
     if fetcher.initialize():
         master_list = fetcher.fetch_master_list()
@@ -157,4 +162,5 @@ if __name__ == "__main__":
                         exch_seg = row['exch_seg']
                         logging.info(f"Symbol: {symbol}, Token: {token}, Exchange Segment: {exch_seg}")
     else:
-        logging.error("Failed to initialize Symbols. Please check your credentials.")
\ No newline at end of file
+        logging.error("Failed to initialize Symbols. Please check your credentials.")
+    shutdown_logging()
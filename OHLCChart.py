@@ -0,0 +1,236 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Any, Optional
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PolyCollection
+from matplotlib.ticker import FuncFormatter, MaxNLocator
+from LoginTesting import CandleDataHandler, MARKET_TZ
+from CandleStore import CandleStore, CANDLE_DTYPE, DEFAULT_STORE_DIR
+
+# Headless OHLC charts for large date ranges.
+#
+# A chart only has a few hundred to a couple of thousand pixels across, so
+# drawing every 1-minute candle of a multi-week range wastes most of the time
+# in matplotlib. Candles are merged into at most max_points buckets first
+# (open of the first, max high, min low, close of the last, summed volume),
+# which keeps every extreme visible; close-price lines are reduced with
+# min/max per bucket or LTTB. Drawing goes straight to an Agg canvas, so no
+# GUI backend is needed and batches can render in worker processes.
+
+DEFAULT_MAX_POINTS = 800
+UP_COLOR = '#26a69a'
+DOWN_COLOR = '#ef5350'
+
+
+def bucket_candles(records: np.ndarray, max_candles: int) -> np.ndarray:
+    """Merge consecutive candles so that at most max_candles remain"""
+    n = len(records)
+    if n <= max_candles:
+        return records
+    step = -(-n // max_candles)
+    starts = np.arange(0, n, step)
+    ends = np.append(starts[1:] - 1, n - 1)
+    merged = np.empty(len(starts), dtype=CANDLE_DTYPE)
+    merged['timestamp'] = records['timestamp'][starts]
+    merged['open'] = records['open'][starts]
+    merged['high'] = np.maximum.reduceat(records['high'], starts)
+    merged['low'] = np.minimum.reduceat(records['low'], starts)
+    merged['close'] = records['close'][ends]
+    merged['volume'] = np.add.reduceat(records['volume'], starts)
+    return merged
+
+
+def minmax_indices(y: np.ndarray, max_points: int) -> np.ndarray:
+    """Indices of the minimum and maximum of each bucket, in order"""
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    step = -(-n // max(max_points // 2, 1))
+    padded = np.full(-(-n // step) * step, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(-1, step)
+    offsets = np.arange(len(buckets)) * step
+    picks = np.concatenate([offsets + np.nanargmin(buckets, axis=1), offsets + np.nanargmax(buckets, axis=1)])
+    return np.unique(picks)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of the points that best keep the line's shape"""
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    picks = np.empty(max_points, dtype=np.int64)
+    picks[0], picks[-1] = 0, n - 1
+    previous = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # Average of the next bucket is the third vertex of the triangle
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        picks[i + 1] = previous
+    return picks
+
+
+def _bars(ax, x: np.ndarray, bottom: np.ndarray, top: np.ndarray, colors: List[str], width: float) -> None:
+    """One PolyCollection of rectangles (much cheaper than a Rectangle patch per bar)"""
+    left, right = x - width / 2, x + width / 2
+    verts = np.stack([np.column_stack([left, bottom]), np.column_stack([left, top]),
+                      np.column_stack([right, top]), np.column_stack([right, bottom])], axis=1)
+    ax.add_collection(PolyCollection(verts, facecolors=colors, edgecolors=colors, linewidths=0.5))
+
+
+def _time_formatter(timestamps: np.ndarray) -> FuncFormatter:
+    times = pd.to_datetime(timestamps, utc=True).tz_convert(MARKET_TZ)
+    fmt = '%H:%M' if len(times) and times[-1] - times[0] < pd.Timedelta(days=1) else '%d-%b %H:%M'
+
+    def label(value, _position):
+        position = int(round(value))
+        return times[position].strftime(fmt) if 0 <= position < len(times) else ''
+    return FuncFormatter(label)
+
+
+def draw_ohlc(fig: Figure, records: np.ndarray, title: str = '', style: str = 'candles',
+              max_points: int = DEFAULT_MAX_POINTS, method: str = 'minmax', volume: bool = True) -> Figure:
+    """Draw candles (or a close line) and volume onto a figure
+
+    Args:
+        records: CANDLE_DTYPE records sorted by timestamp
+        style: 'candles' or 'line'
+        max_points: Upper bound on candles (or line points) actually drawn
+        method: Line downsampling, 'minmax' or 'lttb'
+
+    Candles are placed at consecutive x positions, so nights and weekends do
+    not leave gaps; the axis labels show the candle times.
+    """
+    if volume:
+        price_ax, volume_ax = fig.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [3, 1]})
+    else:
+        price_ax, volume_ax = fig.subplots(), None
+
+    if style == 'candles':
+        candles = bucket_candles(records, max_points)
+        x = np.arange(len(candles), dtype=np.float64)
+        opens, closes = candles['open'], candles['close']
+        colors = np.where(closes >= opens, UP_COLOR, DOWN_COLOR).tolist()
+        price_ax.vlines(x, candles['low'], candles['high'], colors=colors, linewidth=0.6)
+        body_low, body_high = np.minimum(opens, closes), np.maximum(opens, closes)
+        # Keep doji bodies visible as a thin line
+        body_high = np.maximum(body_high, body_low + (candles['high'].max() - candles['low'].min()) * 1e-4)
+        _bars(price_ax, x, body_low, body_high, colors, 0.7)
+        low, high = float(candles['low'].min()), float(candles['high'].max())
+        timestamps, volumes, volume_colors = candles['timestamp'], candles['volume'], colors
+    else:
+        candles = bucket_candles(records, max_points) if volume else records
+        closes = records['close']
+        positions = np.arange(len(records), dtype=np.float64)
+        picks = (lttb_indices(positions, closes, max_points) if method == 'lttb'
+                 else minmax_indices(closes, max_points))
+        # Line points live on the bucket scale so they share the x axis with the volume bars
+        scale = len(candles) / max(len(records), 1)
+        x = picks * scale
+        price_ax.plot(x, closes[picks], color='blue', linewidth=1.0, label='Close Price')
+        price_ax.legend(loc='upper left')
+        low, high = float(closes.min()), float(closes.max())
+        timestamps, volumes, volume_colors = candles['timestamp'], candles['volume'], 'gray'
+
+    pad = (high - low) * 0.05 or abs(high) * 0.01 or 1.0
+    price_ax.set_xlim(-1, max(len(timestamps), 1))
+    price_ax.set_ylim(low - pad, high + pad)
+    price_ax.set_title(title)
+    price_ax.set_ylabel('Price')
+    price_ax.grid(True, alpha=0.3)
+
+    label_ax = price_ax
+    if volume_ax is not None:
+        bar_x = np.arange(len(timestamps), dtype=np.float64)
+        _bars(volume_ax, bar_x, np.zeros(len(bar_x)), volumes.astype(np.float64),
+              volume_colors if isinstance(volume_colors, list) else [volume_colors] * len(bar_x), 0.7)
+        volume_ax.set_ylim(0, max(float(volumes.max()) if len(volumes) else 0.0, 1.0) * 1.05)
+        volume_ax.set_ylabel('Volume')
+        volume_ax.grid(True, alpha=0.3)
+        label_ax = volume_ax
+    label_ax.xaxis.set_major_locator(MaxNLocator(8, integer=True))
+    label_ax.xaxis.set_major_formatter(_time_formatter(timestamps))
+    label_ax.set_xlabel('Timestamp')
+    fig.autofmt_xdate()
+    return fig
+
+
+def render_ohlc(candle_df: pd.DataFrame, path: Optional[str] = None, title: str = '',
+                style: str = 'candles', max_points: int = DEFAULT_MAX_POINTS, method: str = 'minmax',
+                volume: bool = True, figsize=(14, 7), dpi: int = 100) -> Figure:
+    """Render a candle frame on an Agg canvas; saves to path (.png/.svg/...) when given
+
+    Frames without tz-aware timestamps (raw getCandleData strings, naive
+    datetimes) are converted to typed candles first; naive values are read as
+    IST, so they are drawn at their market time.
+    """
+    if not isinstance(candle_df['timestamp'].dtype, pd.DatetimeTZDtype):
+        candle_df = CandleDataHandler.to_typed_frame(candle_df)
+    records = CandleStore.to_records(candle_df)
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    draw_ohlc(fig, records, title, style, max_points, method, volume)
+    if path:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        fig.savefig(path)
+    return fig
+
+
+def _render_job(job: Dict[str, Any], out_dir: str, fmt: str, store_dir: str,
+                options: Dict[str, Any]) -> Optional[str]:
+    candle_df = CandleStore(store_dir).load(job['exchange'], job['interval'], job['token'],
+                                            job.get('fromdate'), job.get('todate'))
+    if candle_df.empty:
+        return None
+    path = os.path.join(out_dir, f"{job['exchange']}_{job['token']}_{job['interval']}.{fmt}")
+    title = job.get('title') or f"{job['exchange']}:{job['token']} {job['interval']}"
+    render_ohlc(candle_df, path, title, **options)
+    return path
+
+
+def render_batch(jobs: List[Dict[str, Any]], out_dir: str = os.path.join('data', 'charts'),
+                 fmt: str = 'png', max_workers: Optional[int] = None,
+                 store_dir: str = DEFAULT_STORE_DIR, **options) -> Dict[str, Optional[str]]:
+    """Render stored candles for many tokens in parallel worker processes
+
+    Each job is a dict with exchange, interval and token, plus optional
+    fromdate/todate and title. Workers read the CandleStore themselves, so no
+    candle data is pickled across processes. Returns token -> file path
+    (None when nothing is stored for the token or rendering failed).
+    """
+    results: Dict[str, Optional[str]] = {}
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_render_job, job, out_dir, fmt, store_dir, options): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                results[job['token']] = future.result()
+            except Exception as e:
+                print(f"Error rendering {job['exchange']}:{job['token']}: {e}")
+                results[job['token']] = None
+    rendered = sum(path is not None for path in results.values())
+    print(f"Rendered {rendered}/{len(jobs)} charts in {time.perf_counter() - started:.2f}s")
+    return results
+
+
+# Execution starts here
+if __name__ == "__main__":
+    store = CandleStore()
+    tokens = store.tokens('NFO', 'ONE_MINUTE')
+    if not tokens:
+        print("No stored ONE_MINUTE candles for NFO; run Backfill.py first")
+    else:
+        render_batch([{'exchange': 'NFO', 'interval': 'ONE_MINUTE', 'token': token} for token in tokens])
@@ -0,0 +1,289 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from typing import Dict, List, Any, Callable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Market-hours-aware polling scheduler.
+#
+# Jobs run on a monotonic clock at start + k * interval, so fetch latency never
+# accumulates as drift. Jobs that share a batch_key and fall due on the same
+# tick are coalesced into one batched call (e.g. one getMarketData request for
+# many tokens). The scheduler only runs jobs while their exchange is in
+# session and stops itself once every watched market has closed for the day.
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# Regular trading sessions (IST)
+SESSIONS = {
+    'NSE': (dtime(9, 15), dtime(15, 30)),
+    'NFO': (dtime(9, 15), dtime(15, 30)),
+    'BSE': (dtime(9, 15), dtime(15, 30)),
+    'BFO': (dtime(9, 15), dtime(15, 30)),
+    'CDS': (dtime(9, 0), dtime(17, 0)),
+    'MCX': (dtime(9, 0), dtime(23, 30))
+}
+
+# NSE trading holidays (equity and F&O segments), one list per year:
+# {"2025": ["2025-02-26", ...]}. Add the next year's list when NSE publishes it.
+# The 2027 list is provisional (weekday festivals from the Hindu/Islamic
+# calendars, lunar dates estimated); replace it with the NSE circular.
+DEFAULT_HOLIDAYS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nse_holidays.json')
+
+
+def load_holidays(path: str = DEFAULT_HOLIDAYS_FILE) -> Dict[int, Set[date]]:
+    """Holiday dates per year from a JSON file"""
+    with open(path) as f:
+        data = json.load(f)
+    return {int(year): {date.fromisoformat(day) for day in days} for year, days in data.items()}
+
+
+class MarketCalendar:
+    """Session times and holidays per exchange
+
+    Holidays are given per exchange and year. Asking about a day whose year
+    has no holiday list raises ValueError rather than silently treating every
+    weekday as a trading day. MCX keeps an evening session on many exchange
+    holidays, so it has no default holiday list; pass one in via `holidays`
+    if needed.
+    """
+
+    def __init__(self, sessions: Optional[Dict[str, Tuple[dtime, dtime]]] = None,
+                 holidays: Optional[Dict[str, Dict[int, Set[date]]]] = None,
+                 holidays_file: str = DEFAULT_HOLIDAYS_FILE):
+        """
+        Args:
+            sessions: Open/close times per exchange (IST)
+            holidays: exchange -> year -> holiday dates; overrides the file
+            holidays_file: NSE holiday list used for NSE, NFO, BSE, BFO and CDS
+        """
+        self.sessions = sessions or dict(SESSIONS)
+        nse_holidays = load_holidays(holidays_file) if holidays_file else {}
+        default_holidays = {exchange: nse_holidays for exchange in ['NSE', 'NFO', 'BSE', 'BFO', 'CDS']}
+        self.holidays = {**default_holidays, **(holidays or {})}
+
+    def is_trading_day(self, exchange: str, day: date) -> bool:
+        if day.weekday() >= 5:
+            return False
+        if exchange not in self.holidays:
+            return True
+        by_year = self.holidays[exchange]
+        if day.year not in by_year:
+            raise ValueError(f"No {exchange} holiday list for {day.year}; add it to the holidays file")
+        return day not in by_year[day.year]
+
+    def check_coverage(self, exchanges, start: date, days: int = 10) -> None:
+        """Raise ValueError naming every exchange/year in [start, start + days] with no holiday list
+
+        Called once at startup so a missing year fails there, with a clear
+        message, instead of on the first calendar lookup inside a polling loop.
+        """
+        years = {(start + timedelta(days=offset)).year for offset in range(days + 1)}
+        missing = sorted(f"{exchange} {year}" for exchange in set(exchanges) if exchange in self.holidays
+                         for year in years if year not in self.holidays[exchange])
+        if missing:
+            raise ValueError(f"No holiday list for {', '.join(missing)}; "
+                             f"add the NSE holiday dates to {DEFAULT_HOLIDAYS_FILE} (or pass holidays=...)")
+
+    def session_bounds(self, exchange: str, day: date) -> Optional[Tuple[datetime, datetime]]:
+        """Open/close datetimes (IST) for a day, or None if the exchange is shut"""
+        if exchange not in self.sessions or not self.is_trading_day(exchange, day):
+            return None
+        open_time, close_time = self.sessions[exchange]
+        return (datetime.combine(day, open_time, IST), datetime.combine(day, close_time, IST))
+
+    def is_open(self, exchange: str, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now(IST)
+        bounds = self.session_bounds(exchange, now.astimezone(IST).date())
+        return bounds is not None and bounds[0] <= now < bounds[1]
+
+    def next_open(self, exchange: str, now: Optional[datetime] = None,
+                  max_days: int = 10) -> Optional[datetime]:
+        """Next session open at or after now (None if none within max_days)"""
+        now = (now or datetime.now(IST)).astimezone(IST)
+        for offset in range(max_days):
+            bounds = self.session_bounds(exchange, now.date() + timedelta(days=offset))
+            if bounds and now < bounds[1]:
+                return max(bounds[0], now)
+        return None
+
+
+class PollingJob:
+    """A callable polled at a fixed cadence while its exchange is open"""
+
+    def __init__(self, name: str, interval: float, fn: Optional[Callable[[], Any]] = None,
+                 exchange: str = 'NSE', batch_key: Optional[str] = None, payload: Any = None):
+        """
+        Args:
+            name: Unique job name
+            interval: Seconds between runs
+            fn: Called with no arguments when the job is not batched
+            exchange: Exchange whose session gates this job
+            batch_key: Jobs with the same key due on the same tick are passed
+                together to the batch handler registered for that key
+            payload: Job data for the batch handler (e.g. a token)
+        """
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.exchange = exchange
+        self.batch_key = batch_key
+        self.payload = payload
+        self.runs = 0
+        self.errors = 0
+        self.skipped = 0
+        self.last_error: Optional[str] = None
+        self.running = False
+
+
+class PollingScheduler:
+    """Runs many polling jobs without drift, gated by the market calendar"""
+
+    def __init__(self, calendar: Optional[MarketCalendar] = None, max_workers: int = 4,
+                 stop_when_closed: bool = True):
+        self.calendar = calendar or MarketCalendar()
+        self.stop_when_closed = stop_when_closed
+        self.jobs: Dict[str, PollingJob] = {}
+        self.batch_handlers: Dict[str, Callable[[List[PollingJob]], Any]] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='poll')
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._epoch = time.monotonic()
+
+    def add_job(self, job: PollingJob, start_at: Optional[float] = None) -> None:
+        """Schedule a job at start_at (monotonic) or on the next slot of the shared grid
+
+        All jobs sit on one grid anchored at the scheduler's creation, so jobs
+        whose intervals are multiples of each other fall due on the same ticks
+        and can be coalesced.
+        """
+        if start_at is None:
+            elapsed = time.monotonic() - self._epoch
+            start_at = self._epoch + -(-elapsed // job.interval) * job.interval
+        with self._lock:
+            self.jobs[job.name] = job
+            heapq.heappush(self._heap, (start_at, next(self._seq), job.name))
+        self._wakeup.set()
+
+    def remove_job(self, name: str) -> None:
+        with self._lock:
+            self.jobs.pop(name, None)  # its heap entry is dropped when it comes due
+
+    def register_batch(self, batch_key: str, handler: Callable[[List[PollingJob]], Any]) -> None:
+        """Register the handler that serves all jobs due together under batch_key"""
+        self.batch_handlers[batch_key] = handler
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+
+    def _markets_closed_for_day(self, now: datetime) -> bool:
+        exchanges = {job.exchange for job in self.jobs.values()}
+        for exchange in exchanges:
+            bounds = self.calendar.session_bounds(exchange, now.date())
+            if bounds and now < bounds[1]:
+                return False
+        return True
+
+    def _seconds_until_any_open(self, now: datetime) -> Optional[float]:
+        opens = [self.calendar.next_open(exchange, now) for exchange in {j.exchange for j in self.jobs.values()}]
+        opens = [o for o in opens if o and o.date() == now.date()]
+        return min((o - now).total_seconds() for o in opens) if opens else None
+
+    def _execute(self, jobs: List[PollingJob], batch_key: Optional[str]) -> None:
+        try:
+            if batch_key is not None:
+                self.batch_handlers[batch_key](jobs)
+            else:
+                jobs[0].fn()
+            for job in jobs:
+                job.runs += 1
+        except Exception as e:
+            for job in jobs:
+                job.errors += 1
+                job.last_error = str(e)
+        finally:
+            for job in jobs:
+                job.running = False
+
+    def _dispatch(self, due_jobs: List[PollingJob]) -> None:
+        groups: Dict[Any, List[PollingJob]] = {}
+        for job in due_jobs:
+            if job.running:
+                # Previous run still in flight: skip this tick rather than pile up
+                job.skipped += 1
+                continue
+            job.running = True
+            key = job.batch_key if job.batch_key in self.batch_handlers else None
+            groups.setdefault(key if key is not None else ('job', job.name), []).append(job)
+        for key, jobs in groups.items():
+            batch_key = key if isinstance(key, str) else None
+            self._executor.submit(self._execute, jobs, batch_key)
+
+    def run(self, tolerance: float = 0.001) -> None:
+        """Run until stop() is called or (with stop_when_closed) every market has closed
+
+        Raises ValueError before polling starts if a watched exchange has no
+        holiday list for the coming days.
+        """
+        try:
+            self.calendar.check_coverage({job.exchange for job in self.jobs.values()}, datetime.now(IST).date())
+        except ValueError as e:
+            logger.error("Scheduler not started: %s", e)
+            self._executor.shutdown(wait=False)
+            raise
+        try:
+            while not self._stopped.is_set():
+                now_wall = datetime.now(IST)
+                if self.stop_when_closed and self.jobs and self._markets_closed_for_day(now_wall):
+                    logger.info("All watched markets are closed - stopping scheduler")
+                    break
+
+                with self._lock:
+                    if not self._heap:
+                        due_in = None
+                    else:
+                        due_in = self._heap[0][0] - time.monotonic()
+                if due_in is None or due_in > tolerance:
+                    self._wakeup.wait(timeout=due_in if due_in is not None else 1.0)
+                    self._wakeup.clear()
+                    continue
+
+                now = time.monotonic()
+                due_jobs = []
+                with self._lock:
+                    while self._heap and self._heap[0][0] <= now + tolerance:
+                        due, _, name = heapq.heappop(self._heap)
+                        job = self.jobs.get(name)
+                        if job is None:
+                            continue
+                        # Next slot on the original grid; missed slots are skipped, not replayed
+                        missed = max(0, int((now - due) // job.interval))
+                        heapq.heappush(self._heap, (due + (missed + 1) * job.interval, next(self._seq), name))
+                        if self.calendar.is_open(job.exchange, now_wall):
+                            due_jobs.append(job)
+
+                if due_jobs:
+                    self._dispatch(due_jobs)
+                elif not any(self.calendar.is_open(job.exchange, now_wall) for job in self.jobs.values()):
+                    # Pre-open: sleep until the first watched market opens
+                    wait = self._seconds_until_any_open(now_wall)
+                    if wait:
+                        self._stopped.wait(timeout=wait)
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [{'job': job.name, 'interval': job.interval, 'exchange': job.exchange,
+                 'runs': job.runs, 'errors': job.errors, 'skipped': job.skipped,
+                 'last_error': job.last_error} for job in self.jobs.values()]
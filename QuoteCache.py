@@ -0,0 +1,199 @@
+import copy
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future
+from typing import Dict, List, Any, Callable, Hashable, Iterable, Optional, Tuple
+
+# Shared TTL cache for quotes and option Greeks with single-flight loading.
+#
+# Entries expire per data type (a quote goes stale faster than Greeks) and the
+# least recently used entry is evicted when the cache is full. Concurrent
+# misses for the same key wait on one in-flight request instead of each
+# calling the broker. Every caller gets its own deep copy of the value, so
+# mutating a result never changes the cached entry or another caller's result.
+
+# Seconds an entry stays fresh, per data type
+DEFAULT_TTLS = {
+    'quote': 1.0,
+    'ltp': 1.0,
+    'greeks': 5.0,
+    'candles': 60.0
+}
+
+
+def _is_cacheable(value: Any) -> bool:
+    """Failed loads (None or an empty DataFrame) are not cached"""
+    if value is None:
+        return False
+    return not getattr(value, 'empty', False)
+
+
+def _copy(value: Any) -> Any:
+    return copy.deepcopy(value) if value is not None else None
+
+
+class QuoteCache:
+    """Thread-safe TTL + LRU cache with request coalescing and metrics"""
+
+    def __init__(self, max_entries: int = 10000, ttls: Optional[Dict[str, float]] = None,
+                 default_ttl: float = 1.0):
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, Hashable], Future] = {}
+        self._lock = threading.Lock()
+        self.metrics: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def _ttl(self, data_type: str) -> float:
+        return self.ttls.get(data_type, self.default_ttl)
+
+    def get(self, data_type: str, key: Hashable) -> Optional[Any]:
+        """Fresh cached value or None (no loading, no metrics)"""
+        with self._lock:
+            entry = self._entries.get((data_type, key))
+            if entry and entry[0] > time.monotonic():
+                value = entry[1]
+            else:
+                return None
+        return _copy(value)
+
+    def put(self, data_type: str, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._store((data_type, key), value)
+
+    def _store(self, cache_key: Tuple[str, Hashable], value: Any) -> None:
+        self._entries[cache_key] = (time.monotonic() + self._ttl(cache_key[0]), value)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            evicted_key, _ = self._entries.popitem(last=False)
+            self.metrics[evicted_key[0]]['evictions'] += 1
+
+    def get_or_load(self, data_type: str, key: Hashable, loader: Callable[[], Any],
+                    cacheable: Callable[[Any], bool] = _is_cacheable) -> Any:
+        """Return a fresh cached value, or load it once for all concurrent callers
+
+        If loader raises, every waiting caller gets the same exception and
+        nothing is cached.
+        """
+        cache_key = (data_type, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(cache_key)
+                    self.metrics[data_type]['hits'] += 1
+                    cached = entry[1]
+                else:
+                    del self._entries[cache_key]
+                    self.metrics[data_type]['expirations'] += 1
+                    entry = None
+            if entry is None:
+                future, owner = self._claim(cache_key)
+        if entry is not None:
+            return _copy(cached)
+
+        if not owner:
+            return _copy(future.result())
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._in_flight.pop(cache_key, None)
+                self.metrics[data_type]['load_errors'] += 1
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._in_flight.pop(cache_key, None)
+            if cacheable(value):
+                self._store(cache_key, value)
+        future.set_result(value)
+        return _copy(value)
+
+    def _claim(self, cache_key: Tuple[str, Hashable]) -> Tuple[Future, bool]:
+        """In-flight future for a missing key and whether this caller must load it (lock held)"""
+        future = self._in_flight.get(cache_key)
+        if future is not None:
+            self.metrics[cache_key[0]]['coalesced'] += 1
+            return future, False
+        self.metrics[cache_key[0]]['misses'] += 1
+        future = Future()
+        self._in_flight[cache_key] = future
+        return future, True
+
+    def get_many_or_load(self, data_type: str, keys: Iterable[Hashable],
+                         loader: Callable[[List[Hashable]], Dict[Hashable, Any]],
+                         cacheable: Callable[[Any], bool] = _is_cacheable) -> Dict[Hashable, Any]:
+        """Batched get_or_load: fresh keys come from the cache, the rest from one loader call
+
+        loader receives the keys that are neither cached nor already being
+        loaded by another caller and returns key -> value; keys it leaves out
+        come back as None and are not cached.
+        """
+        results: Dict[Hashable, Any] = {}
+        waiting: Dict[Hashable, Future] = {}
+        owned: Dict[Hashable, Future] = {}
+        with self._lock:
+            now = time.monotonic()
+            for key in keys:
+                cache_key = (data_type, key)
+                entry = self._entries.get(cache_key)
+                if entry is not None:
+                    if entry[0] > now:
+                        self._entries.move_to_end(cache_key)
+                        self.metrics[data_type]['hits'] += 1
+                        results[key] = entry[1]
+                        continue
+                    del self._entries[cache_key]
+                    self.metrics[data_type]['expirations'] += 1
+                future, owner = self._claim(cache_key)
+                (owned if owner else waiting)[key] = future
+
+        if owned:
+            try:
+                loaded = loader(list(owned))
+            except BaseException as e:
+                with self._lock:
+                    for key in owned:
+                        self._in_flight.pop((data_type, key), None)
+                    self.metrics[data_type]['load_errors'] += 1
+                for future in owned.values():
+                    future.set_exception(e)
+                raise
+            with self._lock:
+                for key in owned:
+                    self._in_flight.pop((data_type, key), None)
+                    if cacheable(loaded.get(key)):
+                        self._store((data_type, key), loaded[key])
+            for key, future in owned.items():
+                future.set_result(loaded.get(key))
+                results[key] = loaded.get(key)
+
+        for key, future in waiting.items():
+            results[key] = future.result()
+        return {key: _copy(value) for key, value in results.items()}
+
+    def invalidate(self, data_type: Optional[str] = None, key: Optional[Hashable] = None) -> None:
+        """Drop one entry, every entry of a data type, or everything"""
+        with self._lock:
+            if data_type is None:
+                self._entries.clear()
+            elif key is not None:
+                self._entries.pop((data_type, key), None)
+            else:
+                for cache_key in [k for k in self._entries if k[0] == data_type]:
+                    del self._entries[cache_key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/coalesce/eviction counters per data type, plus hit ratio"""
+        result = {}
+        with self._lock:
+            for data_type, counters in self.metrics.items():
+                lookups = counters['hits'] + counters['misses'] + counters['coalesced']
+                result[data_type] = {**counters, 'hit_ratio': (counters['hits'] + counters['coalesced']) / lookups
+                                     if lookups else 0.0}
+            result['entries'] = len(self._entries)
+        return result
@@ -0,0 +1,363 @@
+import importlib
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import defaultdict, deque
+from typing import Dict, List, Any, Optional
+from LoginTesting import Authenticator, SmartApiAuthenticator, CredentialsManager, LoginManager
+
+# Record/replay of every SmartAPI call and master-list download.
+#
+# Journal layout: a 4-byte magic, then one record per call as a little-endian
+# uint32 length followed by zlib-compressed JSON. A sidecar <journal>.idx maps
+# each call key to the byte offsets of its records, in call order; it is
+# rebuilt by scanning the journal if missing.
+
+JOURNAL_MAGIC = b'SAJ1'
+_LENGTH = struct.Struct('<I')
+
+# SmartConnect calls that are replayed verbatim; anything else is passed through when recording
+RECORDED_METHODS = [
+    'generateSession', 'generateToken', 'renewAccessToken', 'getProfile', 'terminateSession',
+    'getCandleData', 'getMarketData', 'ltpData', 'optionGreek', 'searchScrip',
+    'placeOrder', 'placeOrderFullResponse', 'modifyOrder', 'cancelOrder',
+    'orderBook', 'tradeBook', 'position', 'holding', 'allholding', 'rmsLimit',
+    'individual_order_details', 'getMarginApi', 'estimateCharges'
+]
+
+# Session tokens are masked in stored responses; replay does not need real values
+_SESSION_TOKEN_KEYS = ['jwtToken', 'refreshToken', 'feedToken']
+
+
+class ReplayMissError(LookupError):
+    """Raised when replay is asked for a call that was not recorded"""
+
+
+class ReplayedError(Exception):
+    """A recorded failure whose exception type cannot be rebuilt in this process
+
+    original_type is the recorded 'module.QualName' of the live exception.
+    """
+
+    def __init__(self, message: str, original_type: Optional[str] = None):
+        super().__init__(message)
+        self.original_type = original_type
+
+
+def _error_type_name(error: BaseException) -> str:
+    return f'{type(error).__module__}.{type(error).__qualname__}'
+
+
+def _rebuild_error(record: Dict[str, Any]) -> Exception:
+    """The recorded exception, re-created with its original type where possible"""
+    message = record['error']
+    type_name = record.get('error_type')
+    if not type_name:
+        return ReplayedError(message)  # journals written before error types were recorded
+    module_name, _, qualname = type_name.rpartition('.')
+    try:
+        error_type: Any = importlib.import_module(module_name)
+        for part in qualname.split('.'):
+            error_type = getattr(error_type, part)
+        if isinstance(error_type, type) and issubclass(error_type, Exception):
+            return error_type(message)
+    except Exception:
+        pass
+    return ReplayedError(f'{type_name}: {message}', type_name)
+
+
+def call_key(kind: str, method: str, args: Any) -> str:
+    """Canonical key for a call: kind, method and JSON-encoded arguments"""
+    if method == 'generateSession':
+        args = []  # never key on (or store) credentials
+    return f"{kind}:{method}:{json.dumps(args, sort_keys=True, default=str, separators=(',', ':'))}"
+
+
+def _mask_session_tokens(response: Any) -> Any:
+    if isinstance(response, dict):
+        return {key: ('REPLAY' if key in _SESSION_TOKEN_KEYS and value else _mask_session_tokens(value))
+                for key, value in response.items()}
+    return response
+
+
+class JournalWriter:
+    """Appends call records to a journal file and writes its index on close"""
+
+    def __init__(self, path: str):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._file = open(path, 'wb')
+        self._file.write(JOURNAL_MAGIC)
+        self._index: Dict[str, List[int]] = defaultdict(list)
+        self._seq = 0
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def append(self, key: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            record = {**record, 'seq': self._seq, 'at': time.monotonic() - self._start, 'key': key}
+            payload = zlib.compress(json.dumps(record, default=str, separators=(',', ':')).encode('utf-8'))
+            self._index[key].append(self._file.tell())
+            self._file.write(_LENGTH.pack(len(payload)))
+            self._file.write(payload)
+            self._seq += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.close()
+            with open(f'{self.path}.idx', 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+
+
+class JournalReader:
+    """Random access to journal records through the index
+
+    Records are read from the file on demand, so a long recording is never
+    held in memory as a whole.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._lock = threading.Lock()
+        if self._read_at(0, len(JOURNAL_MAGIC)) != JOURNAL_MAGIC:
+            self._file.close()
+            raise ValueError(f"Not a SmartAPI journal: {path}")
+        self.index = self._load_index()
+
+    def _read_at(self, offset: int, size: int) -> bytes:
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(size)
+
+    def _load_index(self) -> Dict[str, List[int]]:
+        index_path = f'{self.path}.idx'
+        if os.path.exists(index_path):
+            with open(index_path, encoding='utf-8') as f:
+                return json.load(f)
+
+        # Interrupted recording: rebuild the index from the records themselves
+        index: Dict[str, List[int]] = defaultdict(list)
+        for offset in self.offsets():
+            index[self.read(offset)['key']].append(offset)
+        return index
+
+    def offsets(self):
+        """Yield the offset of every complete record, in write order"""
+        offset = len(JOURNAL_MAGIC)
+        while offset + _LENGTH.size <= self._size:
+            (length,) = _LENGTH.unpack(self._read_at(offset, _LENGTH.size))
+            if offset + _LENGTH.size + length > self._size:
+                break
+            yield offset
+            offset += _LENGTH.size + length
+
+    def read(self, offset: int) -> Dict[str, Any]:
+        (length,) = _LENGTH.unpack(self._read_at(offset, _LENGTH.size))
+        return json.loads(zlib.decompress(self._read_at(offset + _LENGTH.size, length)))
+
+    def records(self):
+        """Yield every record in call order"""
+        for offset in self.offsets():
+            yield self.read(offset)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class RecordingConnection:
+    """Wraps a SmartConnect and journals every recorded method call"""
+
+    def __init__(self, connection: Any, journal: JournalWriter):
+        self._connection = connection
+        self._journal = journal
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._connection, name)
+        if name not in RECORDED_METHODS or not callable(attr):
+            return attr
+
+        def recorded(*args, **kwargs):
+            key = call_key('smartapi', name, [list(args), kwargs])
+            started = time.perf_counter()
+            try:
+                response = attr(*args, **kwargs)
+            except Exception as e:
+                self._journal.append(key, {'latency': time.perf_counter() - started,
+                                           'error': str(e), 'error_type': _error_type_name(e)})
+                raise
+            stored = _mask_session_tokens(response) if name == 'generateSession' else response
+            self._journal.append(key, {'latency': time.perf_counter() - started, 'response': stored})
+            return response
+
+        return recorded
+
+
+class ReplayConnection:
+    """Serves recorded SmartConnect responses back in recorded order
+
+    Each call key has its own queue, so calls are served in the order they
+    were recorded regardless of how other keys interleave. With speed=1.0 the
+    recorded latency is reproduced, speed=10.0 runs ten times faster and
+    speed=None (or 0) returns immediately. Recorded failures are raised again
+    with their original exception type, so retry classification matches the
+    live run.
+    """
+
+    def __init__(self, reader: JournalReader, speed: Optional[float] = None):
+        self._reader = reader
+        self.speed = speed
+        self._queues = {key: deque(offsets) for key, offsets in reader.index.items()}
+        self._lock = threading.Lock()
+
+    def replay(self, kind: str, method: str, args: Any) -> Any:
+        key = call_key(kind, method, args)
+        with self._lock:
+            pending = self._queues.get(key)
+            if not pending:
+                raise ReplayMissError(f"No recorded response left for {key}")
+            record = self._reader.read(pending.popleft())
+
+        if self.speed:
+            time.sleep(record.get('latency', 0.0) / self.speed)
+        if 'error' in record:
+            raise _rebuild_error(record)
+        return record['response']
+
+    def __getattr__(self, name: str) -> Any:
+        if name not in RECORDED_METHODS:
+            raise AttributeError(f"{name} is not available in replay mode")
+
+        def replayed(*args, **kwargs):
+            return self.replay('smartapi', name, [list(args), kwargs])
+
+        return replayed
+
+
+class _RecordedHttpResponse:
+    """Minimal requests.Response stand-in for recorded downloads"""
+
+    def __init__(self, url: str, status_code: int, payload: Any = None, text: Optional[str] = None):
+        self.url = url
+        self.status_code = status_code
+        self._payload = payload
+        # Recorded bodies are either parsed JSON or, when they did not parse, raw text
+        self._is_json = text is None
+        self.text = text if text is not None else json.dumps(payload)
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise Exception(f"{self.status_code} Error for url: {self.url}")
+
+    @classmethod
+    def from_record(cls, url: str, response: Dict[str, Any]) -> '_RecordedHttpResponse':
+        return cls(url, response['status_code'], response.get('json'), response.get('text'))
+
+    def json(self) -> Any:
+        if not self._is_json:
+            raise ValueError(f"Response from {self.url} is not JSON")
+        return self._payload
+
+
+class RecordingHttpSession:
+    """requests-style get() that journals responses (used for the master list)
+
+    The status code is always recorded; the body is stored as JSON when it
+    parses and as text otherwise, so failed downloads (5xx, HTML error pages)
+    replay exactly as they happened.
+    """
+
+    def __init__(self, journal: JournalWriter, session: Any = None):
+        import requests
+        self._journal = journal
+        self._session = session or requests
+
+    def get(self, url: str, **kwargs) -> _RecordedHttpResponse:
+        key = call_key('http', 'get', [url])
+        started = time.perf_counter()
+        response = self._session.get(url, **kwargs)
+        latency = time.perf_counter() - started
+        try:
+            recorded = {'status_code': response.status_code, 'json': response.json()}
+        except ValueError:
+            recorded = {'status_code': response.status_code, 'text': response.text}
+        self._journal.append(key, {'latency': latency, 'response': recorded})
+        return _RecordedHttpResponse.from_record(url, recorded)
+
+
+class ReplayHttpSession:
+    """requests-style get() served from the journal"""
+
+    def __init__(self, connection: ReplayConnection):
+        self._connection = connection
+
+    def get(self, url: str, **kwargs) -> _RecordedHttpResponse:
+        response = self._connection.replay('http', 'get', [url])
+        return _RecordedHttpResponse.from_record(url, response)
+
+
+class RecordingAuthenticator(Authenticator):
+    """Authenticates through another authenticator and records the resulting connection"""
+
+    def __init__(self, inner: Authenticator, journal: JournalWriter):
+        self.inner = inner
+        self.journal = journal
+
+    def authenticate(self) -> Dict[str, Any]:
+        session_data = self.inner.authenticate()
+        connection = session_data.get('connection')
+        if connection is not None:
+            # Record the login call itself so replay can serve it back
+            self.journal.append(call_key('smartapi', 'generateSession', []), {
+                'latency': 0.0, 'response': _mask_session_tokens(session_data['data'])})
+            session_data = {**session_data, 'connection': RecordingConnection(connection, self.journal)}
+        return session_data
+
+
+class ReplayAuthenticator(Authenticator):
+    """Returns the recorded login without contacting the broker"""
+
+    def __init__(self, connection: ReplayConnection):
+        self.connection = connection
+
+    def authenticate(self) -> Dict[str, Any]:
+        try:
+            session_data = self.connection.generateSession()
+            return {
+                'status': 'success',
+                'data': session_data,
+                'message': 'Authentication replayed',
+                'connection': self.connection
+            }
+        except Exception as e:
+            return {
+                'status': 'error',
+                'data': None,
+                'message': str(e),
+                'connection': None
+            }
+
+
+def recording_login_manager(journal_path: str):
+    """LoginManager that logs in for real and records every call to journal_path
+
+    Returns:
+        (login_manager, journal) - call journal.close() when the run is done
+    """
+    journal = JournalWriter(journal_path)
+    authenticator = RecordingAuthenticator(SmartApiAuthenticator(CredentialsManager()), journal)
+    return LoginManager(authenticator, RecordingHttpSession(journal)), journal
+
+
+def replay_login_manager(journal_path: str, speed: Optional[float] = None) -> LoginManager:
+    """LoginManager whose session and managers are served entirely from a journal"""
+    connection = ReplayConnection(JournalReader(journal_path), speed)
+    return LoginManager(ReplayAuthenticator(connection), ReplayHttpSession(connection))
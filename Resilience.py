@@ -0,0 +1,341 @@
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Callable, Optional
+import pandas as pd
+
+# Retry, backoff, circuit breaking and request hedging for broker calls.
+#
+# A ResiliencePolicy wraps a zero-argument callable per endpoint name
+# (e.g. 'getCandleData'). Failures are retried with jittered exponential
+# backoff when they are transient: network errors, rate limiting, or a
+# SmartAPI response whose errorcode is in RETRYABLE_ERROR_CODES.
+#
+# The circuit breaker counts calls, not attempts: a call admitted by the
+# breaker runs all of its retries, and only its final outcome is recorded.
+# Rate limiting is retried but never counted as a failure, since throttling
+# says nothing about the endpoint's health.
+
+# SmartAPI error codes that are worth retrying (server busy / internal errors / rate limits)
+RETRYABLE_ERROR_CODES = {'AB1004', 'AB2000', 'AB2001', 'AB1019'}
+
+# SmartAPI error codes and message fragments that mean the caller is being throttled
+RATE_LIMIT_ERROR_CODES = {'AB1019'}
+RATE_LIMIT_MESSAGES = ['exceeding access rate', 'too many requests']
+
+# Message fragments that mark a transient failure when no error code is available
+RETRYABLE_MESSAGES = RATE_LIMIT_MESSAGES + ['timed out', 'timeout', 'connection aborted',
+                                            'connection reset', 'temporarily unavailable',
+                                            'max retries exceeded', 'try after sometime']
+
+MASTER_LIST_URL = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the endpoint's circuit is open"""
+
+
+class RetryableResponseError(Exception):
+    """A response that reported a transient broker error"""
+
+    def __init__(self, response: Any):
+        super().__init__(f"{response.get('errorcode')}: {response.get('message')}")
+        self.response = response
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """True for transient failures (network, timeouts, rate limits, retryable error codes)"""
+    if isinstance(error, (RetryableResponseError, ConnectionError, TimeoutError)):
+        return True
+    try:
+        import requests
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+    except ImportError:
+        pass
+    message = str(error).lower()
+    return any(fragment in message for fragment in RETRYABLE_MESSAGES)
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """True when the broker rejected the call for exceeding its rate limit"""
+    if isinstance(error, RetryableResponseError) and error.response.get('errorcode') in RATE_LIMIT_ERROR_CODES:
+        return True
+    message = str(error).lower()
+    return any(fragment in message for fragment in RATE_LIMIT_MESSAGES)
+
+
+def is_retryable_response(response: Any) -> bool:
+    """True for a SmartAPI JSON response that failed with a retryable error code"""
+    return (isinstance(response, dict) and response.get('status') is False
+            and response.get('errorcode') in RETRYABLE_ERROR_CODES)
+
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def shared_http_session() -> Any:
+    """Process-wide requests.Session, so repeated downloads reuse pooled connections"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            import requests
+            _http_session = requests.Session()
+        return _http_session
+
+
+def fetch_json(url: str, policy: Optional['ResiliencePolicy'] = None, timeout: float = 60.0,
+               endpoint: str = 'masterList', session: Any = None) -> Any:
+    """GET a JSON document, raising on HTTP errors, through the policy if one is given
+
+    session is any object with a requests-style get(); the shared session by default.
+    """
+    session = session or shared_http_session()
+
+    def download():
+        response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    return policy.call(endpoint, download) if policy else download()
+
+
+class LatencyTracker:
+    """Rolling window of call latencies for percentile estimates"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open after a cool-down"""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                # Let exactly one probe through until it reports back
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def release(self) -> None:
+        """End a call without a verdict (e.g. it was throttled); a half-open circuit probes again"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class ResiliencePolicy:
+    """Configurable retry/backoff, per-endpoint circuit breakers and hedged reads"""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.25, max_delay: float = 8.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 hedge: bool = False, hedge_percentile: float = 95.0,
+                 min_hedge_delay: float = 0.2, min_samples: int = 20, hedge_workers: int = 8,
+                 request_timeout: float = 30.0):
+        """
+        Args:
+            max_attempts: Total attempts per call, including the first
+            base_delay / max_delay: Exponential backoff bounds in seconds (full jitter)
+            failure_threshold / reset_timeout: Circuit breaker settings per endpoint
+            hedge: Send a duplicate of idempotent reads that run slower than the
+                endpoint's hedge_percentile latency; the first success wins
+            min_hedge_delay: Never hedge earlier than this many seconds
+            min_samples: Latency samples needed before hedging starts
+            request_timeout: Longest a hedged attempt waits for either copy, in seconds;
+                on expiry it fails with TimeoutError (retryable)
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.hedge_workers = hedge_workers
+        self.request_timeout = request_timeout
+
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latency: Dict[str, LatencyTracker] = defaultdict(LatencyTracker)
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[endpoint]
+
+    def _count(self, endpoint: str, counter: str) -> None:
+        with self._lock:
+            self._counters[endpoint][counter] += 1
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry number (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    def _timed(self, endpoint: str, fn: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        result = fn()
+        self._latency[endpoint].add(time.perf_counter() - started)
+        if is_retryable_response(result):
+            raise RetryableResponseError(result)
+        return result
+
+    def _hedged(self, endpoint: str, fn: Callable[[], Any]) -> Any:
+        tracker = self._latency[endpoint]
+        threshold = tracker.percentile(self.hedge_percentile) if len(tracker) >= self.min_samples else None
+        if threshold is None:
+            return self._timed(endpoint, fn)
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.hedge_workers,
+                                                    thread_name_prefix='hedge')
+        deadline = time.monotonic() + self.request_timeout
+        primary = self._executor.submit(self._timed, endpoint, fn)
+        done, _ = wait([primary], timeout=min(max(self.min_hedge_delay, threshold), self.request_timeout))
+        if done:
+            return primary.result()
+
+        self._count(endpoint, 'hedges')
+        secondary = self._executor.submit(self._timed, endpoint, fn)
+        pending = {primary, secondary}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                # Both copies are stuck; they finish in the background and their results are dropped
+                raise TimeoutError(f"{endpoint} timed out after {self.request_timeout}s")
+            for future in done:
+                if future.exception() is None:
+                    if future is secondary:
+                        self._count(endpoint, 'hedge_wins')
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, endpoint: str, fn: Callable[[], Any], idempotent: bool = True) -> Any:
+        """Call fn with retries, circuit breaking and (for idempotent reads) hedging
+
+        The breaker is consulted once, before the first attempt; an admitted
+        call runs all of its retries and only its final outcome is recorded
+        against the breaker, with rate limiting recorded as neither success
+        nor failure. A retryable error response that persists through every
+        attempt is returned as-is so callers keep their existing error
+        handling; an exception that persists is re-raised. Non-idempotent
+        calls (orders) are never retried or hedged, only guarded by the
+        circuit breaker.
+        """
+        breaker = self.breaker(endpoint)
+        if not breaker.allow():
+            self._count(endpoint, 'short_circuited')
+            raise CircuitOpenError(f"Circuit open for {endpoint}")
+
+        attempts = self.max_attempts if idempotent else 1
+        for attempt in range(1, attempts + 1):
+            self._count(endpoint, 'attempts')
+            if attempt > 1:
+                self._count(endpoint, 'retries')
+            try:
+                if idempotent and self.hedge:
+                    result = self._hedged(endpoint, fn)
+                else:
+                    result = self._timed(endpoint, fn)
+                breaker.record_success()
+                self._count(endpoint, 'successes')
+                return result
+            except Exception as e:
+                if not is_retryable_error(e):
+                    # The endpoint answered; a bad request says nothing about its health
+                    breaker.record_success()
+                    self._count(endpoint, 'failures')
+                    raise
+                if attempt == attempts:
+                    self._count(endpoint, 'failures')
+                    if is_rate_limited(e):
+                        self._count(endpoint, 'rate_limited')
+                        breaker.release()
+                    else:
+                        breaker.record_failure()
+                    if isinstance(e, RetryableResponseError):
+                        return e.response
+                    raise
+                time.sleep(self.backoff(attempt))
+
+    def stats(self) -> pd.DataFrame:
+        """Attempt/outcome counters, circuit state and latency percentiles per endpoint"""
+        rows = []
+        for endpoint in sorted(set(self._counters) | set(self._breakers)):
+            tracker = self._latency[endpoint]
+            rows.append({
+                'endpoint': endpoint,
+                **{counter: self._counters[endpoint].get(counter, 0) for counter in
+                   ['attempts', 'successes', 'failures', 'retries', 'rate_limited', 'short_circuited',
+                    'hedges', 'hedge_wins']},
+                'circuit': self.breaker(endpoint).state,
+                'p50': tracker.percentile(50),
+                'p99': tracker.percentile(99)
+            })
+        return pd.DataFrame(rows)
+
+
+# Retries transient failures of the master-list downloads in the scripts
+master_list_policy = ResiliencePolicy()
+
+
+def fetch_master_list_json(url: str = MASTER_LIST_URL) -> Any:
+    """Raw scrip master rows, downloaded over the shared session through master_list_policy"""
+    return fetch_json(url, master_list_policy, session=shared_http_session())
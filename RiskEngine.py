@@ -0,0 +1,330 @@
+import threading
+import time
+import pandas as pd
+from collections import defaultdict, deque
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+# Pre-trade risk checks evaluated entirely in memory.
+#
+# Per-instrument limits (lot size, tick size, freeze quantity, price band) are
+# precomputed once from the master list, and positions/exposure are kept per
+# account as orders are accepted, so checking an order is a handful of dict
+# lookups and comparisons with no network round-trip. An instrument without a
+# reference price has no price band, so its orders are rejected (fail closed)
+# until set_reference_price is called.
+
+# NSE F&O quantity freeze limits (units per order) by underlying
+FREEZE_QTY = {
+    'NIFTY': 1800,
+    'BANKNIFTY': 900,
+    'FINNIFTY': 1800,
+    'MIDCPNIFTY': 2800,
+    'NIFTYNXT50': 600,
+    'SENSEX': 1000,
+    'BANKEX': 900
+}
+
+# Allowed deviation from the reference price (percent) by instrument type;
+# equities ('' in the master list) use the widest exchange band
+DEFAULT_BAND_PCT = {
+    '': 20.0,
+    'FUTIDX': 10.0,
+    'FUTSTK': 10.0,
+    'OPTIDX': 50.0,
+    'OPTSTK': 50.0,
+    'FUTCOM': 6.0,
+    'OPTFUT': 50.0
+}
+FALLBACK_BAND_PCT = 20.0
+
+
+class InstrumentLimits:
+    """Static limits for one instrument plus its current price band"""
+
+    __slots__ = ('token', 'symbol', 'name', 'exchange', 'instrument_type', 'lot_size', 'tick_size',
+                 'freeze_qty', 'band_pct', 'ref_price', 'lower', 'upper')
+
+    def __init__(self, token: str, symbol: str, name: str, exchange: str, instrument_type: str,
+                 lot_size: int, tick_size: float, freeze_qty: Optional[int], band_pct: float):
+        self.token = token
+        self.symbol = symbol
+        self.name = name
+        self.exchange = exchange
+        self.instrument_type = instrument_type
+        self.lot_size = max(1, lot_size)
+        self.tick_size = tick_size
+        self.freeze_qty = freeze_qty
+        self.band_pct = band_pct
+        self.ref_price: Optional[float] = None
+        self.lower = 0.0
+        self.upper = float('inf')
+
+    def set_reference_price(self, price: float) -> None:
+        self.ref_price = price
+        self.lower = price * (1 - self.band_pct / 100.0)
+        self.upper = price * (1 + self.band_pct / 100.0)
+
+
+class RiskLimits:
+    """Account-level limits (None disables a check)"""
+
+    def __init__(self, max_order_notional: Optional[float] = 1000000.0,
+                 max_symbol_position: Optional[int] = None,
+                 max_symbol_notional: Optional[float] = 2000000.0,
+                 max_account_notional: Optional[float] = 5000000.0,
+                 max_orders_per_second: Optional[int] = 10):
+        """
+        Args:
+            max_order_notional: Largest single order value (price x quantity)
+            max_symbol_position: Largest absolute net quantity per symbol
+            max_symbol_notional: Largest absolute net position value per symbol
+            max_account_notional: Largest gross position value across all symbols
+            max_orders_per_second: Broker-accepted orders per rolling second
+                (SEBI algo order-rate limits start at 10/s)
+        """
+        self.max_order_notional = max_order_notional
+        self.max_symbol_position = max_symbol_position
+        self.max_symbol_notional = max_symbol_notional
+        self.max_account_notional = max_account_notional
+        self.max_orders_per_second = max_orders_per_second
+
+
+class RiskCheckResult:
+    """Outcome of a pre-trade check"""
+
+    __slots__ = ('approved', 'reasons', 'token', 'quantity', 'price')
+
+    def __init__(self, approved: bool, reasons: List[str], token: Optional[str] = None,
+                 quantity: int = 0, price: float = 0.0):
+        self.approved = approved
+        self.reasons = reasons
+        self.token = token
+        self.quantity = quantity
+        self.price = price
+
+    def __bool__(self) -> bool:
+        return self.approved
+
+    def __repr__(self) -> str:
+        return f"RiskCheckResult(approved={self.approved}, reasons={self.reasons})"
+
+
+class RiskEngine:
+    """In-memory pre-trade checks against instrument and account limits"""
+
+    def __init__(self, limits: Optional[RiskLimits] = None,
+                 account_limits: Optional[Dict[str, RiskLimits]] = None,
+                 freeze_qty: Optional[Dict[str, int]] = None,
+                 band_pct: Optional[Dict[str, float]] = None):
+        self.limits = limits or RiskLimits()
+        self.account_limits = account_limits or {}
+        self.freeze_qty = {**FREEZE_QTY, **(freeze_qty or {})}
+        self.band_pct = {**DEFAULT_BAND_PCT, **(band_pct or {})}
+        # Tokens are only unique within an exchange, so everything is keyed by (exchange, token)
+        self.instruments: Dict[Tuple[str, str], InstrumentLimits] = {}
+        self._by_symbol: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        # account -> (exchange, token) -> [net quantity, notional at last mark]
+        self.positions: Dict[str, Dict[Tuple[str, str], List[float]]] = defaultdict(dict)
+        self.gross_notional: Dict[str, float] = defaultdict(float)
+        self._order_times: Dict[str, deque] = defaultdict(deque)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.rejections: Dict[str, int] = defaultdict(int)
+
+    # Instrument limits
+
+    def _band_for(self, instrument_type: str) -> float:
+        return self.band_pct.get(instrument_type, FALLBACK_BAND_PCT)
+
+    def add_instrument(self, token: str, symbol: str, exchange: str, lot_size: int = 1,
+                       tick_size: float = 0.05, name: str = '', instrument_type: str = '',
+                       ref_price: Optional[float] = None) -> InstrumentLimits:
+        is_derivative = instrument_type.startswith(('FUT', 'OPT'))
+        limits = InstrumentLimits(str(token), symbol, name, exchange, instrument_type, int(lot_size),
+                                  tick_size, self.freeze_qty.get(name) if is_derivative else None,
+                                  self._band_for(instrument_type))
+        if ref_price:
+            limits.set_reference_price(ref_price)
+        self.instruments[(exchange, limits.token)] = limits
+        self._by_symbol[(exchange, symbol)] = (exchange, limits.token)
+        return limits
+
+    def load_master_list(self, master_list: pd.DataFrame) -> int:
+        """Precompute limits for every instrument in the master list (once at startup)"""
+        lot_sizes = pd.to_numeric(master_list['lotsize'], errors='coerce').fillna(1).astype(int)
+        # tick_size is published in paise
+        tick_sizes = pd.to_numeric(master_list['tick_size'], errors='coerce').fillna(5.0) / 100.0
+        for token, symbol, name, exch_seg, instrument_type, lot_size, tick_size in zip(
+                master_list['token'], master_list['symbol'], master_list['name'], master_list['exch_seg'],
+                master_list['instrumenttype'], lot_sizes, tick_sizes):
+            self.add_instrument(token, symbol, exch_seg, lot_size, tick_size, name, instrument_type)
+        return len(self.instruments)
+
+    def ensure_instruments(self, load_master_list: Callable[[], pd.DataFrame]) -> int:
+        """Load the master list once, however many sessions share this engine"""
+        with self._load_lock:
+            if not self.instruments:
+                self.load_master_list(load_master_list())
+        return len(self.instruments)
+
+    def set_reference_price(self, exchange: str, token: str, price: float) -> None:
+        """Re-centre an instrument's price band (e.g. on the previous close or from the tick feed)"""
+        self.instruments[(exchange, str(token))].set_reference_price(price)
+
+    def set_price_band(self, exchange: str, token: str, band_pct: float) -> None:
+        """Override the band for one instrument (exchanges assign 2/5/10/20% bands per stock)"""
+        limits = self.instruments[(exchange, str(token))]
+        limits.band_pct = band_pct
+        if limits.ref_price:
+            limits.set_reference_price(limits.ref_price)
+
+    def lookup(self, order_params: Dict[str, Any]) -> Optional[InstrumentLimits]:
+        exchange = order_params.get('exchange')
+        instrument = self.instruments.get((exchange, str(order_params.get('symboltoken'))))
+        if instrument is None:
+            key = self._by_symbol.get((exchange, order_params.get('tradingsymbol')))
+            instrument = self.instruments.get(key) if key else None
+        return instrument
+
+    # Position state
+
+    def record_fill(self, account: str, exchange: str, token: str, transaction_type: str,
+                    quantity: int, price: float) -> None:
+        """Apply a trade to the account's net position and gross exposure"""
+        signed = quantity if transaction_type == 'BUY' else -quantity
+        with self._lock:
+            position = self.positions[account].setdefault((exchange, str(token)), [0, 0.0])
+            position[0] += signed
+            notional = abs(position[0]) * price
+            self.gross_notional[account] += notional - position[1]
+            position[1] = notional
+
+    def record_order(self, account: str, order_params: Dict[str, Any], check: RiskCheckResult) -> None:
+        """Book an order the broker accepted
+
+        It counts toward the order-rate budget and its quantity is applied to
+        the position as if filled, so exposure limits stay conservative until
+        fills are reconciled with record_fill.
+        """
+        with self._lock:
+            self._order_times[account].append(time.monotonic())
+        instrument = self.lookup(order_params)
+        if instrument is not None and check.quantity:
+            self.record_fill(account, instrument.exchange, instrument.token,
+                             order_params.get('transactiontype'), check.quantity, check.price)
+
+    def position(self, account: str, exchange: str, token: str) -> int:
+        return int(self.positions[account].get((exchange, str(token)), (0, 0.0))[0])
+
+    # Checks
+
+    def check(self, order_params: Dict[str, Any], account: str = 'default') -> RiskCheckResult:
+        """Validate an order in SmartAPI placeOrder format; all reasons are reported"""
+        reasons = []
+        instrument = self.lookup(order_params)
+        if instrument is None:
+            return self._reject(account, ['unknown instrument'], None)
+
+        try:
+            quantity = int(order_params.get('quantity', 0))
+        except (TypeError, ValueError):
+            return self._reject(account, [f"invalid quantity {order_params.get('quantity')}"], instrument.token)
+        try:
+            price = float(order_params.get('price') or 0)
+        except (TypeError, ValueError):
+            return self._reject(account, [f"invalid price {order_params.get('price')}"], instrument.token)
+        is_market = order_params.get('ordertype', 'LIMIT') in ('MARKET', 'STOPLOSS_MARKET')
+        effective_price = instrument.ref_price if is_market else price
+        limits = self.account_limits.get(account, self.limits)
+
+        if quantity <= 0:
+            reasons.append(f"quantity {quantity} must be positive")
+        elif quantity % instrument.lot_size:
+            reasons.append(f"quantity {quantity} is not a multiple of lot size {instrument.lot_size}")
+        if instrument.freeze_qty is not None and quantity > instrument.freeze_qty:
+            reasons.append(f"quantity {quantity} exceeds freeze quantity {instrument.freeze_qty}")
+
+        if instrument.ref_price is None:
+            reasons.append("no reference price for the price band"
+                           if not is_market else "market order without a reference price")
+        if not is_market:
+            if price <= 0:
+                reasons.append(f"price {price} must be positive")
+            else:
+                ticks = price / instrument.tick_size
+                if abs(ticks - round(ticks)) > 1e-6:
+                    reasons.append(f"price {price} is not a multiple of tick size {instrument.tick_size}")
+                if instrument.ref_price is not None and not instrument.lower <= price <= instrument.upper:
+                    reasons.append(f"price {price} outside band {instrument.lower:.2f}-{instrument.upper:.2f} "
+                                   f"(reference {instrument.ref_price})")
+
+        if effective_price and quantity > 0:
+            notional = effective_price * quantity
+            if limits.max_order_notional is not None and notional > limits.max_order_notional:
+                reasons.append(f"order value {notional:,.0f} exceeds {limits.max_order_notional:,.0f}")
+
+            signed = quantity if order_params.get('transactiontype') == 'BUY' else -quantity
+            current_qty, current_notional = self.positions[account].get((instrument.exchange, instrument.token), (0, 0.0))
+            projected_qty = current_qty + signed
+            projected_notional = abs(projected_qty) * effective_price
+            if limits.max_symbol_position is not None and abs(projected_qty) > limits.max_symbol_position:
+                reasons.append(f"position {projected_qty} would exceed {limits.max_symbol_position} units")
+            if limits.max_symbol_notional is not None and projected_notional > limits.max_symbol_notional:
+                reasons.append(f"position value {projected_notional:,.0f} would exceed "
+                               f"{limits.max_symbol_notional:,.0f}")
+            projected_gross = self.gross_notional[account] - current_notional + projected_notional
+            if (limits.max_account_notional is not None and projected_gross > limits.max_account_notional
+                    and projected_notional > current_notional):
+                reasons.append(f"account exposure {projected_gross:,.0f} would exceed "
+                               f"{limits.max_account_notional:,.0f}")
+
+        if reasons:
+            return self._reject(account, reasons, instrument.token)
+
+        if limits.max_orders_per_second is not None:
+            # Only accepted orders are counted (see record_order)
+            now = time.monotonic()
+            with self._lock:
+                recent = self._order_times[account]
+                while recent and now - recent[0] > 1.0:
+                    recent.popleft()
+                throttled = len(recent) >= limits.max_orders_per_second
+            if throttled:
+                return self._reject(account, [f"more than {limits.max_orders_per_second} orders per second"],
+                                    instrument.token)
+
+        return RiskCheckResult(True, [], instrument.token, quantity, effective_price or 0.0)
+
+    def _reject(self, account: str, reasons: List[str], token: Optional[str]) -> RiskCheckResult:
+        with self._lock:
+            self.rejections[account] += 1
+        return RiskCheckResult(False, reasons, token)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'instruments': len(self.instruments),
+            'accounts': {account: {'positions': len(positions), 'gross_notional': self.gross_notional[account],
+                                   'rejections': self.rejections[account]}
+                         for account, positions in self.positions.items()},
+            'rejections': dict(self.rejections)
+        }
+
+
+# Execution starts here
+if __name__ == "__main__":
+    engine = RiskEngine(RiskLimits(max_orders_per_second=None))
+    engine.add_instrument('3045', 'SBIN-EQ', 'NSE', 1, 0.05, 'SBIN', ref_price=800.0)
+    engine.add_instrument('43650', 'NIFTY26JUN25FUT', 'NFO', 75, 0.10, 'NIFTY', 'FUTIDX', ref_price=24800.0)
+
+    order = {"tradingsymbol": "SBIN-EQ", "symboltoken": "3045", "transactiontype": "SELL",
+             "exchange": "NSE", "ordertype": "LIMIT", "price": "19500", "quantity": "15"}
+    print(engine.check(order))
+    print(engine.check({**order, 'price': '801.05'}))
+    print(engine.check({"symboltoken": "43650", "exchange": "NFO", "transactiontype": "BUY",
+                        "ordertype": "LIMIT", "price": "24805", "quantity": "100"}))
+
+    iterations = 100000
+    started = time.perf_counter()
+    for _ in range(iterations):
+        engine.check({**order, 'price': '801.05'})
+    print(f"{(time.perf_counter() - started) / iterations * 1e6:.2f} us per check")
@@ -0,0 +1,311 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Any, Callable, Optional, Tuple
+import pandas as pd
+from LoginTesting import (LoginManager, SmartApiAuthenticator, CredentialsManager,
+                          SessionDataHandler)
+from RiskEngine import RiskEngine
+
+# Multi-account session pool.
+#
+# Accounts are configured in .env as ACCOUNTS=ACC1,ACC2,... with one set of
+# ACC1_API_KEY / ACC1_USERNAME / ACC1_PIN / ACC1_TOTP_TOKEN per account.
+# Read-only calls are routed to the least loaded account; orders always go to
+# the account they are placed for.
+
+# Requests per second allowed per account for read-only endpoints
+DEFAULT_READ_RATE = 3.0
+# SmartAPI session tokens are renewed well before they expire
+DEFAULT_REFRESH_INTERVAL = 6 * 60 * 60
+# Accounts whose login failed are retried after 30s, doubling up to 30 minutes
+RELOGIN_BACKOFF = 30.0
+RELOGIN_BACKOFF_MAX = 30 * 60.0
+
+
+class RateLimiter:
+    """Token bucket; reserve() returns how long the caller must wait for a slot"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def next_available(self) -> float:
+        """Seconds until a slot is free, without reserving it"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def reserve(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class AccountSession:
+    """One logged-in account with its rate limiter and load statistics"""
+
+    def __init__(self, account_id: str, login_manager: LoginManager,
+                 read_rate: float = DEFAULT_READ_RATE):
+        self.account_id = account_id
+        self.login_manager = login_manager
+        self.limiter = RateLimiter(read_rate)
+        self.session_data: Optional[Dict[str, Any]] = None
+        self.in_flight = 0
+        self.latency_ewma = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.last_refresh = 0.0
+        self.login_failures = 0
+        self.retry_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> Any:
+        return self.session_data['connection'] if self.is_active else None
+
+    @property
+    def is_active(self) -> bool:
+        return bool(self.session_data) and self.session_data['status'] == 'success'
+
+    def login(self) -> Dict[str, Any]:
+        self.session_data = self.login_manager.login()
+        self.last_refresh = time.monotonic()
+        if self.is_active:
+            self.login_failures = 0
+            self.retry_at = 0.0
+        else:
+            self.login_failures += 1
+            backoff = min(RELOGIN_BACKOFF_MAX, RELOGIN_BACKOFF * 2 ** (self.login_failures - 1))
+            self.retry_at = self.last_refresh + backoff
+        return self.session_data
+
+    def due_for_relogin(self, now: float) -> bool:
+        """Inactive accounts are logged in again once their backoff has passed"""
+        return not self.is_active and now >= self.retry_at
+
+    def refresh(self) -> bool:
+        """Renew the JWT with the refresh token, falling back to a full login"""
+        try:
+            tokens = SessionDataHandler.get_token(self.session_data, 'data') or {}
+            refresh_token = tokens.get('refreshToken')
+            if refresh_token and self.connection is not None:
+                response = self.connection.generateToken(refresh_token)
+                if response and response.get('status'):
+                    self.session_data['data']['data'].update(response.get('data') or {})
+                    self.last_refresh = time.monotonic()
+                    return True
+        except Exception as e:
+            print(f"Token refresh failed for {self.account_id}: {str(e)}")
+        return self.login()['status'] == 'success'
+
+    def load_score(self) -> Tuple[float, int, float]:
+        """Lower is better: rate-limit wait first, then in-flight calls, then latency"""
+        return self.limiter.next_available(), self.in_flight, self.latency_ewma
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """Run fn under this account's rate limit while tracking load
+
+        The caller must already have counted the call in in_flight (see
+        SessionPool.pick_account); it is released here when fn returns.
+        """
+        self.limiter.acquire()
+        with self._lock:
+            self.requests += 1
+        started = time.perf_counter()
+        try:
+            return fn()
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.in_flight -= 1
+                self.latency_ewma = elapsed if not self.latency_ewma else 0.8 * self.latency_ewma + 0.2 * elapsed
+
+
+class SessionPool:
+    """Logs in several accounts in parallel and shards read workloads across them"""
+
+    def __init__(self, account_ids: Optional[List[str]] = None,
+                 read_rate: float = DEFAULT_READ_RATE,
+                 refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+                 login_manager_factory: Optional[Callable[[str], LoginManager]] = None,
+                 risk_engine: Optional[RiskEngine] = None):
+        """
+        Args:
+            account_ids: Account prefixes; defaults to the ACCOUNTS env variable
+            read_rate: Read requests per second allowed per account
+            refresh_interval: Seconds between background token renewals
+            login_manager_factory: Builds the LoginManager for an account id
+            risk_engine: Pre-trade checks shared by all accounts, with positions
+                tracked per account id (default factory only)
+        """
+        if account_ids is None:
+            account_ids = [a.strip() for a in os.getenv('ACCOUNTS', '').split(',') if a.strip()]
+        factory = login_manager_factory or (lambda account_id: self._default_login_manager(account_id, risk_engine))
+        self.refresh_interval = refresh_interval
+        self.accounts: Dict[str, AccountSession] = {
+            account_id: AccountSession(account_id, factory(account_id), read_rate)
+            for account_id in account_ids
+        }
+        self._routing_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _default_login_manager(account_id: str, risk_engine: Optional[RiskEngine] = None) -> LoginManager:
+        credentials = CredentialsManager(prefix=f'{account_id}_')
+        return LoginManager(SmartApiAuthenticator(credentials), risk_engine=risk_engine, account=account_id)
+
+    def login_all(self) -> Dict[str, Dict[str, Any]]:
+        """Log every account in concurrently; returns session data per account"""
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, len(self.accounts))) as executor:
+            futures = {executor.submit(account.login): account_id
+                       for account_id, account in self.accounts.items()}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        self._start_refresher()
+        return results
+
+    def active_accounts(self) -> List[AccountSession]:
+        return [account for account in self.accounts.values() if account.is_active]
+
+    def _start_refresher(self) -> None:
+        if self._refresher is not None or not self.refresh_interval:
+            return
+
+        def refresh_loop():
+            while not self._stop.wait(min(RELOGIN_BACKOFF, self.refresh_interval)):
+                now = time.monotonic()
+                for account in self.accounts.values():
+                    try:
+                        if account.is_active and now - account.last_refresh >= self.refresh_interval:
+                            account.refresh()
+                        elif account.due_for_relogin(now):
+                            if account.login()['status'] == 'success':
+                                print(f"Account {account.account_id} logged in again")
+                    except Exception as e:
+                        print(f"Session refresh failed for {account.account_id}: {str(e)}")
+
+        self._refresher = threading.Thread(target=refresh_loop, name='session-refresh', daemon=True)
+        self._refresher.start()
+
+    def close(self) -> None:
+        """Stop background token refresh"""
+        self._stop.set()
+        if self._refresher is not None:
+            self._refresher.join(timeout=1.0)
+            self._refresher = None
+
+    def pick_account(self) -> AccountSession:
+        """Least loaded active account for a read-only call"""
+        with self._routing_lock:
+            active = self.active_accounts()
+            if not active:
+                raise RuntimeError("No active accounts in the session pool")
+            account = min(active, key=AccountSession.load_score)
+            # Count the call before releasing the lock so concurrent picks spread out
+            with account._lock:
+                account.in_flight += 1
+        return account
+
+    def _routed(self, fn: Callable[[AccountSession], Any]) -> Any:
+        account = self.pick_account()
+        return account.call(lambda: fn(account))
+
+    def read(self, method: str, *args, **kwargs) -> Any:
+        """Route a read-only SmartConnect call to the least loaded account"""
+        return self._routed(lambda account: getattr(account.connection, method)(*args, **kwargs))
+
+    def get_historical_data(self, params: Dict[str, Any], typed: bool = False) -> pd.DataFrame:
+        return self._routed(
+            lambda account: account.login_manager.get_data_manager().get_historical_data(params, typed))
+
+    def get_option_greeks(self, params: Dict[str, Any]) -> pd.DataFrame:
+        return self._routed(
+            lambda account: account.login_manager.get_option_greeks_manager().get_option_greeks(params))
+
+    def get_market_data(self, mode: str, exchange_tokens: Dict[str, List[str]]) -> Any:
+        return self.read('getMarketData', mode, exchange_tokens)
+
+    def map_reads(self, fn: Callable[['SessionPool', Any], Any], items: List[Any],
+                  max_workers: Optional[int] = None) -> List[Any]:
+        """Run fn(pool, item) for every item concurrently, sharded across accounts
+
+        Results are returned in item order; an item whose call raised gets the
+        exception object in its slot.
+        """
+        workers = max_workers or max(1, 2 * len(self.active_accounts()))
+        results: List[Any] = [None] * len(items)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(fn, self, item): i for i, item in enumerate(items)}
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    results[futures[future]] = e
+        return results
+
+    def place_order(self, account_id: str, order_params: Dict[str, Any]) -> Dict[str, Any]:
+        """Place an order on a specific account; orders are never rerouted"""
+        account = self.accounts.get(account_id)
+        if account is None or not account.is_active:
+            return {
+                'status': 'error',
+                'order_id': None,
+                'full_response': None,
+                'message': f'Account {account_id} is not logged in'
+            }
+        return account.login_manager.get_order_manager().place_order(order_params)
+
+    def stats(self) -> pd.DataFrame:
+        """Per-account load and error counters"""
+        return pd.DataFrame([{
+            'account': account.account_id,
+            'active': account.is_active,
+            'requests': account.requests,
+            'errors': account.errors,
+            'in_flight': account.in_flight,
+            'latency_ewma': account.latency_ewma,
+            'login_failures': account.login_failures
+        } for account in self.accounts.values()])
+
+
+# Execution starts here
+if __name__ == "__main__":
+    pool = SessionPool()
+    for account_id, session_data in pool.login_all().items():
+        print(f"{account_id}: {session_data['status']} {session_data['message']}")
+
+    if pool.active_accounts():
+        params = [{
+            "exchange": "NFO",
+            "symboltoken": token,
+            "interval": "ONE_MINUTE",
+            "fromdate": "2025-03-28 09:15",
+            "todate": "2025-04-01 15:30"
+        } for token in ["54683", "51120"]]
+        frames = pool.map_reads(lambda p, param: p.get_historical_data(param, typed=True), params)
+        for param, frame in zip(params, frames):
+            print(f"\n{param['symboltoken']}:")
+            print(frame)
+        print(pool.stats())
+    pool.close()
@@ -0,0 +1,300 @@
+import re
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, List, Iterable, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# Prefix and typo-tolerant search over the instrument master list.
+#
+# Keys are normalised (upper case, alphanumerics only) and held in sorted
+# lists, so a prefix query is two bisects plus a slice. Typo tolerance uses a
+# trigram index over instrument names and non-derivative symbols: candidate
+# keys are scored by trigram overlap with a single np.bincount over the
+# query's posting lists.
+#
+# Rows are append-only: apply_changes() appends inserted instruments, merges
+# their keys into the sorted lists and marks deleted ones dead, so a daily
+# master-list diff updates the index without rebuilding it. The initial
+# build is the same operation applied to an empty index.
+
+MATCH_SCORES = {
+    'token': 1.0,
+    'exact': 1.0,
+    'symbol_prefix': 0.9,
+    'name_prefix': 0.8
+}
+FUZZY_WEIGHT = 0.7
+MIN_FUZZY_SCORE = 0.35
+
+# Rebuild from the live rows once this share of rows has been deleted
+COMPACT_RATIO = 0.25
+
+# Rows of one underlying are listed cash/index first, then futures, then options
+_TYPE_RANK = {'': 0, 'AMXIDX': 0, 'FUTIDX': 1, 'FUTSTK': 1, 'FUTCOM': 1, 'FUTCUR': 1,
+              'OPTIDX': 2, 'OPTSTK': 2, 'OPTFUT': 2, 'OPTCUR': 2}
+
+_NON_ALNUM = re.compile('[^A-Z0-9]')
+
+
+def normalize(text: str) -> str:
+    return _NON_ALNUM.sub('', str(text).upper())
+
+
+def trigrams(key: str) -> List[str]:
+    padded = f'  {key} '
+    return list({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+class SymbolIndex:
+    """Ranked symbol, name and token lookup over a master-list DataFrame"""
+
+    def __init__(self, master_list: pd.DataFrame):
+        self._columns: Dict[str, np.ndarray] = {column: master_list[column].to_numpy()[:0]
+                                                for column in master_list.columns}
+        self._alive = np.zeros(0, dtype=bool)
+        self._sort_keys = np.zeros((3, 0), dtype=np.float64)  # type rank, expiry, strike
+        self._row_by_key: Dict[Tuple[str, str], int] = {}
+        self._token_rows: Dict[str, List[int]] = defaultdict(list)
+        self._symbol_keys: List[str] = []
+        self._symbol_rows = np.zeros(0, dtype=np.int64)
+        self._name_keys: List[str] = []
+        self._name_groups: Dict[str, np.ndarray] = {}
+        self._fuzzy_keys: List[str] = []
+        self._fuzzy_lookup: Dict[str, int] = {}
+        self._fuzzy_lengths = np.zeros(0, dtype=np.float64)
+        self._postings: Dict[str, np.ndarray] = {}
+        self.apply_changes(master_list)
+
+    def __len__(self) -> int:
+        return len(self._row_by_key)
+
+    @property
+    def master_list(self) -> pd.DataFrame:
+        """Live rows, indexed by row id"""
+        return self._frame(np.flatnonzero(self._alive))
+
+    def _frame(self, rows: np.ndarray, **extra) -> pd.DataFrame:
+        columns = {column: values[rows] for column, values in self._columns.items()}
+        return pd.DataFrame({**columns, **extra}, index=rows)
+
+    # Maintenance
+
+    def apply_changes(self, inserted: Optional[pd.DataFrame] = None,
+                      deleted: Iterable[Tuple[str, str]] = ()) -> None:
+        """Delete (exch_seg, token) keys, then add new rows; an update is a delete plus an insert"""
+        for exchange, token in deleted:
+            row = self._row_by_key.pop((exchange, str(token)), None)
+            if row is not None:
+                self._alive[row] = False
+                self._token_rows[str(token)].remove(row)
+
+        if inserted is not None and len(inserted):
+            self._insert(inserted.reset_index(drop=True))
+
+        dead = len(self._alive) - len(self._row_by_key)
+        if dead > COMPACT_RATIO * len(self._alive):
+            self.__init__(self.master_list.reset_index(drop=True))
+
+    def _insert(self, df: pd.DataFrame) -> None:
+        first = len(self._alive)
+        rows = np.arange(first, first + len(df), dtype=np.int64)
+        for column in self._columns:
+            values = df[column].to_numpy() if column in df else np.full(len(df), None, dtype=object)
+            self._columns[column] = np.concatenate([self._columns[column], values])
+        self._alive = np.concatenate([self._alive, np.ones(len(df), dtype=bool)])
+
+        expiry = pd.to_datetime(df['expiry'].replace('', None), errors='coerce', format='mixed')
+        sort_keys = np.vstack([
+            df['instrumenttype'].map(_TYPE_RANK).fillna(3).to_numpy(dtype=np.float64),
+            expiry.fillna(pd.Timestamp.max).to_numpy().astype('datetime64[ns]').astype(np.float64),
+            pd.to_numeric(df['strike'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        ])
+        self._sort_keys = np.concatenate([self._sort_keys, sort_keys], axis=1)
+
+        for row, exchange, token in zip(rows.tolist(), df['exch_seg'].astype(str), df['token'].astype(str)):
+            self._row_by_key[(exchange, token)] = row
+            self._token_rows[token].append(row)
+
+        self._merge_symbols(df, rows)
+        self._merge_names(df, rows)
+        self._merge_fuzzy(df)
+
+    def _merge_symbols(self, df: pd.DataFrame, rows: np.ndarray) -> None:
+        keys = np.array([normalize(symbol) for symbol in df['symbol']], dtype=object)
+        order = np.argsort(keys, kind='stable')
+        keys, rows = keys[order], rows[order]
+        positions = [bisect_left(self._symbol_keys, key) for key in keys]
+        self._symbol_keys = np.insert(np.array(self._symbol_keys, dtype=object), positions, keys).tolist()
+        self._symbol_rows = np.insert(self._symbol_rows, positions, rows)
+
+    def _merge_names(self, df: pd.DataFrame, rows: np.ndarray) -> None:
+        names = np.array([normalize(name) for name in df['name']], dtype=object)
+        order = np.argsort(names, kind='stable')
+        names, rows = names[order], rows[order]
+        bounds = np.flatnonzero(names[1:] != names[:-1]) + 1
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(names)]):
+            name = names[start]
+            existing = self._name_groups.get(name)
+            if existing is None:
+                insort(self._name_keys, name)
+                group = rows[start:end]
+            else:
+                group = np.concatenate([existing[self._alive[existing]], rows[start:end]])
+            # Within an underlying: type -> expiry -> strike
+            keys = self._sort_keys[:, group]
+            self._name_groups[name] = group[np.lexsort((keys[2], keys[1], keys[0]))]
+
+    def _merge_fuzzy(self, df: pd.DataFrame) -> None:
+        # Names plus symbols of cash/index instruments; option symbols are
+        # reached through their underlying's name
+        is_derivative = df['instrumenttype'].astype(str).str.match('^(FUT|OPT)')
+        keys = {normalize(name) for name in df['name']}
+        keys.update(normalize(symbol) for symbol in df.loc[~is_derivative, 'symbol'])
+        new_keys = sorted(key for key in keys if key and key not in self._fuzzy_lookup)
+        if not new_keys:
+            return
+        first = len(self._fuzzy_keys)
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for i, key in enumerate(new_keys, start=first):
+            self._fuzzy_lookup[key] = i
+            for gram in trigrams(key):
+                postings[gram].append(i)
+        self._fuzzy_keys.extend(new_keys)
+        self._fuzzy_lengths = np.concatenate([self._fuzzy_lengths,
+                                              [len(trigrams(key)) for key in new_keys]])
+        for gram, ids in postings.items():
+            ids = np.asarray(ids, dtype=np.int64)
+            self._postings[gram] = np.concatenate([self._postings[gram], ids]) if gram in self._postings else ids
+
+    # Lookups
+
+    def by_token(self, token: str, exchange: Optional[str] = None) -> pd.DataFrame:
+        rows = [row for row in self._token_rows.get(str(token), [])
+                if exchange is None or self._columns['exch_seg'][row] == exchange]
+        return self._frame(np.asarray(rows, dtype=np.int64))
+
+    def name_rows(self, name: str) -> np.ndarray:
+        """Live rows of one underlying (cash/index, futures, options by expiry and strike)"""
+        group = self._name_groups.get(normalize(name))
+        if group is None:
+            return np.zeros(0, dtype=np.int64)
+        return group[self._alive[group]]
+
+    def _prefix_range(self, keys: List[str], prefix: str) -> Tuple[int, int]:
+        return bisect_left(keys, prefix), bisect_left(keys, prefix + '\uffff')
+
+    def fuzzy_keys(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Closest names/symbols by trigram Dice similarity"""
+        key = normalize(query)
+        grams = [gram for gram in trigrams(key) if gram in self._postings]
+        if not grams:
+            return []
+        common = np.bincount(np.concatenate([self._postings[gram] for gram in grams]),
+                             minlength=len(self._fuzzy_keys))
+        scores = 2.0 * common / (self._fuzzy_lengths + len(trigrams(key)))
+        top = np.argpartition(-scores, min(limit, len(scores) - 1))[:limit]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self._fuzzy_keys[i], float(scores[i])) for i in top if scores[i] >= MIN_FUZZY_SCORE]
+
+    def _ranked_prefix_rows(self, key: str, start: int, exact_end: int, end: int,
+                            exchange: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Symbol and name prefix hits by closeness rather than key order
+
+        Exact name first, then instrument type (cash/index before futures
+        before options), nearest expiry and shortest symbol, so 'NIF' puts
+        the NIFTY index ahead of its option contracts. Returns the ordered
+        rows and whether each one matched on its symbol (else its name).
+        """
+        symbol_rows = self._symbol_rows[exact_end:end]
+        name_start, name_end = self._prefix_range(self._name_keys, key)
+        name_rows = [self._name_groups[name] for name in self._name_keys[name_start:name_end]]
+        rows = np.concatenate([symbol_rows, *name_rows]) if name_rows else symbol_rows
+        rows, first = np.unique(rows, return_index=True)
+        from_symbol = first < len(symbol_rows)
+        keep = self._alive[rows]
+        if exchange is not None:
+            keep &= self._columns['exch_seg'][rows] == exchange
+        rows, from_symbol = rows[keep], from_symbol[keep]
+        if not len(rows):
+            return rows, from_symbol
+
+        exact_name = np.isin(rows, self._name_groups.get(key, ()))
+        symbol_length = np.fromiter((len(str(symbol)) for symbol in self._columns['symbol'][rows]),
+                                    dtype=np.int64, count=len(rows))
+        keys = self._sort_keys[:, rows]
+        order = np.lexsort((symbol_length, keys[1], keys[0], ~exact_name))
+        return rows[order], from_symbol[order]
+
+    def search_rows(self, query: str, limit: int = 10,
+                    exchange: Optional[str] = None) -> List[Tuple[int, float, str]]:
+        """Ranked (row, score, match type) for a query without building a DataFrame"""
+        key = normalize(query)
+        if not key:
+            return []
+        results: List[Tuple[int, float, str]] = []
+        seen = set()
+        alive = self._alive
+        exchanges = self._columns['exch_seg']
+
+        def add(rows, score: float, match: str) -> bool:
+            for row in rows:
+                row = int(row)
+                if row in seen or not alive[row] or (exchange is not None and exchanges[row] != exchange):
+                    continue
+                seen.add(row)
+                results.append((row, score, match))
+                if len(results) >= limit:
+                    return True
+            return False
+
+        if key.isdigit() and add(self._token_rows.get(key, []), MATCH_SCORES['token'], 'token'):
+            return results
+
+        start, end = self._prefix_range(self._symbol_keys, key)
+        exact_end = bisect_left(self._symbol_keys, key + '\0', start, end)
+        if add(self._symbol_rows[start:exact_end], MATCH_SCORES['exact'], 'exact'):
+            return results
+        if add(self._name_groups.get(key, ()), MATCH_SCORES['exact'], 'exact'):
+            return results
+
+        prefix_rows, from_symbol = self._ranked_prefix_rows(key, start, exact_end, end, exchange)
+        for row, symbol in zip(prefix_rows, from_symbol):
+            match = 'symbol_prefix' if symbol else 'name_prefix'
+            if add((row,), MATCH_SCORES[match], match):
+                return results
+
+        for fuzzy_key, similarity in self.fuzzy_keys(key, limit):
+            score = FUZZY_WEIGHT * similarity
+            if add(self._name_groups.get(fuzzy_key, ()), score, 'fuzzy'):
+                return results
+            start, end = self._prefix_range(self._symbol_keys, fuzzy_key)
+            exact_end = bisect_left(self._symbol_keys, fuzzy_key + '\0', start, end)
+            if add(self._symbol_rows[start:exact_end], score, 'fuzzy'):
+                return results
+        return results
+
+    def search(self, query: str, limit: int = 10, exchange: Optional[str] = None) -> pd.DataFrame:
+        """Ranked master-list rows for a token, symbol/name prefix or misspelt name"""
+        hits = self.search_rows(query, limit, exchange)
+        return self._frame(np.fromiter((row for row, _, _ in hits), dtype=np.int64, count=len(hits)),
+                           score=[score for _, score, _ in hits], match=[match for _, _, match in hits])
+
+
+# Execution starts here
+if __name__ == "__main__":
+    from Resilience import fetch_master_list_json
+
+    master_list = pd.DataFrame.from_dict(fetch_master_list_json())
+    master_list = master_list[master_list['exch_seg'].isin(['NSE', 'NFO', 'MCX'])]
+
+    started = time.perf_counter()
+    index = SymbolIndex(master_list)
+    print(f"Indexed {len(master_list)} instruments in {time.perf_counter() - started:.2f}s")
+
+    for query in ['SBIN', 'reliance', 'RELAINCE', 'NIFTY25', 'banknfty', '3045', 'CRUDEOIL']:
+        started = time.perf_counter()
+        index.search_rows(query)
+        elapsed = (time.perf_counter() - started) * 1e6
+        print(f"{query:<10} {elapsed:8.1f} us  {index.search(query, 3)['symbol'].tolist()}")
@@ -0,0 +1,324 @@
+import time
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Any, Optional, Tuple
+
+# Shared-memory tick bus: one feed-handler process writes ticks into a ring
+# buffer that any number of local consumer processes read without locks.
+#
+# Layout: a 64-byte header (write sequence, capacity) followed by `capacity`
+# TICK_DTYPE slots. Tick n (n = 1, 2, ...) lives in slot (n - 1) % capacity.
+# Each slot is a seqlock: the single writer clears its `seq` stamp, writes
+# the data, stamps the new `seq` last, then advances the header's write
+# sequence; on x86-64 aligned 8-byte stores are atomic and stay in program
+# order, so a reader that sees the new write sequence also sees the slot.
+# Readers track their own next sequence and detect when the writer has
+# lapped them (a gap). After copying slots out they re-read the header and
+# the stamps: a tick the writer may have reached during the copy, or whose
+# stamp changed, can hold torn data and is dropped as a gap.
+
+TICK_DTYPE = np.dtype([
+    ('seq', 'u8'),          # publish sequence; stamped last
+    ('token', 'i8'),
+    ('exchange', 'u1'),     # SmartAPI exchange type (1 = NSE, 2 = NFO, 5 = MCX, ...)
+    ('timestamp', 'i8'),    # exchange timestamp, epoch milliseconds
+    ('ltp', 'f8'),
+    ('volume', 'i8'),
+    ('oi', 'i8'),
+    ('bid', 'f8'),
+    ('ask', 'f8'),
+    ('bid_qty', 'i8'),
+    ('ask_qty', 'i8')
+], align=True)
+
+HEADER_SIZE = 64
+DEFAULT_BUS_NAME = 'angelone_tickbus'
+DEFAULT_CAPACITY = 1 << 20
+
+# Exchange type codes used by the SmartAPI streaming feed
+EXCHANGE_TYPES = {'NSE': 1, 'NFO': 2, 'BSE': 3, 'BFO': 4, 'MCX': 5, 'NCX': 7, 'CDS': 13}
+
+# Feed prices arrive as integers in paise (currency derivatives in 1e-7 rupees)
+CDS_EXCHANGE_TYPE = EXCHANGE_TYPES['CDS']
+PRICE_DIVISOR = 100.0
+CDS_PRICE_DIVISOR = 10000000.0
+
+
+class TickBusWriter:
+    """Creates the ring and publishes ticks (exactly one writer per bus)"""
+
+    def __init__(self, name: str = DEFAULT_BUS_NAME, capacity: int = DEFAULT_CAPACITY):
+        self.name = name
+        self.capacity = capacity
+        size = HEADER_SIZE + capacity * TICK_DTYPE.itemsize
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Stale ring from a previous feed handler; start over
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self._header = np.ndarray((2,), dtype='u8', buffer=self._shm.buf)
+        self._slots = np.ndarray((capacity,), dtype=TICK_DTYPE, buffer=self._shm.buf, offset=HEADER_SIZE)
+        self._seq_view = self._slots['seq']
+        self._seq_view[:] = 0
+        self._header[1] = capacity
+        self._header[0] = 0
+        self._seq = 0
+
+    @property
+    def published(self) -> int:
+        return self._seq
+
+    def publish(self, token: int, ltp: float, timestamp: Optional[int] = None, exchange: int = 1,
+                volume: int = 0, oi: int = 0, bid: float = 0.0, ask: float = 0.0,
+                bid_qty: int = 0, ask_qty: int = 0) -> int:
+        """Write one tick and return its sequence number"""
+        seq = self._seq + 1
+        index = (seq - 1) % self.capacity
+        # Whole record with a zero stamp first, then the stamp: readers never
+        # accept a half-written slot
+        self._slots[index] = (0, token, exchange,
+                              timestamp if timestamp is not None else int(time.time() * 1000),
+                              ltp, volume, oi, bid, ask, bid_qty, ask_qty)
+        self._seq_view[index] = seq
+        self._header[0] = seq
+        self._seq = seq
+        return seq
+
+    def publish_batch(self, ticks: np.ndarray) -> int:
+        """Write a TICK_DTYPE array (seq field ignored); returns the last sequence"""
+        n = len(ticks)
+        if n == 0:
+            return self._seq
+        if n > self.capacity:
+            ticks = ticks[-self.capacity:]
+            self._seq += n - self.capacity
+            n = self.capacity
+
+        first = self._seq + 1
+        seqs = np.arange(first, first + n, dtype='u8')
+        slots = (seqs - 1) % self.capacity
+        # Clear the stamps, write the data (unstamped), then stamp: a reader
+        # re-checking a stamp never pairs an old stamp with new data
+        self._seq_view[slots] = 0
+        staged = ticks.copy()
+        staged['seq'] = 0
+        self._slots[slots] = staged
+        self._seq_view[slots] = seqs
+        self._header[0] = seqs[-1]
+        self._seq = int(seqs[-1])
+        return self._seq
+
+    def publish_smartapi_tick(self, message: Dict[str, Any]) -> int:
+        """Publish a parsed SmartWebSocketV2 message (prices arrive in paise, CDS in 1e-7 rupees)"""
+        best_buy = (message.get('best_5_buy_data') or [{}])[0]
+        best_sell = (message.get('best_5_sell_data') or [{}])[0]
+        exchange = int(message.get('exchange_type', 1))
+        divisor = CDS_PRICE_DIVISOR if exchange == CDS_EXCHANGE_TYPE else PRICE_DIVISOR
+        return self.publish(
+            token=int(message['token']),
+            ltp=message.get('last_traded_price', 0) / divisor,
+            timestamp=int(message.get('exchange_timestamp') or time.time() * 1000),
+            exchange=exchange,
+            volume=int(message.get('volume_trade_for_the_day', 0)),
+            oi=int(message.get('open_interest', 0)),
+            bid=best_buy.get('price', 0) / divisor,
+            ask=best_sell.get('price', 0) / divisor,
+            bid_qty=int(best_buy.get('quantity', 0)),
+            ask_qty=int(best_sell.get('quantity', 0))
+        )
+
+    def close(self, unlink: bool = True) -> None:
+        del self._header, self._slots, self._seq_view
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+
+class TickBusReader:
+    """Attaches to a ring by name and reads ticks in sequence, reporting gaps"""
+
+    def __init__(self, name: str = DEFAULT_BUS_NAME, from_latest: bool = True):
+        # track=False: consumers must not unlink the writer's segment on exit
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:  # Python < 3.13
+            self._shm = shared_memory.SharedMemory(name=name)
+            # Older versions register every attach with the resource tracker,
+            # which would unlink the bus when this reader's process exits
+            resource_tracker.unregister(self._shm._name, 'shared_memory')
+        self._header = np.ndarray((2,), dtype='u8', buffer=self._shm.buf)
+        self.capacity = int(self._header[1])
+        self._slots = np.ndarray((self.capacity,), dtype=TICK_DTYPE, buffer=self._shm.buf, offset=HEADER_SIZE)
+        self.next_seq = int(self._header[0]) + 1 if from_latest else 1
+        self.gaps = 0
+        self.received = 0
+
+    def lag(self) -> int:
+        """Ticks published but not yet read"""
+        return int(self._header[0]) - self.next_seq + 1
+
+    def poll(self, max_items: int = 4096) -> Tuple[np.ndarray, int]:
+        """Return (ticks, gap) for the next available ticks
+
+        ticks is a private copy of the slots, so the writer can never change
+        it after it is returned. After the copy the header and the slot stamps
+        are read again; a tick the writer may have overwritten during the copy
+        is dropped. gap is the number of ticks lost because the writer
+        overtook this reader.
+        """
+        head = int(self._header[0])
+        gap = 0
+        oldest = head - self.capacity + 1
+        if self.next_seq < oldest:
+            gap = oldest - self.next_seq
+            self.next_seq = oldest
+        if self.next_seq > head:
+            return self._slots[:0].copy(), gap
+
+        count = min(max_items, head - self.next_seq + 1)
+        start = (self.next_seq - 1) % self.capacity
+        ticks = self._copy_ring(self._slots, start, count)
+
+        # Seqlock double check: the stamp must be right both in the copy and
+        # after it, and the writer must not have lapped the tick meanwhile
+        head_after = int(self._header[0])
+        stamps = self._copy_ring(self._slots['seq'], start, count)
+        expected = np.arange(self.next_seq, self.next_seq + count, dtype='u8')
+        stale = (ticks['seq'] != expected) | (stamps != expected)
+        if head_after - self.capacity >= self.next_seq:
+            stale[:head_after - self.capacity - self.next_seq + 1] = True
+        if stale.any():
+            valid_from = int(np.flatnonzero(stale)[-1]) + 1
+            gap += valid_from
+            ticks = ticks[valid_from:]
+
+        self.next_seq += count
+        self.gaps += gap
+        self.received += len(ticks)
+        return ticks, gap
+
+    def _copy_ring(self, view: np.ndarray, start: int, count: int) -> np.ndarray:
+        end = start + count
+        if end <= self.capacity:
+            return view[start:end].copy()
+        return np.concatenate([view[start:], view[:end - self.capacity]])
+
+    def close(self) -> None:
+        del self._header, self._slots
+        self._shm.close()
+
+
+def run_smartapi_feed(writer: TickBusWriter, tokens: Dict[str, list], mode: int = 3) -> None:
+    """Stream SmartAPI ticks for {exchange: [tokens]} into the bus (blocking)
+
+    mode: 1 = LTP, 2 = Quote, 3 = SnapQuote
+    """
+    from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+    from LoginTesting import LoginManager, SessionDataHandler
+
+    login_manager = LoginManager()
+    session_data = login_manager.login()
+    if session_data['status'] != 'success':
+        print(f"Feed handler login failed: {session_data['message']}")
+        return
+
+    tokens_data = SessionDataHandler.get_token(session_data, 'data')
+    credentials = login_manager.credentials_manager
+    sws = SmartWebSocketV2(tokens_data['jwtToken'], credentials.get_api_key(),
+                           credentials.get_username(), tokens_data['feedToken'])
+    token_list = [{'exchangeType': EXCHANGE_TYPES[exchange], 'tokens': [str(t) for t in exchange_tokens]}
+                  for exchange, exchange_tokens in tokens.items()]
+
+    sws.on_open = lambda wsapp: sws.subscribe('tickbus', mode, token_list)
+    sws.on_data = lambda wsapp, message: writer.publish_smartapi_tick(message)
+    sws.on_error = lambda wsapp, error: print(f"Feed error: {error}")
+    sws.connect()
+
+
+_CHECK_FIELDS = ['token', 'timestamp', 'ltp', 'volume', 'oi', 'bid', 'ask', 'bid_qty', 'ask_qty']
+
+
+def _check_writer(name: str, capacity: int, seconds: float, ready) -> None:
+    writer = TickBusWriter(name, capacity)
+    ready.set()
+    rng = np.random.default_rng()
+    stop_at = time.monotonic() + seconds
+    while time.monotonic() < stop_at:
+        n = int(rng.integers(1, capacity))
+        first = writer.published + 1
+        if n < 32:
+            for seq in range(first, first + n):
+                writer.publish(seq, float(seq), seq, 1, seq, seq, float(seq), float(seq), seq, seq)
+            continue
+        ticks = np.zeros(n, dtype=TICK_DTYPE)
+        for field in _CHECK_FIELDS:
+            ticks[field] = np.arange(first, first + n)
+        writer.publish_batch(ticks)
+    time.sleep(0.2)
+    writer.close()
+
+
+def check_consistency(seconds: float = 5.0, capacity: int = 256) -> Dict[str, int]:
+    """Race a writer process against a reader and count torn ticks
+
+    The writer puts a tick's own sequence number into every field, so any
+    tick whose fields differ from its seq was torn by a concurrent write.
+    A small ring keeps the reader at the writer's heels, where tears happen.
+    """
+    import multiprocessing
+
+    name = f'{DEFAULT_BUS_NAME}_check'
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=_check_writer, args=(name, capacity, seconds, ready))
+    process.start()
+    ready.wait()
+    reader = TickBusReader(name, from_latest=False)
+    torn = 0
+    out_of_order = 0
+    last_seq = 0
+    while process.is_alive():
+        ticks, _ = reader.poll(capacity)
+        if not len(ticks):
+            continue
+        seqs = ticks['seq'].astype('i8')
+        for field in _CHECK_FIELDS:
+            torn += int((ticks[field] != seqs).sum())
+        out_of_order += int(seqs[0] <= last_seq) + int((np.diff(seqs) != 1).sum())
+        last_seq = int(seqs[-1])
+    process.join()
+    reader.close()
+    return {'received': reader.received, 'gaps': reader.gaps, 'torn': torn, 'out_of_order': out_of_order}
+
+
+# Execution starts here
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'feed':
+        writer = TickBusWriter()
+        try:
+            run_smartapi_feed(writer, {'NSE': ['99926000', '99926009']})
+        finally:
+            writer.close()
+    elif len(sys.argv) > 1 and sys.argv[1] == 'check':
+        result = check_consistency()
+        print(result)
+        sys.exit(1 if result['torn'] or result['out_of_order'] else 0)
+    else:
+        reader = TickBusReader()
+        print(f"Attached to {DEFAULT_BUS_NAME} (capacity {reader.capacity})")
+        try:
+            while True:
+                ticks, gap = reader.poll()
+                if gap:
+                    print(f"Missed {gap} ticks")
+                for tick in ticks:
+                    print(tick['token'], tick['ltp'], tick['timestamp'])
+                if not len(ticks):
+                    time.sleep(0.001)
+        except KeyboardInterrupt:
+            reader.close()
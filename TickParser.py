@@ -0,0 +1,263 @@
+import struct
+import time
+import numpy as np
+from typing import Dict, List, Iterable, Optional, Tuple
+
+from TickBus import TICK_DTYPE, CDS_EXCHANGE_TYPE, PRICE_DIVISOR, CDS_PRICE_DIVISOR
+
+# Batch decoder for SmartAPI WebSocket V2 binary tick packets.
+#
+# Every packet is a fixed-size little-endian record whose size is set by the
+# subscription mode (LTP 51 bytes, Quote 123, SnapQuote 379). The dtypes below
+# mirror that wire layout byte for byte, so a run of frames copied into a
+# preallocated buffer is decoded by viewing the buffer as a structured array:
+# no per-field unpacking and no Python dict per tick.
+
+LTP_MODE, QUOTE_MODE, SNAP_QUOTE_MODE = 1, 2, 3
+
+_LTP_FIELDS = [
+    ('subscription_mode', 'u1'),
+    ('exchange_type', 'u1'),
+    ('token', 'S25'),
+    ('sequence_number', '<i8'),
+    ('exchange_timestamp', '<i8'),
+    ('last_traded_price', '<i8')
+]
+
+_QUOTE_FIELDS = _LTP_FIELDS + [
+    ('last_traded_quantity', '<i8'),
+    ('average_traded_price', '<i8'),
+    ('volume_trade_for_the_day', '<i8'),
+    ('total_buy_quantity', '<f8'),
+    ('total_sell_quantity', '<f8'),
+    ('open_price_of_the_day', '<i8'),
+    ('high_price_of_the_day', '<i8'),
+    ('low_price_of_the_day', '<i8'),
+    ('closed_price', '<i8')
+]
+
+# One level of market depth; flag 0 = buy side, 1 = sell side
+DEPTH_DTYPE = np.dtype([
+    ('flag', '<u2'),
+    ('quantity', '<i8'),
+    ('price', '<i8'),
+    ('no_of_orders', '<u2')
+])
+
+_SNAP_QUOTE_FIELDS = _QUOTE_FIELDS + [
+    ('last_traded_timestamp', '<i8'),
+    ('open_interest', '<i8'),
+    ('open_interest_change_percentage', '<f8'),
+    ('best_5_buy_and_sell_data', DEPTH_DTYPE, (10,)),
+    ('upper_circuit_limit', '<i8'),
+    ('lower_circuit_limit', '<i8'),
+    ('52_week_high_price', '<i8'),
+    ('52_week_low_price', '<i8')
+]
+
+PACKET_DTYPES = {
+    LTP_MODE: np.dtype(_LTP_FIELDS),
+    QUOTE_MODE: np.dtype(_QUOTE_FIELDS),
+    SNAP_QUOTE_MODE: np.dtype(_SNAP_QUOTE_FIELDS)
+}
+PACKET_SIZES = {mode: dtype.itemsize for mode, dtype in PACKET_DTYPES.items()}
+_MODE_BY_SIZE = {size: mode for mode, size in PACKET_SIZES.items()}
+
+class TickBatchDecoder:
+    """Accumulates binary frames into preallocated buffers and decodes them in bulk
+
+    Frames are grouped by subscription mode. `add` copies a frame's bytes into
+    the mode's buffer through a memoryview; `flush` returns structured-array
+    views over the filled part of each buffer and resets the decoder. The
+    views share memory with the decoder, so consume (or copy) them before the
+    next flush.
+    """
+
+    def __init__(self, capacity: int = 65536):
+        self.capacity = capacity
+        self._buffers = {mode: np.zeros(capacity, dtype=dtype) for mode, dtype in PACKET_DTYPES.items()}
+        self._raw = {mode: memoryview(buffer).cast('B') for mode, buffer in self._buffers.items()}
+        self._counts = dict.fromkeys(PACKET_DTYPES, 0)
+        self.rejected = 0
+
+    def add(self, frame: bytes) -> bool:
+        """Queue one frame; returns False for unknown sizes or a full buffer"""
+        size = len(frame)
+        mode = _MODE_BY_SIZE.get(size)
+        if mode is None or self._counts[mode] == self.capacity:
+            self.rejected += 1
+            return False
+        start = self._counts[mode] * size
+        self._raw[mode][start:start + size] = frame
+        self._counts[mode] += 1
+        return True
+
+    def add_many(self, frames: Iterable[bytes]) -> int:
+        """Queue frames; a list of one packet size is copied in with a single join"""
+        frames = frames if isinstance(frames, list) else list(frames)
+        if not frames:
+            return 0
+        size = len(frames[0])
+        mode = _MODE_BY_SIZE.get(size)
+        count = len(frames)
+        if (mode is None or self._counts[mode] + count > self.capacity
+                or any(length != size for length in map(len, frames))):
+            return sum(self.add(frame) for frame in frames)
+        joined = b''.join(frames)
+        start = self._counts[mode] * size
+        self._raw[mode][start:start + len(joined)] = joined
+        self._counts[mode] += count
+        return count
+
+    def pending(self) -> int:
+        return sum(self._counts.values())
+
+    def flush(self) -> Dict[int, np.ndarray]:
+        """Decoded packets per mode (views into the preallocated buffers)"""
+        result = {mode: self._buffers[mode][:count] for mode, count in self._counts.items() if count}
+        self._counts = dict.fromkeys(PACKET_DTYPES, 0)
+        return result
+
+
+def decode_frames(frames: List[bytes], mode: int) -> np.ndarray:
+    """Decode frames of one mode in a single pass (one join, then a view)"""
+    return np.frombuffer(b''.join(frames), dtype=PACKET_DTYPES[mode])
+
+
+def decode_buffer(buffer, mode: int) -> np.ndarray:
+    """View a contiguous buffer of same-mode packets without copying"""
+    return np.frombuffer(memoryview(buffer), dtype=PACKET_DTYPES[mode])
+
+
+def price_divisors(packets: np.ndarray) -> np.ndarray:
+    return np.where(packets['exchange_type'] == CDS_EXCHANGE_TYPE, CDS_PRICE_DIVISOR, PRICE_DIVISOR)
+
+
+def depth_sides(depth: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Split (n, 10) DEPTH_DTYPE levels into (n, 5) buy and sell levels by their flag
+
+    Levels keep their feed order within a side (best first, as in
+    parse_frame_dict); a side with fewer than 5 levels is padded with zeros.
+    """
+    levels = depth.shape[1] // 2
+    is_sell = depth['flag'] != 0
+    if not is_sell[:, :levels].any() and is_sell[:, levels:].all():
+        # The usual layout: buy levels first, then sell levels
+        return depth[:, :levels], depth[:, levels:]
+    # Stable sort puts every packet's buy levels first, in feed order, then its sell levels
+    ordered = np.take_along_axis(depth, np.argsort(is_sell, axis=1, kind='stable'), axis=1)
+    buy_count = (~is_sell).sum(axis=1)[:, None]
+    level = np.arange(levels)[None, :]
+    buy = ordered[:, :levels].copy()
+    sell = np.take_along_axis(ordered, np.minimum(buy_count + level, depth.shape[1] - 1), axis=1)
+    missing_buy = level >= buy_count
+    missing_sell = buy_count + level >= depth.shape[1]
+    for name in depth.dtype.names:
+        buy[name][missing_buy] = 0
+        sell[name][missing_sell] = 0
+    return buy, sell
+
+
+def to_tick_records(packets: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Convert decoded packets of any mode to TickBus TICK_DTYPE records (rupee prices)"""
+    n = len(packets)
+    ticks = out[:n] if out is not None else np.zeros(n, dtype=TICK_DTYPE)
+    names = packets.dtype.names
+    divisor = price_divisors(packets)
+    ticks['seq'] = 0
+    ticks['token'] = packets['token'].astype(np.int64)
+    ticks['exchange'] = packets['exchange_type']
+    ticks['timestamp'] = packets['exchange_timestamp']
+    ticks['ltp'] = packets['last_traded_price'] / divisor
+    ticks['volume'] = packets['volume_trade_for_the_day'] if 'volume_trade_for_the_day' in names else 0
+    ticks['oi'] = packets['open_interest'] if 'open_interest' in names else 0
+    if 'best_5_buy_and_sell_data' in names:
+        buy, sell = depth_sides(packets['best_5_buy_and_sell_data'])
+        ticks['bid'] = buy['price'][:, 0] / divisor
+        ticks['ask'] = sell['price'][:, 0] / divisor
+        ticks['bid_qty'] = buy['quantity'][:, 0]
+        ticks['ask_qty'] = sell['quantity'][:, 0]
+    else:
+        for field in ['bid', 'ask', 'bid_qty', 'ask_qty']:
+            ticks[field] = 0
+    return ticks
+
+
+def parse_frame_dict(frame: bytes) -> Dict[str, object]:
+    """Per-frame struct decoding into a dict (reference path for the benchmark)"""
+    result = {
+        'subscription_mode': frame[0],
+        'exchange_type': frame[1],
+        'token': frame[2:27].split(b'\x00', 1)[0].decode(),
+        'sequence_number': struct.unpack_from('<q', frame, 27)[0],
+        'exchange_timestamp': struct.unpack_from('<q', frame, 35)[0],
+        'last_traded_price': struct.unpack_from('<q', frame, 43)[0]
+    }
+    if result['subscription_mode'] in (QUOTE_MODE, SNAP_QUOTE_MODE):
+        (result['last_traded_quantity'], result['average_traded_price'], result['volume_trade_for_the_day'],
+         result['total_buy_quantity'], result['total_sell_quantity'], result['open_price_of_the_day'],
+         result['high_price_of_the_day'], result['low_price_of_the_day'],
+         result['closed_price']) = struct.unpack_from('<qqqddqqqq', frame, 51)
+    if result['subscription_mode'] == SNAP_QUOTE_MODE:
+        (result['last_traded_timestamp'], result['open_interest'],
+         result['open_interest_change_percentage']) = struct.unpack_from('<qqd', frame, 123)
+        levels = [struct.unpack_from('<HqqH', frame, 147 + 20 * i) for i in range(10)]
+        result['best_5_buy_data'] = [{'flag': f, 'quantity': q, 'price': p, 'no of orders': o}
+                                     for f, q, p, o in levels if f == 0]
+        result['best_5_sell_data'] = [{'flag': f, 'quantity': q, 'price': p, 'no of orders': o}
+                                      for f, q, p, o in levels if f != 0]
+        (result['upper_circuit_limit'], result['lower_circuit_limit'], result['52_week_high_price'],
+         result['52_week_low_price']) = struct.unpack_from('<qqqq', frame, 347)
+    return result
+
+
+def synthetic_frames(n: int, mode: int = SNAP_QUOTE_MODE, seed: int = 0) -> List[bytes]:
+    """Random but well-formed packets for testing and benchmarking"""
+    rng = np.random.default_rng(seed)
+    packets = np.zeros(n, dtype=PACKET_DTYPES[mode])
+    packets['subscription_mode'] = mode
+    packets['exchange_type'] = 1
+    packets['token'] = rng.choice([b'3045', b'2885', b'1594', b'11536', b'99926000'], n)
+    packets['sequence_number'] = np.arange(n)
+    packets['exchange_timestamp'] = int(time.time() * 1000) + np.arange(n)
+    packets['last_traded_price'] = rng.integers(50000, 5000000, n)
+    if mode == SNAP_QUOTE_MODE:
+        depth = packets['best_5_buy_and_sell_data']
+        depth['flag'][:, 5:] = 1
+        depth['quantity'] = rng.integers(1, 10000, (n, 10))
+        depth['price'] = packets['last_traded_price'][:, None] + np.arange(-5, 5)
+    raw = packets.tobytes()
+    size = PACKET_SIZES[mode]
+    return [raw[i * size:(i + 1) * size] for i in range(n)]
+
+
+def benchmark(n_frames: int = 200000, mode: int = SNAP_QUOTE_MODE) -> Dict[str, float]:
+    """Frames per second for the batch decoder versus per-frame dict parsing"""
+    frames = synthetic_frames(n_frames, mode)
+
+    started = time.perf_counter()
+    decoder = TickBatchDecoder(capacity=n_frames)
+    decoder.add_many(frames)
+    ticks = to_tick_records(decoder.flush()[mode])
+    batch_seconds = time.perf_counter() - started
+
+    sample = frames[:min(n_frames, 50000)]
+    started = time.perf_counter()
+    for frame in sample:
+        parse_frame_dict(frame)
+    dict_seconds = time.perf_counter() - started
+
+    assert len(ticks) == n_frames
+    return {
+        'frames': n_frames,
+        'batch_frames_per_sec': n_frames / batch_seconds,
+        'dict_frames_per_sec': len(sample) / dict_seconds
+    }
+
+
+# Execution starts here
+if __name__ == "__main__":
+    for mode, name in [(LTP_MODE, 'LTP'), (QUOTE_MODE, 'Quote'), (SNAP_QUOTE_MODE, 'SnapQuote')]:
+        result = benchmark(mode=mode)
+        print(f"{name:<10} batch: {result['batch_frames_per_sec']:>12,.0f} frames/s   "
+              f"per-frame dict: {result['dict_frames_per_sec']:>10,.0f} frames/s")
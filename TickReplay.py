@@ -0,0 +1,344 @@
+import heapq
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional, Tuple
+import numpy as np
+import pandas as pd
+from LoginTesting import MARKET_TZ
+from CandleStore import CandleStore
+from QuoteArchive import QuoteArchiveReader, PRICE_SCALE, DEPTH_LEVELS, synthetic_snapshots
+from TickBus import TickBusWriter, EXCHANGE_TYPES
+from TickParser import CDS_EXCHANGE_TYPE, PRICE_DIVISOR, CDS_PRICE_DIVISOR, QUOTE_MODE, SNAP_QUOTE_MODE
+
+# Replays stored candles and quote snapshots through the live feed interface.
+#
+# Every token is a stream of records sorted by timestamp. A heap holds the
+# next timestamp of each stream; the stream on top is emitted up to the next
+# stream's timestamp in one run (a searchsorted, not one heap operation per
+# event), so sparse streams cost little and the output is ordered by
+# (timestamp, stream). Runs are turned into SmartWebSocketV2-style messages
+# and passed to on_data(wsapp, message), so strategy code written for the
+# live socket (or a TickBus fed from it) runs unchanged. speed=1.0 replays in
+# real time, speed=60.0 sixty times faster and speed=None as fast as the
+# consumer keeps up.
+
+_MESSAGE_CHUNK_ROWS = 4096
+# Longest slice of a run handed over at once, so stop() takes effect within a run
+_BATCH_ROWS = 65536
+
+
+def _wire_divisor(exchange_type: int) -> float:
+    """Wire price units per rupee (paise, or 1e-7 rupee for currency derivatives)"""
+    return CDS_PRICE_DIVISOR if exchange_type == CDS_EXCHANGE_TYPE else PRICE_DIVISOR
+
+
+def _ist_days(timestamps: np.ndarray) -> np.ndarray:
+    """Day numbers of epoch-nanosecond timestamps in IST (a fixed +05:30 offset)"""
+    return (timestamps + 330 * 60 * 10**9) // (86400 * 10**9)
+
+
+class ReplayStream(ABC):
+    """One token's time-ordered records and how they appear on the live feed
+
+    Messages are built from chunks of rows converted column-wise to wire
+    units, so a run of one event does not pay for a NumPy call per field.
+    """
+
+    def __init__(self, token: str, exchange_type: int, records: np.ndarray):
+        self.token = str(token)
+        self.exchange_type = exchange_type
+        self.records = records
+        # Contiguous copy: searchsorted on a strided field view copies it on every call
+        self.timestamps = np.ascontiguousarray(records['timestamp'], dtype=np.int64)
+        self._chunk_start = -1
+        self._chunk_rows: List[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @abstractmethod
+    def _wire_rows(self, start: int, end: int) -> List[tuple]:
+        """Records start:end converted to wire units, one tuple per record"""
+
+    @abstractmethod
+    def _message(self, row: tuple, sequence: int) -> Dict[str, Any]:
+        """A SmartWebSocketV2-style message for one converted row"""
+
+    def messages(self, start: int, end: int) -> Iterator[Dict[str, Any]]:
+        for position in range(start, end):
+            offset = position - self._chunk_start
+            if self._chunk_start < 0 or not 0 <= offset < len(self._chunk_rows):
+                self._chunk_start = position
+                self._chunk_rows = self._wire_rows(position, min(position + _MESSAGE_CHUNK_ROWS, len(self)))
+                offset = 0
+            yield self._message(self._chunk_rows[offset], position + 1)
+
+
+class SnapshotStream(ReplayStream):
+    """QuoteArchive snapshots, replayed as SnapQuote-mode messages"""
+
+    _PRICE_FIELDS = ['ltp', 'avg_price', 'open', 'high', 'low', 'close',
+                     'upper_circuit', 'lower_circuit', 'week52_high', 'week52_low']
+    _QUANTITY_FIELDS = ['last_trade_qty', 'volume', 'total_buy_qty', 'total_sell_qty', 'oi']
+    _DEPTH_FIELDS = [f'{side}_{field}_{level}' for side in ('bid', 'ask')
+                     for level in range(1, DEPTH_LEVELS + 1) for field in ('price', 'qty', 'orders')]
+
+    def _wire_rows(self, start: int, end: int) -> List[tuple]:
+        records = self.records[start:end]
+        scale = _wire_divisor(self.exchange_type) / PRICE_SCALE
+        columns = [records['timestamp'] // 1000000]
+        columns += [np.rint(records[field] * scale).astype(np.int64) for field in self._PRICE_FIELDS]
+        columns += [records[field] for field in self._QUANTITY_FIELDS]
+        columns += [np.rint(records[field] * scale).astype(np.int64) if '_price_' in field else records[field]
+                    for field in self._DEPTH_FIELDS]
+        return list(zip(*[column.tolist() for column in columns]))
+
+    def _message(self, row: tuple, sequence: int) -> Dict[str, Any]:
+        (timestamp, ltp, avg_price, open_price, high, low, close, upper, lower, week52_high, week52_low,
+         last_qty, volume, buy_qty, sell_qty, oi) = row[:16]
+        depth = row[16:]
+        half = 3 * DEPTH_LEVELS
+        return {
+            'subscription_mode': SNAP_QUOTE_MODE,
+            'exchange_type': self.exchange_type,
+            'token': self.token,
+            'sequence_number': sequence,
+            'exchange_timestamp': timestamp,
+            'last_traded_price': ltp,
+            'subscription_mode_val': 'SNAP_QUOTE',
+            'last_traded_quantity': last_qty,
+            'average_traded_price': avg_price,
+            'volume_trade_for_the_day': volume,
+            'total_buy_quantity': float(buy_qty),
+            'total_sell_quantity': float(sell_qty),
+            'open_price_of_the_day': open_price,
+            'high_price_of_the_day': high,
+            'low_price_of_the_day': low,
+            'closed_price': close,
+            'last_traded_timestamp': timestamp // 1000,
+            'open_interest': oi,
+            'open_interest_change_percentage': 0.0,
+            'upper_circuit_limit': upper,
+            'lower_circuit_limit': lower,
+            '52_week_high_price': week52_high,
+            '52_week_low_price': week52_low,
+            'best_5_buy_data': [{'flag': 0, 'quantity': depth[i + 1], 'price': depth[i], 'no of orders': depth[i + 2]}
+                                for i in range(0, half, 3)],
+            'best_5_sell_data': [{'flag': 1, 'quantity': depth[i + 1], 'price': depth[i], 'no of orders': depth[i + 2]}
+                                 for i in range(half, 2 * half, 3)]
+        }
+
+
+class CandleStream(ReplayStream):
+    """CandleStore candles, replayed as Quote-mode messages at each candle's timestamp
+
+    last_traded_price is the candle close, volume_trade_for_the_day the
+    running volume of the IST day, and the bar itself (rupees) is under 'candle'.
+    volume_before is the volume traded on the first day before the first record.
+    """
+
+    def __init__(self, token: str, exchange_type: int, records: np.ndarray, volume_before: int = 0):
+        super().__init__(token, exchange_type, records)
+        days = _ist_days(self.timestamps)
+        volume = np.asarray(records['volume'], dtype=np.int64)
+        running = np.cumsum(volume)
+        day_starts = np.flatnonzero(np.diff(days, prepend=days[:1] - 1))
+        self._day_volume = running - np.repeat(running[day_starts] - volume[day_starts],
+                                               np.diff(np.append(day_starts, len(volume))))
+        if len(day_starts):
+            self._day_volume[:day_starts[1] if len(day_starts) > 1 else len(volume)] += volume_before
+
+    def _wire_rows(self, start: int, end: int) -> List[tuple]:
+        records = self.records[start:end]
+        scale = _wire_divisor(self.exchange_type)
+        columns = [records['timestamp'] // 1000000,
+                   np.rint(records['close'] * scale).astype(np.int64),
+                   records['volume'], self._day_volume[start:end],
+                   records['open'], records['high'], records['low'], records['close']]
+        return list(zip(*[np.asarray(column).tolist() for column in columns]))
+
+    def _message(self, row: tuple, sequence: int) -> Dict[str, Any]:
+        timestamp, ltp, volume, day_volume, open_price, high, low, close = row
+        return {
+            'subscription_mode': QUOTE_MODE,
+            'exchange_type': self.exchange_type,
+            'token': self.token,
+            'sequence_number': sequence,
+            'exchange_timestamp': timestamp,
+            'last_traded_price': ltp,
+            'subscription_mode_val': 'QUOTE',
+            'last_traded_quantity': volume,
+            'volume_trade_for_the_day': day_volume,
+            'candle': {'open': open_price, 'high': high, 'low': low, 'close': close, 'volume': volume}
+        }
+
+
+def snapshot_streams(records: np.ndarray) -> List[SnapshotStream]:
+    """Split SNAPSHOT_DTYPE records (any order) into one stream per token"""
+    order = np.lexsort((records['timestamp'], records['token']))
+    records = records[order]
+    starts = np.flatnonzero(np.diff(records['token'], prepend=records['token'][:1] - 1)) if len(records) else []
+    ends = np.append(starts[1:], len(records)) if len(records) else []
+    return [SnapshotStream(str(records['token'][start]), int(records['exchange'][start]), records[start:end])
+            for start, end in zip(starts, ends)]
+
+
+def quote_streams(reader: QuoteArchiveReader, start=None, end=None,
+                  tokens: Optional[Iterable] = None) -> List[SnapshotStream]:
+    """Streams of archived FULL snapshots for a time and token range"""
+    return snapshot_streams(reader.read_records(start, end, tokens))
+
+
+def candle_streams(store: CandleStore, exchange: str, interval: str, tokens: Iterable[str],
+                   fromdate: Optional[str] = None, todate: Optional[str] = None) -> List[CandleStream]:
+    """Streams over memory-mapped CandleStore files (tokens with no stored candles are skipped)"""
+    streams = []
+    for token in tokens:
+        records = store.load_records(exchange, interval, str(token))
+        if records is None:
+            continue
+        timestamps = records['timestamp']
+        start, end = 0, len(records)
+        if fromdate:
+            start = np.searchsorted(timestamps, pd.Timestamp(fromdate, tz=MARKET_TZ).value, side='left')
+        if todate:
+            end = np.searchsorted(timestamps, pd.Timestamp(todate, tz=MARKET_TZ).value, side='right')
+        if end > start:
+            # Candles earlier on the first day still count towards its running volume
+            day_start = np.searchsorted(timestamps, _ist_days(timestamps[start]) * 86400 * 10**9 - 330 * 60 * 10**9)
+            volume_before = int(records['volume'][day_start:start].sum())
+            streams.append(CandleStream(str(token), EXCHANGE_TYPES.get(exchange, 0), records[start:end],
+                                        volume_before))
+    return streams
+
+
+def merged_runs(streams: List[ReplayStream]) -> Iterator[Tuple[int, int, int]]:
+    """Heap-based k-way merge yielding (stream index, start, end) runs in (timestamp, stream) order"""
+    heap = [(int(stream.timestamps[0]), i) for i, stream in enumerate(streams) if len(stream)]
+    heapq.heapify(heap)
+    positions = [0] * len(streams)
+    while heap:
+        _, i = heapq.heappop(heap)
+        timestamps = streams[i].timestamps
+        start = positions[i]
+        if heap:
+            # Emit up to the next stream's head; equal timestamps go to the lower stream index first
+            limit, limit_stream = heap[0]
+            side = 'right' if i < limit_stream else 'left'
+            following = start + 1
+            if following == len(timestamps) or timestamps[following] > limit or (
+                    timestamps[following] == limit and side == 'left'):
+                end = following  # streams in lockstep: a run of one, no search needed
+            else:
+                end = max(int(timestamps.searchsorted(limit, side=side)), following)
+        else:
+            end = len(timestamps)
+        yield i, start, end
+        positions[i] = end
+        if end < len(timestamps):
+            heapq.heappush(heap, (int(timestamps[end]), i))
+
+
+class TickReplay:
+    """Drives a live-feed consumer from stored streams at real time, Nx or maximum speed"""
+
+    def __init__(self, streams: List[ReplayStream], speed: Optional[float] = 1.0):
+        """
+        Args:
+            streams: One stream per token (snapshot_streams, quote_streams, candle_streams)
+            speed: 1.0 = real time, 10.0 = ten times faster, None or 0 = as fast as possible
+        """
+        self.streams = streams
+        self.speed = speed
+        self.events = 0
+        self.max_lag = 0.0
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _paced_runs(self) -> Iterator[Tuple[int, int, int]]:
+        """Merged runs cut so that no event is delivered before its due time"""
+        heads = [int(stream.timestamps[0]) for stream in self.streams if len(stream)]
+        if not heads:
+            return
+        first_timestamp = min(heads)
+        ns_per_second = self.speed * 1e9
+        started = time.perf_counter()
+        for i, start, end in merged_runs(self.streams):
+            timestamps = self.streams[i].timestamps
+            while start < end:
+                replay_now = first_timestamp + (time.perf_counter() - started) * ns_per_second
+                due = int(np.searchsorted(timestamps[start:end], replay_now, side='right'))
+                if due == 0:
+                    if self._stop.wait((timestamps[start] - replay_now) / ns_per_second):
+                        return
+                    continue
+                self.max_lag = max(self.max_lag, float(replay_now - timestamps[start]) / ns_per_second)
+                yield i, start, start + due
+                start += due
+
+    def run(self, on_data: Optional[Callable[[Any, Dict[str, Any]], None]] = None,
+            on_batch: Optional[Callable[[ReplayStream, np.ndarray], None]] = None) -> Dict[str, Any]:
+        """Replay every stream; returns events delivered, elapsed time and throughput
+
+        on_data(wsapp, message) has the SmartWebSocketV2 on_data signature
+        (wsapp is this replay). on_batch(stream, records) receives runs of raw
+        records of one stream without building messages.
+        """
+        self._stop.clear()
+        self.events = 0
+        self.max_lag = 0.0
+        runs = self._paced_runs() if self.speed else merged_runs(self.streams)
+        started = time.perf_counter()
+        for i, start, end in runs:
+            stream = self.streams[i]
+            while start < end and not self._stop.is_set():
+                chunk_end = min(end, start + _BATCH_ROWS)
+                if on_batch is not None:
+                    on_batch(stream, stream.records[start:chunk_end])
+                delivered = chunk_end - start
+                if on_data is not None:
+                    delivered = 0
+                    for message in stream.messages(start, chunk_end):
+                        if self._stop.is_set():
+                            break
+                        on_data(self, message)
+                        delivered += 1
+                self.events += delivered
+                start = chunk_end
+            if self._stop.is_set():
+                break
+        elapsed = time.perf_counter() - started
+        return {
+            'events': self.events,
+            'seconds': elapsed,
+            'events_per_sec': self.events / elapsed if elapsed > 0 else 0.0,
+            'max_lag_seconds': float(self.max_lag)
+        }
+
+
+def replay_to_tickbus(replay: TickReplay, writer: TickBusWriter) -> Dict[str, Any]:
+    """Publish a replay onto a TickBus, so its readers see it exactly as a live feed"""
+    return replay.run(on_data=lambda wsapp, message: writer.publish_smartapi_tick(message))
+
+
+def benchmark(n_tokens: int = 200, n_steps: int = 2500) -> Dict[str, float]:
+    """Events per second replayed at maximum speed, with and without building messages"""
+    streams = snapshot_streams(synthetic_snapshots(n_tokens, n_steps))
+    merge_only = TickReplay(streams, speed=None).run(on_batch=lambda stream, records: None)
+    with_messages = TickReplay(streams, speed=None).run(on_data=lambda wsapp, message: None)
+    return {
+        'events': merge_only['events'],
+        'merge_events_per_sec': merge_only['events_per_sec'],
+        'message_events_per_sec': with_messages['events_per_sec']
+    }
+
+
+# Execution starts here
+if __name__ == "__main__":
+    result = benchmark()
+    print(f"{result['events']:,} snapshot events across 200 tokens: "
+          f"merge {result['merge_events_per_sec']:,.0f} events/s, "
+          f"with SnapQuote messages {result['message_events_per_sec']:,.0f} events/s")